@@ -15,8 +15,20 @@ class Settings(BaseSettings):
     # Services URLs
     NODE_BACKEND_URL: str
     
+    # Node.js backend callbacks
+    NODE_CALLBACK_MAX_CONNECTIONS: int = 20
+    NODE_CALLBACK_MAX_RETRIES: int = 5
+    NODE_CALLBACK_BATCH_WINDOW_MS: int = 20
+    NODE_CALLBACK_BATCH_SIZE: int = 50
+    
     # RabbitMQ
     RABBITMQ_URL: str
+    RABBITMQ_CHANNEL_POOL_SIZE: int = 10
+    RABBITMQ_MAX_IN_FLIGHT: int = 1000
+    
+    # Task dispatch: "celery" or "rabbitmq" (consumed by app.services.ocr_consumer)
+    OCR_TASK_TRANSPORT: str = "celery"
+    OCR_CONSUMER_CONCURRENCY: int = 2
     
     # Redis
     REDIS_URL: str
@@ -26,9 +38,13 @@ class Settings(BaseSettings):
     CELERY_RESULT_BACKEND: str
     
     # OCR Settings
+    # Word confidence (0-1) below which layout OCR re-reads a field and reports it for review
     OCR_CONFIDENCE_THRESHOLD: float = 0.8
     MAX_FILE_SIZE: int = 25 * 1024 * 1024  # 25MB
     ALLOWED_FILE_TYPES: List[str] = ["pdf", "jpg", "jpeg", "png", "tiff"]
+    UPLOAD_TEMP_DIR: str = "/app/uploads"
+    MAX_BATCH_FILES: int = 1000
+    MAX_BATCH_UPLOAD_SIZE: int = 512 * 1024 * 1024  # 512MB
     
     # Monitoring
     ENABLE_METRICS: bool = True
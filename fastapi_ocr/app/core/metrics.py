@@ -0,0 +1,205 @@
+"""
+Per-stage metrics of the OCR pipeline, exported to Prometheus from the workers.
+
+Stage durations of an invoice are collected while it is processed, including
+those measured on page pool threads, and observed together when it is
+done, labelled by file type and page count. Celery runs tasks in prefork
+children, so with PROMETHEUS_MULTIPROC_DIR set every child writes to that
+directory and the worker's main process serves the aggregate on
+OCR_METRICS_PORT.
+"""
+import os
+import shutil
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY, start_http_server
+from prometheus_client import multiprocess
+
+logger = logging.getLogger(__name__)
+
+# Port the worker exposes /metrics on; 0 disables the exporter
+METRICS_PORT = int(os.getenv('OCR_METRICS_PORT', 9808))
+MULTIPROCESS_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+LABELS = ["file_type", "pages"]
+
+STAGE_SECONDS = Histogram(
+    "ocr_stage_duration_seconds",
+    "Time spent per invoice in each OCR pipeline stage, summed over its pages",
+    ["stage"] + LABELS, buckets=STAGE_BUCKETS
+)
+INVOICE_SECONDS = Histogram(
+    "ocr_invoice_duration_seconds", "Wall time to process an invoice", LABELS, buckets=STAGE_BUCKETS
+)
+RESULT_BYTES = Histogram(
+    "ocr_result_size_bytes", "Encoded size of invoice results as stored in the result cache", LABELS, buckets=SIZE_BUCKETS
+)
+INVOICES = Counter("ocr_invoices_total", "Invoices processed", ["status"] + LABELS)
+PAGES = Counter("ocr_pages_total", "Pages processed, by how their text was read", ["file_type", "source"])
+PASSES = Counter(
+    "ocr_invoice_passes_total", "Invoices by the OCR_MODE=tiered pass that finished them", ["ocr_pass", "file_type"]
+)
+
+
+def page_bucket(pages: int) -> str:
+    """Page count label, bucketed to keep label cardinality bounded"""
+    for upper, label in ((1, "1"), (2, "2"), (5, "3-5"), (10, "6-10"), (50, "11-50")):
+        if pages <= upper:
+            return label
+    return "51+"
+
+
+class InvoiceTrace:
+    """What is learned about an invoice while it is processed"""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.file_type = "unknown"
+        self.pages = 0
+        self.ocr_pages = 0
+        # Pass of OCR_MODE=tiered that finished the invoice
+        self.ocr_pass: Optional[str] = None
+        self.result_bytes: Optional[int] = None
+        self.status: Optional[str] = None
+        self.seconds: Optional[float] = None
+
+    def record(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+
+_local = threading.local()
+# Called with every finished invoice trace, e.g. by the benchmark harness
+_listeners: List[Callable[[InvoiceTrace], None]] = []
+
+
+def add_listener(callback: Callable[[InvoiceTrace], None]):
+    _listeners.append(callback)
+
+
+def remove_listener(callback: Callable[[InvoiceTrace], None]):
+    _listeners.remove(callback)
+
+
+def current_trace() -> Optional[InvoiceTrace]:
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def collect() -> Iterator[InvoiceTrace]:
+    """Collect the stages measured in this thread into a fresh trace"""
+    previous = current_trace()
+    _local.trace = InvoiceTrace()
+    try:
+        yield _local.trace
+    finally:
+        _local.trace = previous
+
+
+def record_stage(name: str, seconds: float):
+    """Add time to a stage of the invoice being traced, if any"""
+    trace = current_trace()
+    if trace is not None:
+        trace.record(name, seconds)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block as a pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def describe(
+    file_type: str = None, pages: int = None, ocr_pages: int = None, ocr_pass: str = None, result_bytes: int = None
+):
+    """Note the file type, page counts, final OCR pass and stored result size of the invoice being traced"""
+    trace = current_trace()
+    if trace is None:
+        return
+    if file_type is not None:
+        trace.file_type = file_type
+    if pages is not None:
+        trace.pages = pages
+    if ocr_pages is not None:
+        trace.ocr_pages = ocr_pages
+    if ocr_pass is not None:
+        trace.ocr_pass = ocr_pass
+    if result_bytes is not None:
+        trace.result_bytes = result_bytes
+
+
+@contextmanager
+def track_invoice() -> Iterator[InvoiceTrace]:
+    """Trace the processing of one invoice and observe its metrics when done"""
+    start = time.perf_counter()
+    with collect() as trace:
+        trace.status = "failed"
+        try:
+            yield trace
+            trace.status = "completed"
+        finally:
+            trace.seconds = time.perf_counter() - start
+            try:
+                _observe(trace)
+                for callback in _listeners:
+                    callback(trace)
+            except Exception as e:
+                logger.warning(f"Could not record OCR metrics: {e}")
+
+
+def _observe(trace: InvoiceTrace):
+    labels = {"file_type": trace.file_type, "pages": page_bucket(trace.pages)}
+    INVOICES.labels(status=trace.status, **labels).inc()
+    if trace.status != "completed":
+        return
+    INVOICE_SECONDS.labels(**labels).observe(trace.seconds)
+    for name, stage_seconds in trace.stages.items():
+        STAGE_SECONDS.labels(stage=name, **labels).observe(stage_seconds)
+    if trace.result_bytes is not None:
+        RESULT_BYTES.labels(**labels).observe(trace.result_bytes)
+    PAGES.labels(file_type=trace.file_type, source="ocr").inc(trace.ocr_pages)
+    PAGES.labels(file_type=trace.file_type, source="text_layer").inc(trace.pages - trace.ocr_pages)
+    if trace.ocr_pass is not None:
+        PASSES.labels(ocr_pass=trace.ocr_pass, file_type=trace.file_type).inc()
+
+
+def reset_multiprocess_dir():
+    """Clear metrics left by a previous run; call before any worker process starts"""
+    if MULTIPROCESS_DIR:
+        shutil.rmtree(MULTIPROCESS_DIR, ignore_errors=True)
+        os.makedirs(MULTIPROCESS_DIR, exist_ok=True)
+
+
+def start_metrics_server():
+    """
+    Serve /metrics on OCR_METRICS_PORT: the aggregate of every process
+    writing to PROMETHEUS_MULTIPROC_DIR, or this process's own metrics
+    """
+    if not METRICS_PORT:
+        return
+    if MULTIPROCESS_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    try:
+        start_http_server(METRICS_PORT, registry=registry)
+    except OSError as e:
+        # e.g. a second worker on the same host; metrics still reach the directory
+        logger.warning(f"Could not serve OCR metrics on port {METRICS_PORT}: {e}")
+        return
+    logger.info(f"Serving OCR metrics on port {METRICS_PORT}")
+
+
+def mark_process_dead(pid: int):
+    """Drop the live-only series of an exited worker process"""
+    if MULTIPROCESS_DIR:
+        multiprocess.mark_process_dead(pid)
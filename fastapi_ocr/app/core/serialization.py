@@ -0,0 +1,91 @@
+import json
+import os
+import zlib
+import logging
+from typing import Dict, Any
+from kombu.serialization import register
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+# "msgpack" sends task messages and stores results as msgpack, zlib-compressed
+# above OCR_COMPRESS_MIN_BYTES; "json" keeps Celery's default encoding
+RESULT_SERIALIZER = os.getenv('OCR_RESULT_SERIALIZER', 'json')
+COMPRESS_MIN_BYTES = int(os.getenv('OCR_COMPRESS_MIN_BYTES', 1024))
+COMPRESS_LEVEL = int(os.getenv('OCR_COMPRESS_LEVEL', 1))
+# Seconds task results are kept in the result backend (Celery default: 1 day)
+RESULT_EXPIRES = int(os.getenv('CELERY_RESULT_EXPIRES', 24 * 3600))
+
+COMPACT_SERIALIZER = "msgpack-zlib"
+COMPACT_CONTENT_TYPE = "application/x-msgpack-zlib"
+
+# First byte of a packed payload: whether the msgpack body that follows is compressed
+_RAW = b"\x00"
+_ZLIB = b"\x01"
+
+
+def pack(obj: Any) -> bytes:
+    """Encode as msgpack, compressing payloads of at least COMPRESS_MIN_BYTES"""
+    body = msgpack.packb(obj, use_bin_type=True)
+    if len(body) >= COMPRESS_MIN_BYTES:
+        return _ZLIB + zlib.compress(body, COMPRESS_LEVEL)
+    return _RAW + body
+
+
+def unpack(data: bytes) -> Any:
+    """Decode a payload produced by pack()"""
+    marker, body = data[:1], data[1:]
+    if marker == _ZLIB:
+        body = zlib.decompress(body)
+    elif marker != _RAW:
+        raise ValueError(f"Unknown payload marker {marker!r}")
+    return msgpack.unpackb(body, raw=False)
+
+
+def compact_enabled() -> bool:
+    """Whether the compact encoding is selected and available"""
+    if RESULT_SERIALIZER != "msgpack":
+        return False
+    if not MSGPACK_AVAILABLE:
+        logger.warning("OCR_RESULT_SERIALIZER is msgpack but it is not installed, falling back to json")
+        return False
+    return True
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode a value stored outside Celery (e.g. the result cache) with the selected encoding"""
+    if compact_enabled():
+        return pack(obj)
+    return json.dumps(obj).encode()
+
+
+def loads(data: bytes) -> Any:
+    """Decode a value written by dumps() under either encoding"""
+    if data[:1] in (_RAW, _ZLIB):
+        return unpack(data)
+    return json.loads(data)
+
+
+def celery_serialization_settings() -> Dict[str, Any]:
+    """
+    Serializer settings for the OCR Celery app. Both encodings are always
+    accepted, so messages and results written before a switch stay readable.
+    """
+    serializer = COMPACT_SERIALIZER if compact_enabled() else "json"
+    accept_content = ["json"]
+    if MSGPACK_AVAILABLE:
+        register(COMPACT_SERIALIZER, pack, unpack,
+                 content_type=COMPACT_CONTENT_TYPE, content_encoding="binary")
+        accept_content.append(COMPACT_SERIALIZER)
+    return {
+        "task_serializer": serializer,
+        "result_serializer": serializer,
+        "accept_content": accept_content,
+        "result_accept_content": accept_content,
+        "result_expires": RESULT_EXPIRES,
+    }
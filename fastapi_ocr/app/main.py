@@ -1,7 +1,13 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from prometheus_fastapi_instrumentator import Instrumentator
 from .routers import ocr, health
+from .core.config import settings
+from .services.uploads import MULTIPART_OVERHEAD
+from .services.notifications import get_event_hub
+from .services.node_client import close_node_client
+from .services.rabbitmq import init_rabbitmq, close_rabbitmq
 import logging
 
 # Configure logging
@@ -26,6 +32,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized uploads from their Content-Length before the body is read
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    content_length = request.headers.get("content-length")
+    max_size = settings.MAX_BATCH_UPLOAD_SIZE if request.url.path.endswith("/batch") else settings.MAX_FILE_SIZE
+    if content_length and content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD:
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Upload exceeds maximum size of {max_size} bytes"}
+        )
+    return await call_next(request)
+
 # Add Prometheus metrics
 Instrumentator().instrument(app).expose(app)
 
@@ -35,4 +53,12 @@ app.include_router(ocr.router, prefix="/api/v1")
 
 @app.on_event("startup")
 async def startup_event():
-    logger.info("Starting up OCR service")
\ No newline at end of file
+    logger.info("Starting up OCR service")
+    if settings.OCR_TASK_TRANSPORT == "rabbitmq":
+        await init_rabbitmq()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await get_event_hub().close()
+    await close_node_client()
+    await close_rabbitmq()
@@ -1,51 +1,102 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
-from ..worker import process_invoice
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from ..worker import process_invoice, queue_ocr_result
 from ..models.invoice import InvoiceResponse
+from ..services.result_cache import get_result_cache, cached_reference, resolve_result
+from ..services.uploads import save_upload, extract_archive, UploadTooLargeError
+from ..services.blobs import get_blob_store, commit_upload, release_blob
+from ..services.batches import record_completed_task, create_batch, get_batch_status
+from ..services.dispatch import new_job, dispatch_ocr_jobs
+from ..services.routing import route_upload
+from ..services.notifications import (
+    get_event_hub,
+    task_channel,
+    batch_channel,
+    format_sse,
+    SSE_HEARTBEAT_INTERVAL,
+)
+from ..core.config import settings
+import aiofiles.os
+import asyncio
 import logging
 import os
 import uuid
+import zipfile
 from pathlib import Path
+from typing import List, Optional
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+ALLOWED_CONTENT_TYPES = ["application/pdf", "image/jpeg", "image/png"]
+ARCHIVE_CONTENT_TYPES = ["application/zip", "application/x-zip-compressed"]
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
 @router.post("/process-invoice", response_model=InvoiceResponse)
 async def upload_invoice(
     file: UploadFile = File(...),
+    invoice_id: Optional[str] = Form(None),
     background_tasks: BackgroundTasks = None
 ):
     """
-    Process an invoice using OCR and return structured data
+    Process an invoice using OCR and return structured data.
+    When invoice_id is given, the result is pushed to the Node.js backend
+    as soon as it is ready.
     """
     try:
         # Validate file type
-        if not file.content_type in ["application/pdf", "image/jpeg", "image/png"]:
+        if not file.content_type in ALLOWED_CONTENT_TYPES:
             raise HTTPException(
                 status_code=400,
                 detail="Invalid file type. Only PDF, JPEG, and PNG are supported."
             )
         
-        # Save file to disk for Celery processing
-        uploads_dir = Path("/app/uploads")
-        uploads_dir.mkdir(exist_ok=True)
-        
+        # Stream the upload into the blob store, hashing and enforcing the
+        # size limit as it arrives
         file_extension = Path(file.filename).suffix or ".tmp"
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = uploads_dir / unique_filename
+        file_path = get_blob_store().staging_path(file_extension)
         
-        # Save uploaded file
-        content = await file.read()
-        with open(file_path, "wb") as f:
-            f.write(content)
-        
-        # Process invoice asynchronously with file path
-        task = process_invoice.delay(str(file_path))
+        file_hash = await save_upload(file, file_path, settings.MAX_FILE_SIZE)
+
+        blob = None
+        try:
+            # Serve duplicate uploads from the result cache without queueing OCR
+            cached = await run_in_threadpool(get_result_cache().get, file_hash)
+            if cached is not None:
+                await aiofiles.os.remove(file_path)
+                # Record a completed task so /task/{task_id} resolves as usual;
+                # it and the webhook refer to the cached copy
+                reference = await run_in_threadpool(cached_reference, file_hash, cached)
+                task_id = await run_in_threadpool(record_completed_task, reference)
+                if invoice_id:
+                    await run_in_threadpool(queue_ocr_result, invoice_id, reference)
+                logger.info(f"Served invoice {file_hash} from OCR result cache")
+                return {
+                    "status": "completed",
+                    "task_id": task_id,
+                    "data": cached
+                }
+
+            # Process invoice asynchronously on a queue matching its estimated cost
+            queue, pages = await run_in_threadpool(route_upload, str(file_path))
+            blob = await run_in_threadpool(commit_upload, file_path, file_hash)
+            job = new_job(blob, file_hash, invoice_id=invoice_id, queue=queue, pages=pages)
+            await dispatch_ocr_jobs([job])
+        except Exception:
+            # Never queued: drop the staged file, or the blob it became
+            await run_in_threadpool(_discard_upload, file_path, blob)
+            raise
         
         return {
             "status": "processing",
-            "task_id": task.id,
+            "task_id": job["task_id"],
             "message": "Invoice is being processed"
         }
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing invoice: {str(e)}")
         raise HTTPException(
@@ -53,36 +104,234 @@ async def upload_invoice(
             detail=f"Error processing invoice: {str(e)}"
         )
 
-@router.get("/task/{task_id}", response_model=InvoiceResponse)
-async def get_task_result(task_id: str):
-    """
-    Get the result of an invoice processing task
-    """
-    try:
-        task = process_invoice.AsyncResult(task_id)
-        
-        if task.ready():
-            if task.successful():
-                return {
-                    "status": "completed",
-                    "task_id": task_id,
-                    "data": task.get()
-                }
-            else:
+def _task_status(task_id: str) -> dict:
+    """Describe the current state of an invoice processing task"""
+    task = process_invoice.AsyncResult(task_id)
+    
+    if task.ready():
+        if task.successful():
+            data = resolve_result(task.get())
+            if data is None:
                 return {
                     "status": "failed",
                     "task_id": task_id,
-                    "error": str(task.result)
+                    "error": "OCR result has expired"
                 }
+            return {
+                "status": "completed",
+                "task_id": task_id,
+                "data": data
+            }
         else:
             return {
-                "status": "processing",
+                "status": "failed",
                 "task_id": task_id,
-                "message": "Task is still processing"
+                "error": str(task.result)
             }
+    else:
+        return {
+            "status": "processing",
+            "task_id": task_id,
+            "message": "Task is still processing"
+        }
+
+@router.get("/task/{task_id}", response_model=InvoiceResponse)
+async def get_task_result(task_id: str):
+    """
+    Get the result of an invoice processing task
+    """
+    try:
+        return _task_status(task_id)
     except Exception as e:
         logger.error(f"Error checking task status: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Error checking task status: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+async def _subscribe(channel: str):
+    try:
+        return await get_event_hub().subscribe(channel)
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+async def _next_event(queue):
+    """Wait for the next event, returning None when a heartbeat is due"""
+    try:
+        return await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_INTERVAL)
+    except asyncio.TimeoutError:
+        return None
+
+@router.get("/task/{task_id}/events")
+async def stream_task_result(task_id: str, request: Request):
+    """
+    Stream the result of an invoice processing task as Server-Sent Events.
+    Sends the current state, then the completion event, then closes.
+    """
+    channel = task_channel(task_id)
+    queue = await _subscribe(channel)
+
+    async def events():
+        try:
+            # Subscribed before reading the state, so no completion can be missed
+            status = await run_in_threadpool(_task_status, task_id)
+            yield format_sse(status["status"], status)
+            while status["status"] == "processing":
+                if await request.is_disconnected():
+                    break
+                event = await _next_event(queue)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                status = event
+                yield format_sse(status["status"], status)
+        finally:
+            get_event_hub().unsubscribe(channel, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+def _discard_upload(file_path, blob=None):
+    """Remove an upload that was never queued, releasing its blob once committed"""
+    Path(file_path).unlink(missing_ok=True)
+    if blob is not None:
+        release_blob(blob)
+
+def _discard_uploads(saved, jobs=()):
+    """Remove saved uploads of a batch that was never queued, and the blobs of its jobs"""
+    for item in saved:
+        Path(item["file_path"]).unlink(missing_ok=True)
+    for job in jobs:
+        release_blob(job["blob"])
+
+@router.post("/batch")
+async def upload_invoice_batch(
+    files: List[UploadFile] = File(None),
+    archive: UploadFile = File(None)
+):
+    """
+    Process a batch of invoices, sent either as several files or as one ZIP
+    archive, and return a single batch ID to track them
+    """
+    saved = []
+    jobs = []
+    try:
+        if not files and archive is None:
+            raise HTTPException(status_code=400, detail="Provide invoice files or a ZIP archive.")
+
+        uploads_dir = Path(settings.UPLOAD_TEMP_DIR)
+        uploads_dir.mkdir(exist_ok=True)
+        store = get_blob_store()
+
+        for file in files or []:
+            if file.content_type not in ALLOWED_CONTENT_TYPES:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid file type for {file.filename}. Only PDF, JPEG, and PNG are supported."
+                )
+            if len(saved) >= settings.MAX_BATCH_FILES:
+                raise UploadTooLargeError(f"Batch contains more than {settings.MAX_BATCH_FILES} invoices")
+
+            file_path = store.staging_path(Path(file.filename).suffix or '.tmp')
+            file_hash = await save_upload(file, file_path, settings.MAX_FILE_SIZE)
+            saved.append({"filename": file.filename, "file_path": str(file_path), "content_hash": file_hash})
+
+        if archive is not None:
+            if archive.content_type not in ARCHIVE_CONTENT_TYPES and not archive.filename.lower().endswith(".zip"):
+                raise HTTPException(status_code=400, detail="Invalid archive type. Only ZIP is supported.")
+
+            archive_path = uploads_dir / f"{uuid.uuid4()}.zip"
+            await save_upload(archive, archive_path, settings.MAX_BATCH_UPLOAD_SIZE)
+            try:
+                saved += await run_in_threadpool(
+                    extract_archive,
+                    archive_path,
+                    store.staging_dir(),
+                    settings.ALLOWED_FILE_TYPES,
+                    settings.MAX_BATCH_FILES - len(saved),
+                    settings.MAX_FILE_SIZE
+                )
+            finally:
+                archive_path.unlink(missing_ok=True)
+
+        if not saved:
+            raise HTTPException(status_code=400, detail="No supported invoices found in the batch.")
+
+        batch_id, jobs = await run_in_threadpool(create_batch, saved)
+        await dispatch_ocr_jobs(jobs)
+
+        return {
+            "status": "processing",
+            "batch_id": batch_id,
+            "total": len(saved),
+            "message": "Invoices are being processed"
+        }
+    except UploadTooLargeError as e:
+        _discard_uploads(saved, jobs)
+        raise HTTPException(status_code=413, detail=str(e))
+    except zipfile.BadZipFile:
+        _discard_uploads(saved, jobs)
+        raise HTTPException(status_code=400, detail="Archive is not a valid ZIP file.")
+    except HTTPException:
+        _discard_uploads(saved, jobs)
+        raise
+    except Exception as e:
+        _discard_uploads(saved, jobs)
+        logger.error(f"Error processing invoice batch: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing invoice batch: {str(e)}"
+        )
+
+@router.get("/batch/{batch_id}")
+async def get_batch_result(batch_id: str):
+    """
+    Get aggregate progress and per-invoice results of a batch
+    """
+    try:
+        status = await run_in_threadpool(get_batch_status, batch_id)
+    except Exception as e:
+        logger.error(f"Error checking batch status: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error checking batch status: {str(e)}"
+        )
+
+    if status is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return status
+
+@router.get("/batch/{batch_id}/events")
+async def stream_batch_result(batch_id: str, request: Request):
+    """
+    Stream batch progress as Server-Sent Events: a progress snapshot, one
+    event per invoice as it finishes, and a final summary once none is pending
+    """
+    channel = batch_channel(batch_id)
+    queue = await _subscribe(channel)
+
+    status = await run_in_threadpool(get_batch_status, batch_id)
+    if status is None:
+        get_event_hub().unsubscribe(channel, queue)
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    async def events():
+        try:
+            finished = {item["task_id"] for item in status["items"] if item["status"] != "processing"}
+            yield format_sse("progress", status)
+            while len(finished) < status["total"]:
+                if await request.is_disconnected():
+                    return
+                event = await _next_event(queue)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event["task_id"] in finished:
+                    continue
+                finished.add(event["task_id"])
+                yield format_sse("item", event)
+            summary = await run_in_threadpool(get_batch_status, batch_id)
+            yield format_sse("completed", summary)
+        finally:
+            get_event_hub().unsubscribe(channel, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
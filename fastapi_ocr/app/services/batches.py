@@ -0,0 +1,127 @@
+from celery import states
+import redis
+import json
+import os
+import uuid
+import logging
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+from ..core.serialization import RESULT_EXPIRES
+from ..worker import process_invoice
+from .result_cache import get_result_cache, cached_reference, resolve_results
+from .blobs import commit_upload, release_blob
+from .dispatch import new_job
+from .routing import QUEUE_BATCH
+
+logger = logging.getLogger(__name__)
+
+# Batch manifests live as long as Celery keeps the task results
+BATCH_TTL = int(os.getenv('OCR_BATCH_TTL', RESULT_EXPIRES))
+BATCH_KEY_PREFIX = "ocr:batch"
+
+_redis_client: Optional[redis.Redis] = None
+
+
+def _get_redis() -> redis.Redis:
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+    return _redis_client
+
+
+def record_completed_task(result: Dict[str, Any]) -> str:
+    """
+    Store an already known result, or a reference to it, as a successful
+    task in the Celery result backend, so it can be looked up like any
+    other task without a worker
+    """
+    task_id = str(uuid.uuid4())
+    process_invoice.backend.store_result(task_id, result, states.SUCCESS)
+    return task_id
+
+
+def create_batch(items: List[Dict[str, str]]) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Register a batch of staged uploads.
+    Each item carries the original filename, staged file path and content hash.
+    Items already in the result cache complete immediately; the others are
+    committed as blobs. Returns the batch ID and the OCR jobs still to
+    dispatch, whose task IDs are already in the manifest. If registering
+    fails, the blobs committed so far are released.
+    """
+    cache = get_result_cache()
+    batch_id = str(uuid.uuid4())
+    manifest = []
+    jobs = []
+
+    try:
+        for item in items:
+            cached = cache.get(item["content_hash"])
+            if cached is not None:
+                Path(item["file_path"]).unlink(missing_ok=True)
+                manifest.append({"filename": item["filename"], "task_id": record_completed_task(
+                    cached_reference(item["content_hash"], cached)
+                )})
+            else:
+                blob = commit_upload(item["file_path"], item["content_hash"])
+                job = new_job(blob, item["content_hash"], batch_id=batch_id, queue=QUEUE_BATCH)
+                manifest.append({"filename": item["filename"], "task_id": job["task_id"]})
+                jobs.append(job)
+
+        # Store the manifest before dispatching so the batch can be queried as soon as tasks run
+        _get_redis().set(f"{BATCH_KEY_PREFIX}:{batch_id}", json.dumps(manifest), ex=BATCH_TTL)
+    except Exception:
+        # Nothing was queued; let go of the blobs committed so far
+        for job in jobs:
+            release_blob(job["blob"])
+        raise
+
+    logger.info(f"Created batch {batch_id}: {len(jobs)} to process, {len(manifest) - len(jobs)} from cache")
+    return batch_id, jobs
+
+
+def get_batch_status(batch_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Aggregate progress and per-item results of a batch.
+    All task states are fetched from the result backend in a single MGET,
+    and the cached results they reference in another.
+    Returns None for unknown or expired batches.
+    """
+    manifest = _get_redis().get(f"{BATCH_KEY_PREFIX}:{batch_id}")
+    if manifest is None:
+        return None
+    manifest = json.loads(manifest)
+
+    backend = process_invoice.backend
+    keys = [backend.get_key_for_task(entry["task_id"]) for entry in manifest]
+    metas = backend.mget(keys) if keys else []
+
+    metas = [backend.decode_result(raw_meta) if raw_meta else {"status": states.PENDING} for raw_meta in metas]
+    results = resolve_results([meta["result"] if meta["status"] == states.SUCCESS else None for meta in metas])
+
+    counts = {"done": 0, "failed": 0, "pending": 0}
+    items = []
+    for entry, meta, result in zip(manifest, metas, results):
+        item = {"filename": entry["filename"], "task_id": entry["task_id"]}
+
+        if meta["status"] == states.SUCCESS and result is None:
+            counts["failed"] += 1
+            item.update(status="failed", error="OCR result has expired")
+        elif meta["status"] == states.SUCCESS:
+            counts["done"] += 1
+            item.update(status="completed", data=result)
+        elif meta["status"] in states.PROPAGATE_STATES:
+            counts["failed"] += 1
+            item.update(status="failed", error=str(meta["result"]))
+        else:
+            counts["pending"] += 1
+            item.update(status="processing")
+        items.append(item)
+
+    return {
+        "batch_id": batch_id,
+        "status": "processing" if counts["pending"] else "completed",
+        "total": len(manifest),
+        **counts,
+        "items": items
+    }
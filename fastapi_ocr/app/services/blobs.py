@@ -0,0 +1,158 @@
+"""
+Hands uploaded invoices from the API to the OCR workers.
+
+An upload is streamed into a staging file of the configured store and, once
+its content hash is known, committed as a blob. A job carries a small blob
+descriptor rather than a file path:
+
+- "inline": the bytes themselves (base64), for uploads up to
+  OCR_BLOB_INLINE_MAX_BYTES; works across hosts and needs no cleanup
+- "shm": a content-addressed file on a tmpfs shared by the API and the
+  workers on one host (OCR_BLOB_SHM_DIR), so uploads never touch disk
+- "local": a content-addressed file in a directory shared with the
+  workers (OCR_BLOB_DIR)
+
+File blobs are reference counted in Redis, so identical uploads share one
+file. A job releases its reference only when its task has finished for
+good, which keeps the blob around for retries and redeliveries.
+"""
+import redis
+import base64
+import os
+import tempfile
+import uuid
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Iterator, Optional
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Where file blobs are committed: "shm" or "local"
+BLOB_STORE = os.getenv('OCR_BLOB_STORE', 'local')
+BLOB_DIR = os.getenv('OCR_BLOB_DIR', settings.UPLOAD_TEMP_DIR)
+BLOB_SHM_DIR = os.getenv('OCR_BLOB_SHM_DIR', '/dev/shm/thea-ocr')
+# Uploads up to this size travel inside the job; 0 disables inline blobs
+INLINE_MAX_BYTES = int(os.getenv('OCR_BLOB_INLINE_MAX_BYTES', 64 * 1024))
+# Safety net for reference counts of jobs that were lost entirely
+REFS_TTL = int(os.getenv('OCR_BLOB_REFS_TTL', 7 * 24 * 3600))
+
+REFS_KEY_PREFIX = "ocr:blob:refs"
+STAGING_PREFIX = "staging-"
+
+_redis_client: Optional[redis.Redis] = None
+
+
+def _get_redis() -> redis.Redis:
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+    return _redis_client
+
+
+class BlobStore:
+    """Content-addressed blob files in one directory, reference counted in Redis"""
+
+    def __init__(self, name: str, root: str):
+        self.name = name
+        self.root = Path(root)
+
+    def staging_dir(self) -> Path:
+        """Directory uploads are staged in, on the same filesystem as the blobs"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        return self.root
+
+    def staging_path(self, suffix: str) -> Path:
+        """A fresh path to stream an upload into before it is committed"""
+        return self.staging_dir() / f"{STAGING_PREFIX}{uuid.uuid4()}{suffix}"
+
+    def path(self, blob_id: str) -> Path:
+        return self.root / blob_id
+
+    def _refs_key(self, blob_id: str) -> str:
+        return f"{REFS_KEY_PREFIX}:{self.name}:{blob_id}"
+
+    def commit(self, staged: Path, content_hash: str) -> Dict[str, Any]:
+        """Move a staged upload to its content address and take a reference to it"""
+        blob_id = f"{content_hash}{staged.suffix.lower()}"
+        client = _get_redis()
+        # Serialises commits and releases of the same blob so a release that
+        # drops the last reference cannot delete a file that was just committed
+        with client.lock(f"{self._refs_key(blob_id)}:lock", timeout=30):
+            pipe = client.pipeline()
+            pipe.incr(self._refs_key(blob_id))
+            pipe.expire(self._refs_key(blob_id), REFS_TTL)
+            pipe.execute()
+            os.replace(staged, self.path(blob_id))
+        return {"store": self.name, "id": blob_id}
+
+    def release(self, blob_id: str):
+        """Drop a reference, deleting the blob with the last one"""
+        client = _get_redis()
+        with client.lock(f"{self._refs_key(blob_id)}:lock", timeout=30):
+            if client.decr(self._refs_key(blob_id)) > 0:
+                return
+            client.delete(self._refs_key(blob_id))
+            self.path(blob_id).unlink(missing_ok=True)
+        logger.info(f"Removed blob {self.name}:{blob_id}")
+
+
+_stores: Dict[str, BlobStore] = {}
+
+
+def get_blob_store(name: str = None) -> BlobStore:
+    """Return the named blob store, by default the one uploads are committed to"""
+    name = name or BLOB_STORE
+    if name not in _stores:
+        if name not in ("shm", "local"):
+            raise ValueError(f"Unknown blob store {name}")
+        _stores[name] = BlobStore(name, BLOB_SHM_DIR if name == "shm" else BLOB_DIR)
+    return _stores[name]
+
+
+def inline_blob(data: bytes, suffix: str) -> Dict[str, Any]:
+    """Blob descriptor carrying the content itself"""
+    return {"store": "inline", "suffix": suffix.lower(), "data": base64.b64encode(data).decode()}
+
+
+def commit_upload(staged: Path, content_hash: str) -> Dict[str, Any]:
+    """Turn a staged upload into a blob descriptor for its OCR job"""
+    staged = Path(staged)
+    if staged.stat().st_size <= INLINE_MAX_BYTES:
+        data = staged.read_bytes()
+        staged.unlink()
+        return inline_blob(data, staged.suffix)
+    return get_blob_store().commit(staged, content_hash)
+
+
+@contextmanager
+def open_blob(blob: Dict[str, Any]) -> Iterator[str]:
+    """
+    Yield a local file path with the blob's content. File blobs are read in
+    place; inline blobs are written to a temporary file for the duration.
+    """
+    if blob["store"] != "inline":
+        yield str(get_blob_store(blob["store"]).path(blob["id"]))
+        return
+
+    # Prefer tmpfs so small inline blobs never reach the disk either
+    directory = BLOB_SHM_DIR if Path(BLOB_SHM_DIR).parent.is_dir() else None
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    handle, path = tempfile.mkstemp(suffix=blob["suffix"], dir=directory)
+    try:
+        with os.fdopen(handle, "wb") as out:
+            out.write(base64.b64decode(blob["data"]))
+        yield path
+    finally:
+        os.unlink(path)
+
+
+def release_blob(blob: Dict[str, Any]):
+    """Release a finished job's reference to its blob"""
+    try:
+        if blob["store"] != "inline":
+            get_blob_store(blob["store"]).release(blob["id"])
+    except Exception as e:
+        logger.warning(f"Could not release blob {blob}: {e}")
@@ -0,0 +1,58 @@
+from celery import group
+from fastapi.concurrency import run_in_threadpool
+import logging
+import uuid
+from typing import Dict, Any, List, Optional
+from ..worker import process_invoice
+from ..core.config import settings
+from .rabbitmq import get_rabbitmq
+from .routing import QUEUE_FAST, time_limits
+
+logger = logging.getLogger(__name__)
+
+
+def new_job(blob: Dict[str, Any], content_hash: str, invoice_id: str = None, batch_id: str = None,
+            queue: str = QUEUE_FAST, pages: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Describe one OCR job on an uploaded blob (see services.blobs); the task
+    ID is assigned up front so it can be tracked.
+    queue is the Celery queue chosen for it by services.routing, and pages
+    the number of pages to OCR when known, which sizes its time limits.
+    """
+    return {
+        "task_id": str(uuid.uuid4()),
+        "blob": blob,
+        "content_hash": content_hash,
+        "invoice_id": invoice_id,
+        "batch_id": batch_id,
+        "queue": queue,
+        "pages": pages
+    }
+
+
+async def dispatch_ocr_jobs(jobs: List[Dict[str, Any]]):
+    """
+    Hand OCR jobs to the configured transport (OCR_TASK_TRANSPORT).
+    "celery" queues process_invoice tasks through the Celery broker on each
+    job's queue, with time limits sized to its pages;
+    "rabbitmq" publishes them to the ocr_tasks queue in one confirmed batch,
+    for the consumer in app.services.ocr_consumer.
+    Either way results land in the Celery result backend under the job's task ID.
+    """
+    if not jobs:
+        return
+
+    if settings.OCR_TASK_TRANSPORT == "rabbitmq":
+        await get_rabbitmq().publish(jobs)
+        return
+
+    signatures = [
+        process_invoice.s(
+            job["blob"],
+            content_hash=job["content_hash"],
+            invoice_id=job["invoice_id"],
+            batch_id=job["batch_id"]
+        ).set(task_id=job["task_id"], queue=job["queue"], **time_limits(job["queue"], job["pages"]))
+        for job in jobs
+    ]
+    await run_in_threadpool(group(signatures).apply_async)
@@ -0,0 +1,181 @@
+import re
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple, Pattern
+
+# Field patterns in priority order: for each field the leftmost match of the
+# first pattern wins, falling back to the next pattern when a value fails to parse
+DATE = r'(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})'
+AMOUNT = r'[\$€£]?\s*(\d+[.,]\d{2})'
+
+FIELD_PATTERNS: Dict[str, List[str]] = {
+    "invoiceNumber": [
+        r'Invoice\s*#?\s*(\d+)',
+        r'Invoice\s*Number\s*:?\s*(\d+)',
+        r'Invoice\s*ID\s*:?\s*(\d+)'
+    ],
+    "date": [
+        r'Date\s*:?\s*' + DATE,
+        r'Invoice\s*Date\s*:?\s*' + DATE,
+    ],
+    "dueDate": [
+        r'Due\s*Date\s*:?\s*' + DATE,
+        r'Payment\s*Due\s*:?\s*' + DATE
+    ],
+    "totalAmount": [
+        r'Total\s*:?\s*' + AMOUNT,
+        r'Amount\s*Due\s*:?\s*' + AMOUNT
+    ],
+    "taxAmount": [
+        r'Tax\s*:?\s*' + AMOUNT,
+        r'VAT\s*:?\s*' + AMOUNT
+    ],
+    "clientId": [
+        r'Client\s*ID\s*:?\s*(\w+)',
+        r'Customer\s*ID\s*:?\s*(\w+)'
+    ],
+    "projectId": [
+        r'Project\s*ID\s*:?\s*(\w+)',
+        r'Project\s*Number\s*:?\s*(\w+)'
+    ],
+    "description": [
+        r'Description\s*:?\s*([^\n]+)',
+        r'Details\s*:?\s*([^\n]+)'
+    ],
+}
+
+# Every field pattern starts with a literal keyword; index the compiled
+# patterns by that keyword so only the relevant ones run at each hit
+_KEYWORD_PATTERNS: Dict[str, List[Tuple[str, int, Pattern]]] = {}
+for _field, _patterns in FIELD_PATTERNS.items():
+    for _priority, _pattern in enumerate(_patterns):
+        _keyword = re.match(r'[A-Za-z]+', _pattern).group().lower()
+        _KEYWORD_PATTERNS.setdefault(_keyword, []).append(
+            (_field, _priority, re.compile(_pattern, re.IGNORECASE))
+        )
+
+# Item lines look like "<description> <qty> x <price>" (case-sensitive 'x')
+_ITEM_LINE = re.compile(r'\d+\s*x\s*[\$€£]?\s*\d+[.,]\d{2}')
+_ITEM_QUANTITY = re.compile(r'(\d+)\s*x')
+_ITEM_PRICE = re.compile(r'[\$€£]?\s*(\d+[.,]\d{2})')
+_ITEM_DESCRIPTION = re.compile(r'([a-zA-Z].+?)\s+\d+\s*x')
+
+# Single scanner over the lower-cased text. A flat alternation of literals
+# lets the regex engine skip ahead by first character; "x" hits mark
+# candidate item lines
+_SCANNER = re.compile('|'.join(sorted(_KEYWORD_PATTERNS) + ['x']))
+# Fallback when lower-casing changes the text length (rare non-ASCII input)
+_SCANNER_IGNORECASE = re.compile(_SCANNER.pattern, re.IGNORECASE)
+
+
+def _parse_date(value: str) -> str:
+    return datetime.strptime(value, "%d/%m/%Y").isoformat()
+
+
+def _parse_amount(value: str) -> float:
+    return float(value.replace(',', '.'))
+
+
+FIELD_PARSERS = {
+    "date": _parse_date,
+    "dueDate": _parse_date,
+    "totalAmount": _parse_amount,
+    "taxAmount": _parse_amount,
+    "description": str.strip,
+}
+
+
+def _field_defaults() -> Dict[str, Any]:
+    return {
+        "invoiceNumber": "Unknown",
+        "date": datetime.now().isoformat(),
+        "dueDate": None,
+        "totalAmount": 0.0,
+        "taxAmount": 0.0,
+        "clientId": "Unknown",
+        "projectId": None,
+        "description": None,
+    }
+
+
+def _parse_item_line(line: str) -> Optional[Dict[str, Any]]:
+    if not _ITEM_LINE.search(line):
+        return None
+
+    qty_match = _ITEM_QUANTITY.search(line)
+    price_match = _ITEM_PRICE.search(line)
+    if not (qty_match and price_match):
+        return None
+
+    desc_match = _ITEM_DESCRIPTION.search(line)
+    quantity = int(qty_match.group(1))
+    unit_price = _parse_amount(price_match.group(1))
+    return {
+        "description": desc_match.group(1) if desc_match else "Unknown item",
+        "quantity": quantity,
+        "unitPrice": unit_price,
+        "totalPrice": unit_price * quantity
+    }
+
+
+def extract_invoice_data(text: str) -> Dict[str, Any]:
+    """
+    Extract every invoice field from OCR text in a single scan.
+    Produces the same values as the per-field extract_* helpers.
+    """
+    # First (leftmost) match value for each (field, pattern priority)
+    candidates: Dict[Tuple[str, int], str] = {}
+    items: List[Dict[str, Any]] = []
+    item_line_end = -1
+
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        hits = _SCANNER.finditer(lowered)
+    else:
+        hits = _SCANNER_IGNORECASE.finditer(text)
+
+    for hit in hits:
+        position = hit.start()
+        keyword = hit.group().lower()
+
+        if keyword != 'x':
+            for field, priority, pattern in _KEYWORD_PATTERNS[keyword]:
+                if (field, priority) in candidates:
+                    continue
+                match = pattern.match(text, position)
+                if match:
+                    candidates[(field, priority)] = match.group(1)
+        elif position > item_line_end:
+            # Items are matched per line, once per line
+            line_start = text.rfind('\n', 0, position) + 1
+            item_line_end = text.find('\n', position)
+            if item_line_end == -1:
+                item_line_end = len(text)
+            item = _parse_item_line(text[line_start:item_line_end])
+            if item:
+                items.append(item)
+
+    invoice_data = _field_defaults()
+    for field, patterns in FIELD_PATTERNS.items():
+        parse = FIELD_PARSERS.get(field)
+        for priority in range(len(patterns)):
+            value = candidates.get((field, priority))
+            if value is None:
+                continue
+            try:
+                invoice_data[field] = parse(value) if parse else value
+                break
+            except ValueError:
+                continue
+
+    return {
+        "invoiceNumber": invoice_data["invoiceNumber"],
+        "date": invoice_data["date"],
+        "dueDate": invoice_data["dueDate"],
+        "totalAmount": invoice_data["totalAmount"],
+        "taxAmount": invoice_data["taxAmount"],
+        "status": "PENDING",  # Default status
+        "clientId": invoice_data["clientId"],
+        "projectId": invoice_data["projectId"],
+        "description": invoice_data["description"],
+        "items": items
+    }
@@ -0,0 +1,312 @@
+import numpy as np
+import os
+import re
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+from .extraction import FIELD_PATTERNS, FIELD_PARSERS, DATE, extract_invoice_data
+from .ocr_engine import get_ocr_engine
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# "text" OCRs whole pages into one string; "layout" reads words with their
+# positions and confidences and re-reads uncertain fields region by region;
+# "tiered" reads layouts in passes of increasing cost (see page_ocr)
+OCR_MODE = os.getenv('OCR_MODE', 'text')
+# Fields a tiered pass must read above the threshold for the invoice to be done
+REQUIRED_FIELDS = [
+    field.strip()
+    for field in os.getenv('OCR_REQUIRED_FIELDS', 'invoiceNumber,totalAmount,date').split(',')
+    if field.strip()
+]
+
+# Looked up in the totals region; every other field in the header region
+TOTAL_FIELDS = ["totalAmount", "taxAmount"]
+
+# Single text line (psm 7) restricted to the characters the field can contain
+DIGITS = "0123456789"
+FIELD_OCR_CONFIGS = {
+    "invoiceNumber": f"--psm 7 -c tessedit_char_whitelist={DIGITS}",
+    "date": f"--psm 7 -c tessedit_char_whitelist={DIGITS}/-",
+    "dueDate": f"--psm 7 -c tessedit_char_whitelist={DIGITS}/-",
+    "totalAmount": f"--psm 7 -c tessedit_char_whitelist={DIGITS}.,",
+    "taxAmount": f"--psm 7 -c tessedit_char_whitelist={DIGITS}.,",
+}
+_AMOUNT_VALUE = re.compile(r'\d+[.,]\d{2}')
+_DATE_VALUE = re.compile(DATE)
+FIELD_VALUE_PATTERNS = {
+    "invoiceNumber": re.compile(r'\d+'),
+    "date": _DATE_VALUE,
+    "dueDate": _DATE_VALUE,
+    "totalAmount": _AMOUNT_VALUE,
+    "taxAmount": _AMOUNT_VALUE,
+}
+
+_FIELD_REGEXES = {
+    field: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+    for field, patterns in FIELD_PATTERNS.items()
+}
+# A line naming at least two of these columns starts the line-item table
+TABLE_HEADER_WORDS = {"description", "item", "items", "qty", "quantity", "price", "unit", "amount"}
+_TOTALS_LINE = re.compile(r'^\s*(sub\s*total|total|tax|vat|amount\s*due)', re.IGNORECASE)
+_CELL_NUMBER = re.compile(r'^[\$€£]?(\d+(?:[.,]\d{2})?)$')
+_CELL_QUANTITY = re.compile(r'^(\d+)\s*x$', re.IGNORECASE)
+
+
+def group_lines(words: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Group words into visual lines by vertical position, left to right.
+    Unlike Tesseract's own line numbers this keeps a label and a value that
+    are far apart on the same row (e.g. "Total" ... "$99.00") together.
+    """
+    lines: List[Dict[str, Any]] = []
+    for word in sorted(words, key=lambda word: (word["box"][1] + word["box"][3]) / 2):
+        left, top, right, bottom = word["box"]
+        center = (top + bottom) / 2
+        if lines:
+            line = lines[-1]
+            if abs(center - line["center"]) <= line["height"] / 2:
+                line["words"].append(word)
+                continue
+        lines.append({"words": [word], "center": center, "height": max(bottom - top, 1)})
+
+    for line in lines:
+        line["words"].sort(key=lambda word: word["box"][0])
+        line["text"] = " ".join(word["text"] for word in line["words"])
+    return lines
+
+
+def read_lines(page: np.ndarray, dpi: float) -> List[Dict[str, Any]]:
+    """OCR a page into lines of words with boxes and confidences"""
+    data = get_ocr_engine().image_to_data(page, config=f"--dpi {int(dpi)}")
+    words = []
+    for index, text in enumerate(data["text"]):
+        confidence = float(data["conf"][index])
+        if confidence < 0 or not text.strip():
+            continue
+        left, top = data["left"][index], data["top"][index]
+        words.append({
+            "text": text.strip(),
+            "confidence": confidence / 100,
+            "box": (left, top, left + data["width"][index], top + data["height"][index])
+        })
+    return group_lines(words)
+
+
+def find_regions(lines: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Split a page into header, line-item and totals regions.
+    The item table starts after a line naming its columns; totals start at
+    the first line opening with a total, tax or amount due label after it.
+    """
+    table_start = None
+    for index, line in enumerate(lines):
+        columns = {word["text"].lower().strip(":.") for word in line["words"]}
+        if len(columns & TABLE_HEADER_WORDS) >= 2 and not _TOTALS_LINE.match(line["text"]):
+            table_start = index
+            break
+
+    search_from = table_start + 1 if table_start is not None else 0
+    totals_start = next(
+        (index for index in range(search_from, len(lines)) if _TOTALS_LINE.match(lines[index]["text"])),
+        len(lines)
+    )
+
+    if table_start is None:
+        return {"header": lines[:totals_start], "items": [], "totals": lines[totals_start:]}
+    return {
+        "header": lines[:table_start],
+        "items": lines[table_start + 1:totals_start],
+        "totals": lines[totals_start:]
+    }
+
+
+def parse_table_rows(lines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Read line items from the table region by column: the trailing numeric
+    cells of a row are its quantity, unit price and line total, the words
+    before them its description. Rows without numbers continue the
+    description of the previous item.
+    """
+    items = []
+    for line in lines:
+        cells = [word["text"] for word in line["words"]]
+        numbers: List[str] = []
+        while cells:
+            number = _CELL_NUMBER.match(cells[-1]) or _CELL_QUANTITY.match(cells[-1])
+            if number is None and cells[-1].lower() != "x":
+                break
+            cells.pop()
+            if number is not None:
+                numbers.insert(0, number.group(1))
+
+        amounts = [value for value in numbers if not value.isdigit()]
+        if not amounts:
+            if items and cells:
+                items[-1]["description"] += " " + " ".join(cells)
+            continue
+
+        counts = [value for value in numbers if value.isdigit()]
+        quantity = int(counts[0]) if counts else 1
+        total_price = float(amounts[-1].replace(',', '.'))
+        if len(amounts) > 1:
+            unit_price = float(amounts[-2].replace(',', '.'))
+        else:
+            unit_price = round(total_price / quantity, 2) if quantity else total_price
+        items.append({
+            "description": " ".join(cells) or "Unknown item",
+            "quantity": quantity,
+            "unitPrice": unit_price,
+            "totalPrice": total_price
+        })
+    return items
+
+
+def _words_in_span(line: Dict[str, Any], start: int, end: int) -> List[Dict[str, Any]]:
+    """Words of a line overlapping the character span [start, end) of its text"""
+    words, offset = [], 0
+    for word in line["words"]:
+        word_end = offset + len(word["text"])
+        if offset < end and word_end > start:
+            words.append(word)
+        offset = word_end + 1
+    return words
+
+
+def locate_field(field: str, lines: List[Dict[str, Any]]) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+    """Find a field's raw value and the words it was read from, in pattern priority order"""
+    for pattern in _FIELD_REGEXES[field]:
+        for line in lines:
+            match = pattern.search(line["text"])
+            if match:
+                return match.group(1), _words_in_span(line, *match.span(1))
+    return None
+
+
+def reread_field(page: np.ndarray, field: str, words: List[Dict[str, Any]], dpi: float) -> Optional[Tuple[str, float]]:
+    """
+    OCR just the words of a field again, as a single line restricted to the
+    characters the field can contain. Returns the value and its confidence.
+    """
+    left = min(word["box"][0] for word in words)
+    top = min(word["box"][1] for word in words)
+    right = max(word["box"][2] for word in words)
+    bottom = max(word["box"][3] for word in words)
+    padding = max((bottom - top) // 3, 2)
+    region = page[max(top - padding, 0):bottom + padding, max(left - padding, 0):right + padding]
+
+    data = get_ocr_engine().image_to_data(region, config=f"{FIELD_OCR_CONFIGS[field]} --dpi {int(dpi)}")
+    tokens = [
+        (text.strip(), float(confidence) / 100)
+        for text, confidence in zip(data["text"], data["conf"])
+        if float(confidence) >= 0 and text.strip()
+    ]
+    if not tokens:
+        return None
+    match = FIELD_VALUE_PATTERNS[field].search("".join(text for text, _ in tokens))
+    if match is None:
+        return None
+    return match.group(0), min(confidence for _, confidence in tokens)
+
+
+def analyze_lines(lines: List[Dict[str, Any]], page: Optional[np.ndarray] = None, dpi: float = None) -> Dict[str, Any]:
+    """
+    Read the invoice fields and table rows from the lines of a page.
+    Header fields are looked up in the header region and totals in the
+    totals region. When the page image is given, fields read with a
+    confidence below the threshold are re-read with a field-specific
+    configuration. Returns the page text, the located fields with their
+    confidences and the table rows.
+    """
+    regions = find_regions(lines)
+
+    fields = {}
+    rereads = 0
+    for field in FIELD_PATTERNS:
+        region = regions["totals"] if field in TOTAL_FIELDS else regions["header"]
+        located = locate_field(field, region) or locate_field(field, lines)
+        if located is None:
+            continue
+        value, words = located
+        confidence = min(word["confidence"] for word in words)
+        if page is not None and confidence < settings.OCR_CONFIDENCE_THRESHOLD and field in FIELD_OCR_CONFIGS:
+            rereads += 1
+            reread = reread_field(page, field, words, dpi)
+            if reread is not None and reread[1] > confidence:
+                value, confidence = reread
+        fields[field] = {"value": value, "confidence": confidence}
+
+    logger.debug(f"Layout analysis read {len(lines)} line(s), {len(fields)} field(s), re-read {rereads}")
+    return {
+        "text": "\n".join(line["text"] for line in lines),
+        "fields": fields,
+        "items": parse_table_rows(regions["items"])
+    }
+
+
+def analyze_page(page: np.ndarray, dpi: float, reread: bool = True) -> Dict[str, Any]:
+    """Layout-aware OCR of one preprocessed page, re-reading uncertain fields unless told not to"""
+    return analyze_lines(read_lines(page, dpi), page if reread else None, dpi)
+
+
+def analyze_text_layer(words: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Layout analysis of a page from the words of its PDF text layer, without OCR"""
+    return analyze_lines(group_lines(words))
+
+
+def locate_fields(pages: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Fields of an invoice across its pages: header fields from the first page that has them, totals from the last"""
+    located = {}
+    for page in pages:
+        for field, entry in page["fields"].items():
+            if field in TOTAL_FIELDS or field not in located:
+                located[field] = entry
+    return located
+
+
+def uncertain_fields(pages: List[Dict[str, Any]]) -> List[str]:
+    """Required fields the analyzed pages lack, cannot parse or read below the threshold"""
+    located = locate_fields(pages)
+    uncertain = []
+    for field in REQUIRED_FIELDS:
+        entry = located.get(field)
+        if entry is None or entry["confidence"] < settings.OCR_CONFIDENCE_THRESHOLD:
+            uncertain.append(field)
+            continue
+        parse = FIELD_PARSERS.get(field)
+        try:
+            if parse:
+                parse(entry["value"])
+        except ValueError:
+            uncertain.append(field)
+    return uncertain
+
+
+def extract_invoice_data_from_layout(pages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Build the invoice from analyzed pages. Starts from the regular text
+    extraction and overrides it with the fields located on the pages
+    (header fields from the first page that has them, totals from the last)
+    and with the table rows. Adds the confidence of each located field and
+    lists those below OCR_CONFIDENCE_THRESHOLD under lowConfidenceFields.
+    """
+    invoice_data = extract_invoice_data("\n".join(page["text"] for page in pages))
+    located = locate_fields(pages)
+
+    confidence = {}
+    for field, entry in located.items():
+        parse = FIELD_PARSERS.get(field)
+        try:
+            invoice_data[field] = parse(entry["value"]) if parse else entry["value"]
+        except ValueError:
+            continue
+        confidence[field] = round(entry["confidence"], 2)
+
+    items = [item for page in pages for item in page["items"]]
+    if items:
+        invoice_data["items"] = items
+    invoice_data["confidence"] = confidence
+    invoice_data["lowConfidenceFields"] = [
+        field for field, score in confidence.items() if score < settings.OCR_CONFIDENCE_THRESHOLD
+    ]
+    return invoice_data
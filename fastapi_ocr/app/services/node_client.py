@@ -0,0 +1,169 @@
+import httpx
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Set, Tuple
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def _is_retryable(error: BaseException) -> bool:
+    """Retry transport errors, throttling and server errors"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return False
+
+
+class NodeBackendClient:
+    """
+    Application-lifetime HTTP client for pushing OCR results to the Node.js
+    backend. Connections are pooled and kept alive (HTTP/2 when h2 is
+    installed), in-flight requests are bounded, failed requests are retried
+    with exponential backoff, and results that arrive within a short window
+    are coalesced into one bulk request.
+    """
+
+    def __init__(self):
+        self.client = httpx.AsyncClient(
+            base_url=settings.NODE_BACKEND_URL,
+            headers={"Authorization": f"Bearer {settings.API_KEY}"},
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=settings.NODE_CALLBACK_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.NODE_CALLBACK_MAX_CONNECTIONS
+            ),
+            timeout=httpx.Timeout(10.0)
+        )
+        self.semaphore = asyncio.Semaphore(settings.NODE_CALLBACK_MAX_CONNECTIONS)
+        self.pending: List[Tuple[str, Dict[str, Any], asyncio.Future]] = []
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.deliveries: Set[asyncio.Task] = set()
+        self.bulk_supported = True
+
+    async def send_ocr_result(self, invoice_id: str, data: Dict[str, Any]):
+        """
+        Deliver an OCR result, waiting until it has been accepted.
+        Results sent within NODE_CALLBACK_BATCH_WINDOW_MS of each other share
+        one bulk request.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((invoice_id, data, future))
+
+        if len(self.pending) >= settings.NODE_CALLBACK_BATCH_SIZE:
+            self._flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(
+                settings.NODE_CALLBACK_BATCH_WINDOW_MS / 1000, self._flush
+            )
+
+        await future
+
+    def _flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.pending = self.pending, []
+        if batch:
+            delivery = asyncio.create_task(self._deliver(batch))
+            self.deliveries.add(delivery)
+            delivery.add_done_callback(self.deliveries.discard)
+
+    async def send_ocr_results(self, results: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Deliver a batch of (invoice_id, data) results already gathered by the
+        caller, in one bulk request when the backend has the endpoint.
+        Returns the results that were not accepted.
+        """
+        try:
+            errors = await self._send(results)
+        except Exception as e:
+            errors = [e] * len(results)
+        for (invoice_id, _), error in zip(results, errors):
+            if error is not None:
+                logger.warning(f"Could not deliver OCR result for invoice {invoice_id}: {error}")
+        return [result for result, error in zip(results, errors) if error is not None]
+
+    async def _send(self, results: List[Tuple[str, Dict[str, Any]]]) -> List[Optional[BaseException]]:
+        """Send results, returning the error of each, or None when it was accepted"""
+        if len(results) > 1 and self.bulk_supported and await self._deliver_bulk(results):
+            return [None] * len(results)
+        outcomes = await asyncio.gather(
+            *(self._post(f"/api/invoices/{invoice_id}/ocr-result", data) for invoice_id, data in results),
+            return_exceptions=True
+        )
+        return [outcome if isinstance(outcome, BaseException) else None for outcome in outcomes]
+
+    async def _deliver(self, batch: List[Tuple[str, Dict[str, Any], asyncio.Future]]):
+        try:
+            errors = await self._send([(invoice_id, data) for invoice_id, data, _ in batch])
+        except Exception as e:
+            errors = [e] * len(batch)
+        for (_, _, future), error in zip(batch, errors):
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+
+    async def _deliver_bulk(self, results: List[Tuple[str, Dict[str, Any]]]) -> bool:
+        """Send results in one request; False if the backend has no bulk endpoint"""
+        try:
+            await self._post(
+                "/api/invoices/ocr-results",
+                {"results": [{"invoiceId": invoice_id, "data": data} for invoice_id, data in results]}
+            )
+            logger.info(f"Delivered {len(results)} OCR results in one bulk request")
+            return True
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code in (404, 405):
+                logger.info("Node backend has no bulk OCR result endpoint, delivering individually")
+                self.bulk_supported = False
+                return False
+            raise
+
+    @retry(
+        retry=retry_if_exception(_is_retryable),
+        stop=stop_after_attempt(settings.NODE_CALLBACK_MAX_RETRIES),
+        wait=wait_exponential(multiplier=0.5, max=8),
+        reraise=True
+    )
+    async def _post(self, path: str, payload: Dict[str, Any]):
+        async with self.semaphore:
+            response = await self.client.post(path, json=payload)
+        response.raise_for_status()
+
+    async def close(self):
+        """Deliver whatever is still queued, then release the connections"""
+        self._flush()
+        if self.deliveries:
+            await asyncio.gather(*self.deliveries, return_exceptions=True)
+        await self.client.aclose()
+
+
+_node_client: Optional[NodeBackendClient] = None
+
+
+def get_node_client() -> NodeBackendClient:
+    """Return the application-wide Node.js backend client"""
+    global _node_client
+    if _node_client is None:
+        _node_client = NodeBackendClient()
+    return _node_client
+
+
+async def close_node_client():
+    global _node_client
+    if _node_client is not None:
+        await _node_client.close()
+        _node_client = None
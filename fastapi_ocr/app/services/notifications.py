@@ -0,0 +1,127 @@
+import redis
+import redis.asyncio as aioredis
+import asyncio
+import json
+import os
+import logging
+from typing import Dict, Any, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL_PREFIX = "ocr:events"
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+# Seconds between SSE keep-alive comments when no event arrives
+SSE_HEARTBEAT_INTERVAL = int(os.getenv('OCR_SSE_HEARTBEAT_INTERVAL', 15))
+SUBSCRIBE_TIMEOUT = 5
+
+
+def task_channel(task_id: str) -> str:
+    return f"{EVENTS_CHANNEL_PREFIX}:task:{task_id}"
+
+
+def batch_channel(batch_id: str) -> str:
+    return f"{EVENTS_CHANNEL_PREFIX}:batch:{batch_id}"
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format a Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+_publisher: Optional[redis.Redis] = None
+
+
+def publish_task_event(task_id: str, event: Dict[str, Any], batch_id: str = None):
+    """
+    Announce a task completion on its channel, and on its batch channel when
+    it belongs to a batch. Called from the Celery worker.
+    """
+    global _publisher
+    try:
+        if _publisher is None:
+            _publisher = redis.Redis.from_url(REDIS_URL)
+        message = json.dumps({"task_id": task_id, **event})
+        _publisher.publish(task_channel(task_id), message)
+        if batch_id:
+            _publisher.publish(batch_channel(batch_id), message)
+    except Exception as e:
+        logger.warning(f"Could not publish completion event for task {task_id}: {e}")
+
+
+class EventHub:
+    """
+    Fans completion events out to the SSE streams of this API process.
+    A single Redis pattern subscription serves every connected client, so
+    Redis connections do not grow with the number of listeners.
+    """
+
+    def __init__(self, redis_url: str = REDIS_URL):
+        self.redis_url = redis_url
+        self.listeners: Dict[str, Set[asyncio.Queue]] = {}
+        self._reader: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+
+    async def subscribe(self, channel: str) -> asyncio.Queue:
+        """Register a queue that receives every event published on channel"""
+        if self._reader is None or self._reader.done():
+            self._ready.clear()
+            self._reader = asyncio.create_task(self._read_events())
+        queue = asyncio.Queue()
+        self.listeners.setdefault(channel, set()).add(queue)
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=SUBSCRIBE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.unsubscribe(channel, queue)
+            raise ConnectionError("OCR event stream is unavailable")
+        return queue
+
+    def unsubscribe(self, channel: str, queue: asyncio.Queue):
+        queues = self.listeners.get(channel)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.listeners[channel]
+
+    async def _read_events(self):
+        while True:
+            client = aioredis.from_url(self.redis_url)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.psubscribe(f"{EVENTS_CHANNEL_PREFIX}:*")
+                self._ready.set()
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    channel = message["channel"].decode()
+                    event = json.loads(message["data"])
+                    for queue in list(self.listeners.get(channel, ())):
+                        queue.put_nowait(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._ready.clear()
+                logger.warning(f"OCR event subscription lost, reconnecting: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+                await client.aclose()
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+
+
+_event_hub: Optional[EventHub] = None
+
+
+def get_event_hub() -> EventHub:
+    """Return the process-wide event hub"""
+    global _event_hub
+    if _event_hub is None:
+        _event_hub = EventHub()
+    return _event_hub
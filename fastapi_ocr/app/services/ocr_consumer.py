@@ -0,0 +1,116 @@
+"""
+RabbitMQ-native OCR worker.
+
+Consumes the jobs published to the ocr_tasks queue when OCR_TASK_TRANSPORT is
+"rabbitmq" and runs the OCR pipeline in-process, without a Celery worker in
+between. Results, completion events and webhooks are the same as for Celery
+tasks, so the API endpoints work unchanged. Run it with:
+
+    python -m app.services.ocr_consumer
+"""
+from celery import states
+import aio_pika
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import logging
+from typing import Dict, Any
+from ..worker import process_invoice
+from ..core.config import settings
+from ..core.metrics import start_metrics_server
+from .notifications import publish_task_event
+from .result_cache import resolve_result
+from .blobs import release_blob
+from .node_client import get_node_client, close_node_client
+from .rabbitmq import init_rabbitmq, close_rabbitmq, OCR_TASKS_QUEUE
+
+logger = logging.getLogger(__name__)
+
+
+def run_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Process one job and record the outcome under its task ID, exactly as a
+    Celery worker would: result backend entry plus completion event.
+    Returns the invoice data.
+    """
+    task_id = job["task_id"]
+    backend = process_invoice.backend
+    blob = job["blob"]
+    try:
+        # Calling the task directly runs it in this process
+        result = process_invoice(blob, content_hash=job.get("content_hash"))
+    except Exception as e:
+        backend.store_result(task_id, e, states.FAILURE)
+        publish_task_event(task_id, {"status": "failed", "error": str(e)}, batch_id=job.get("batch_id"))
+        raise
+    finally:
+        # Failed jobs are not requeued, so the job is finished either way
+        release_blob(blob)
+
+    backend.store_result(task_id, result, states.SUCCESS)
+    data = resolve_result(result)
+    publish_task_event(task_id, {"status": "completed", "data": data}, batch_id=job.get("batch_id"))
+    return data
+
+
+async def handle_message(message: aio_pika.abc.AbstractIncomingMessage, executor: ThreadPoolExecutor):
+    """
+    Run the job carried by a message. The message is acknowledged once the
+    result is recorded; jobs that fail are rejected without requeueing, as
+    their failure has already been recorded.
+    """
+    async with message.process(requeue=False, ignore_processed=True):
+        job = json.loads(message.body)
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(executor, run_job, job)
+        except Exception as e:
+            logger.error(f"OCR job {job.get('task_id')} failed: {str(e)}")
+            await message.reject(requeue=False)
+            return
+
+        if job.get("invoice_id"):
+            try:
+                await get_node_client().send_ocr_result(job["invoice_id"], result)
+            except Exception as e:
+                logger.error(f"Could not deliver OCR result for invoice {job['invoice_id']}: {str(e)}")
+
+
+async def consume():
+    """Consume ocr_tasks until cancelled, running up to OCR_CONSUMER_CONCURRENCY jobs at once"""
+    rabbitmq = await init_rabbitmq()
+    connection = await rabbitmq.connect()
+    channel = await connection.channel()
+    # The broker holds back further deliveries while every slot is busy
+    await channel.set_qos(prefetch_count=settings.OCR_CONSUMER_CONCURRENCY)
+    queue = await channel.declare_queue(OCR_TASKS_QUEUE, durable=True)
+
+    executor = ThreadPoolExecutor(max_workers=settings.OCR_CONSUMER_CONCURRENCY)
+    running = set()
+    # Jobs run in this process, so it serves its own pipeline metrics
+    start_metrics_server()
+    logger.info(f"Consuming {OCR_TASKS_QUEUE} with concurrency {settings.OCR_CONSUMER_CONCURRENCY}")
+    try:
+        async with queue.iterator() as messages:
+            async for message in messages:
+                handler = asyncio.create_task(handle_message(message, executor))
+                running.add(handler)
+                handler.add_done_callback(running.discard)
+    finally:
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+        executor.shutdown()
+        await channel.close()
+        await close_node_client()
+        await close_rabbitmq()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    try:
+        asyncio.run(consume())
+    except KeyboardInterrupt:
+        pass
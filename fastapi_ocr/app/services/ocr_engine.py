@@ -0,0 +1,145 @@
+import pytesseract
+from pytesseract import Output
+import numpy as np
+import os
+import shlex
+import threading
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+# "tesserocr" keeps Tesseract loaded in-process, "pytesseract" runs the
+# tesseract binary per call; "auto" uses tesserocr when it is installed
+OCR_ENGINE = os.getenv('OCR_ENGINE', 'auto')
+TESSERACT_LANG = os.getenv('TESSERACT_LANG', 'eng')
+
+# Page segmentation mode Tesseract uses when the config names none (PSM_AUTO)
+DEFAULT_PSM = 3
+
+
+def parse_config(config: str) -> Tuple[int, Optional[int], Tuple[Tuple[str, str], ...]]:
+    """Split a tesseract command line config into (psm, dpi, variables)"""
+    psm, dpi, variables = DEFAULT_PSM, None, []
+    tokens = shlex.split(config)
+    for index, token in enumerate(tokens[:-1]):
+        value = tokens[index + 1]
+        if token == "--psm":
+            psm = int(value)
+        elif token == "--dpi":
+            dpi = int(value)
+        elif token == "-c":
+            name, _, setting = value.partition("=")
+            variables.append((name, setting))
+    return psm, dpi, tuple(variables)
+
+
+class PytesseractEngine:
+    """
+    Runs the tesseract binary for every call: the image goes through a temp
+    file and the language data is loaded each time
+    """
+    name = "pytesseract"
+
+    def image_to_string(self, image: np.ndarray, config: str = "") -> str:
+        return pytesseract.image_to_string(image, lang=TESSERACT_LANG, config=config)
+
+    def image_to_data(self, image: np.ndarray, config: str = "") -> Dict[str, List[Any]]:
+        return pytesseract.image_to_data(image, lang=TESSERACT_LANG, config=config, output_type=Output.DICT)
+
+
+class TesserocrEngine:
+    """
+    Keeps initialised Tesseract API handles in the process and hands them
+    image buffers directly, with no subprocess, temp file or language data
+    reload per call. Handles are not thread-safe, so each thread keeps its
+    own, one per page segmentation mode and variable set.
+    """
+    name = "tesserocr"
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _api(self, psm: int, variables: Tuple[Tuple[str, str], ...]) -> "tesserocr.PyTessBaseAPI":
+        apis = getattr(self._local, "apis", None)
+        if apis is None:
+            apis = self._local.apis = {}
+        key = (psm, variables)
+        api = apis.get(key)
+        if api is None:
+            api = tesserocr.PyTessBaseAPI(lang=TESSERACT_LANG, psm=psm)
+            for name, value in variables:
+                if not api.SetVariable(name, value):
+                    logger.warning(f"Tesseract does not know variable {name}")
+            apis[key] = api
+            logger.debug(f"Initialised Tesseract API handle for psm {psm} {variables}")
+        return api
+
+    def _prepare(self, image: np.ndarray, config: str) -> "tesserocr.PyTessBaseAPI":
+        psm, dpi, variables = parse_config(config)
+        api = self._api(psm, variables)
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        height, width = image.shape[:2]
+        bytes_per_pixel = 1 if image.ndim == 2 else image.shape[2]
+        api.SetImageBytes(image.tobytes(), width, height, bytes_per_pixel, image.strides[0])
+        if dpi:
+            api.SetSourceResolution(dpi)
+        return api
+
+    def image_to_string(self, image: np.ndarray, config: str = "") -> str:
+        api = self._prepare(image, config)
+        try:
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+
+    def image_to_data(self, image: np.ndarray, config: str = "") -> Dict[str, List[Any]]:
+        """Word-level results in the same layout as pytesseract's Output.DICT"""
+        api = self._prepare(image, config)
+        data: Dict[str, List[Any]] = {"text": [], "conf": [], "left": [], "top": [], "width": [], "height": []}
+        try:
+            api.Recognize()
+            level = tesserocr.RIL.WORD
+            iterator = api.GetIterator()
+            if iterator is None:
+                return data
+            for word in tesserocr.iterate_level(iterator, level):
+                text = word.GetUTF8Text(level)
+                box = word.BoundingBox(level)
+                if text is None or box is None:
+                    continue
+                left, top, right, bottom = box
+                data["text"].append(text)
+                data["conf"].append(word.Confidence(level))
+                data["left"].append(left)
+                data["top"].append(top)
+                data["width"].append(right - left)
+                data["height"].append(bottom - top)
+            return data
+        finally:
+            api.Clear()
+
+
+_engine = None
+
+
+def get_ocr_engine():
+    """Return this process's OCR engine, chosen by OCR_ENGINE"""
+    global _engine
+    if _engine is None:
+        if OCR_ENGINE == "tesserocr" or (OCR_ENGINE == "auto" and TESSEROCR_AVAILABLE):
+            if not TESSEROCR_AVAILABLE:
+                logger.warning("OCR_ENGINE is tesserocr but it is not installed, falling back to pytesseract")
+                _engine = PytesseractEngine()
+            else:
+                _engine = TesserocrEngine()
+        else:
+            _engine = PytesseractEngine()
+        logger.info(f"Using {_engine.name} OCR engine")
+    return _engine
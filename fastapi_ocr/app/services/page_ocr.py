@@ -0,0 +1,299 @@
+import cv2
+import numpy as np
+from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import repeat
+import os
+import time
+import threading
+import logging
+from typing import Callable, Dict, Any, List, NamedTuple, Optional
+from .pdf_render import PDF_DPI, rasterize_page, read_text_layers
+from .preprocessing import PREPROCESS_STEPS, parse_steps, preprocess
+from .layout_ocr import analyze_page, analyze_text_layer, uncertain_fields
+from .ocr_engine import get_ocr_engine
+from ..core.metrics import collect, describe, record_stage, stage
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on pages OCR'd at once per invoice, each on its own thread
+PAGE_WORKERS = int(os.getenv('OCR_PAGE_WORKERS', min(4, os.cpu_count() or 1)))
+
+
+class OcrPass(NamedTuple):
+    """One recognition pass of OCR_MODE=tiered"""
+    name: str
+    # PDF pages are rasterized, and images scaled down, to this resolution
+    dpi: int
+    steps: List[str]
+    # Whether uncertain fields are re-read region by region
+    reread: bool
+
+
+# Cheap first pass: low resolution, no deskew or crop, no field re-reads
+FAST_DPI = int(os.getenv('OCR_FAST_DPI', 150))
+FAST_PREPROCESS_STEPS = parse_steps(os.getenv('OCR_FAST_PREPROCESS_STEPS', 'resize,binarize'))
+# Last resort after the regular pass; 0 disables it
+RETRY_DPI = int(os.getenv('OCR_RETRY_DPI', 300))
+RETRY_PREPROCESS_STEPS = parse_steps(os.getenv('OCR_RETRY_PREPROCESS_STEPS', 'resize,deskew,crop,denoise,binarize'))
+
+OCR_PASSES = [
+    OcrPass("fast", FAST_DPI, FAST_PREPROCESS_STEPS, reread=False),
+    # The pass OCR_MODE=layout always runs
+    OcrPass("full", PDF_DPI, PREPROCESS_STEPS, reread=True),
+]
+if RETRY_DPI:
+    OCR_PASSES.append(OcrPass("retry", RETRY_DPI, RETRY_PREPROCESS_STEPS, reread=True))
+
+
+def is_pdf(file_path: str) -> bool:
+    """Check the file signature to determine if it is a PDF"""
+    with open(file_path, 'rb') as f:
+        return f.read(4).startswith(b'%PDF')
+
+
+def _log_timings(image: np.ndarray, page: np.ndarray, timings: Dict[str, float]):
+    """Log the per-step timings of a page and record them as preprocess and OCR stages"""
+    record_stage("preprocess", sum(seconds for step, seconds in timings.items() if step != "ocr"))
+    record_stage("ocr", timings["ocr"])
+    logger.info(
+        f"OCR of {image.shape[1]}x{image.shape[0]} image as {page.shape[1]}x{page.shape[0]}: "
+        + ", ".join(f"{stage} {seconds * 1000:.0f}ms" for stage, seconds in timings.items())
+    )
+
+
+def ocr_image(image: np.ndarray, source_dpi: Optional[float] = None) -> str:
+    """
+    Preprocess an image and extract its text using OCR.
+    source_dpi is the resolution of the image when known; it is estimated
+    from the image size otherwise.
+    """
+    page, dpi, timings = preprocess(image, source_dpi)
+
+    start = time.perf_counter()
+    # Passing the resolution spares Tesseract from guessing it
+    text = get_ocr_engine().image_to_string(page, config=f"--dpi {int(dpi)}")
+    timings["ocr"] = time.perf_counter() - start
+
+    _log_timings(image, page, timings)
+    return text
+
+
+def analyze_image(image: np.ndarray, source_dpi: Optional[float] = None,
+                  ocr_pass: Optional[OcrPass] = None) -> Dict[str, Any]:
+    """
+    Preprocess an image and run layout-aware OCR on it (see
+    layout_ocr.analyze_page), with the settings of ocr_pass when given
+    """
+    if ocr_pass is None:
+        page, dpi, timings = preprocess(image, source_dpi)
+    else:
+        page, dpi, timings = preprocess(image, source_dpi, steps=ocr_pass.steps, target_dpi=ocr_pass.dpi)
+
+    start = time.perf_counter()
+    layout = analyze_page(page, dpi, reread=ocr_pass is None or ocr_pass.reread)
+    timings["ocr"] = time.perf_counter() - start
+
+    _log_timings(image, page, timings)
+    return layout
+
+
+def ocr_pdf_page(file_path: str, page_number: int) -> str:
+    """
+    Rasterize and OCR one PDF page.
+    Runs on a pool thread per page, so only the pages being OCR'd are
+    held in memory.
+    """
+    with stage("rasterize"):
+        image = rasterize_page(file_path, page_number)
+    return ocr_image(image, source_dpi=PDF_DPI)
+
+
+def analyze_pdf_page(file_path: str, page_number: int, ocr_pass: Optional[OcrPass] = None) -> Dict[str, Any]:
+    """
+    Rasterize one PDF page and run layout-aware OCR on it, on a page pool
+    thread; at the resolution of ocr_pass when given
+    """
+    dpi = ocr_pass.dpi if ocr_pass else PDF_DPI
+    with stage("rasterize"):
+        image = rasterize_page(file_path, page_number, dpi)
+    return analyze_image(image, source_dpi=dpi, ocr_pass=ocr_pass)
+
+
+_page_pool: Optional[ThreadPoolExecutor] = None
+_page_pool_lock = threading.Lock()
+
+
+def _get_page_pool() -> ThreadPoolExecutor:
+    """
+    Page pool shared by every invoice this process handles. Threads rather
+    than processes, because Celery's prefork children are daemonic and may
+    not start processes of their own; Tesseract, PDFium and OpenCV release
+    the GIL while they work. The threads outlive a single invoice, so each
+    keeps its OCR engine handles warm.
+    """
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is None:
+            _page_pool = ThreadPoolExecutor(max_workers=PAGE_WORKERS, thread_name_prefix="ocr-page")
+        return _page_pool
+
+
+def _traced_page(page_function, file_path: str, page_number: int) -> tuple:
+    """Run a page function in a pool thread; returns its result and stage timings"""
+    with collect() as trace:
+        result = page_function(file_path, page_number)
+    return result, trace.stages
+
+
+def _map_pages(page_function, file_path: str, pages: List[int]) -> list:
+    """
+    Run page_function on the given pages of a PDF, fanning them out across
+    a bounded thread pool, and return the results in page order
+    """
+    workers = min(PAGE_WORKERS, len(pages))
+
+    if workers <= 1:
+        results = [page_function(file_path, page) for page in pages]
+    else:
+        traced = list(_get_page_pool().map(_traced_page, repeat(page_function), repeat(file_path), pages))
+        results = [result for result, _ in traced]
+        # Stages measured in the pool count towards the invoice being traced here
+        for _, stages in traced:
+            for name, seconds in stages.items():
+                record_stage(name, seconds)
+
+    logger.info(f"OCR completed for {len(pages)} page(s) of {file_path} using {workers} worker(s)")
+    return results
+
+
+def _read_text_layers(file_path: str, text_layer_function, with_words: bool = False) -> tuple:
+    """
+    Detection stage for PDFs: pages with an embedded text layer are handled
+    by text_layer_function straight from the PDF. Returns their results by
+    page number and the numbers of the scanned pages left to OCR.
+    """
+    with stage("text_layer"):
+        layers = read_text_layers(file_path, with_words=with_words)
+        results = {
+            number: text_layer_function(layer)
+            for number, layer in enumerate(layers, start=1)
+            if layer is not None
+        }
+    scanned = [number for number, layer in enumerate(layers, start=1) if layer is None]
+    describe(pages=len(layers), ocr_pages=len(scanned))
+    if results:
+        logger.info(f"Read {len(results)} of {len(layers)} page(s) of {file_path} from the text layer")
+    return results, scanned
+
+
+def _process_pdf(file_path: str, page_function, text_layer_function, with_words: bool = False) -> list:
+    """
+    Read the pages of a PDF: text layers where there are any, and the
+    remaining scanned pages rasterized and OCR'd by page_function.
+    Returns the per-page results in page order.
+    """
+    results, scanned = _read_text_layers(file_path, text_layer_function, with_words)
+    if scanned:
+        results.update(zip(scanned, _map_pages(page_function, file_path, scanned)))
+    return [results[number] for number in sorted(results)]
+
+
+def ocr_pdf(file_path: str) -> str:
+    """Extract the text of every page of a PDF, OCR'ing scanned pages in parallel"""
+    texts: List[str] = _process_pdf(file_path, ocr_pdf_page, lambda layer: layer["text"])
+    return "\n".join(texts)
+
+
+def read_image_dpi(file_path: str) -> Optional[float]:
+    """Read the resolution recorded in an image's metadata, if any"""
+    try:
+        with Image.open(file_path) as image:
+            dpi = image.info.get("dpi")
+    except Exception:
+        return None
+    # Many encoders write a placeholder 72 or 96 dpi, which says nothing about the scan
+    if not dpi or dpi[0] <= 96:
+        return None
+    return float(dpi[0])
+
+
+def _read_image(file_path: str) -> np.ndarray:
+    # Decoding is the image counterpart of rasterizing a PDF page
+    with stage("rasterize"):
+        image = cv2.imread(str(file_path))
+    if image is None:
+        raise ValueError("Could not read image file")
+    describe(pages=1, ocr_pages=1)
+    return image
+
+
+def _sniff_pdf(file_path: str) -> bool:
+    """Tell PDFs from images, noting the file type for the metrics"""
+    with stage("sniff"):
+        pdf = is_pdf(file_path)
+    describe(file_type="pdf" if pdf else "image")
+    return pdf
+
+
+def extract_text(file_path: str) -> str:
+    """Extract the text of a PDF or image invoice"""
+    if _sniff_pdf(file_path):
+        return ocr_pdf(file_path)
+
+    # Handle image files
+    return ocr_image(_read_image(file_path), source_dpi=read_image_dpi(file_path))
+
+
+def extract_layout(file_path: str) -> List[Dict[str, Any]]:
+    """Run layout-aware OCR on every page of a PDF or image invoice"""
+    if _sniff_pdf(file_path):
+        return _process_pdf(
+            file_path, analyze_pdf_page, lambda layer: analyze_text_layer(layer["words"]), with_words=True
+        )
+    return [analyze_image(_read_image(file_path), source_dpi=read_image_dpi(file_path))]
+
+
+def _run_passes(read_pass: Callable[[OcrPass], List[Dict[str, Any]]], file_path: str) -> List[Dict[str, Any]]:
+    """
+    Run OCR_PASSES in order until one reads every required field above
+    the confidence threshold; the last pass is kept regardless
+    """
+    for index, ocr_pass in enumerate(OCR_PASSES):
+        pages = read_pass(ocr_pass)
+        uncertain = uncertain_fields(pages)
+        if not uncertain or index == len(OCR_PASSES) - 1:
+            break
+        logger.info(
+            f"{ocr_pass.name} pass left {', '.join(uncertain)} of {file_path} uncertain, "
+            f"retrying with the {OCR_PASSES[index + 1].name} pass"
+        )
+    describe(ocr_pass=ocr_pass.name)
+    return pages
+
+
+def extract_layout_tiered(file_path: str) -> List[Dict[str, Any]]:
+    """
+    Layout-aware OCR in passes of increasing cost (OCR_MODE=tiered): a fast
+    low-resolution pass first, repeated at higher resolution and with
+    heavier preprocessing only while required fields stay uncertain.
+    Text layers and decoded images are read once and shared by the passes.
+    """
+    if _sniff_pdf(file_path):
+        text_pages, scanned = _read_text_layers(
+            file_path, lambda layer: analyze_text_layer(layer["words"]), with_words=True
+        )
+        if not scanned:
+            describe(ocr_pass="text_layer")
+            return [text_pages[number] for number in sorted(text_pages)]
+
+        def read_pass(ocr_pass: OcrPass) -> List[Dict[str, Any]]:
+            pages = dict(text_pages)
+            pages.update(zip(scanned, _map_pages(partial(analyze_pdf_page, ocr_pass=ocr_pass), file_path, scanned)))
+            return [pages[number] for number in sorted(pages)]
+
+        return _run_passes(read_pass, file_path)
+
+    image, source_dpi = _read_image(file_path), read_image_dpi(file_path)
+    return _run_passes(lambda ocr_pass: [analyze_image(image, source_dpi, ocr_pass)], file_path)
@@ -0,0 +1,172 @@
+import numpy as np
+from pdf2image import convert_from_path, pdfinfo_from_path
+import os
+import threading
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
+# "pdfium" renders in-process straight into a grayscale buffer; "poppler"
+# runs pdftoppm through pdf2image; "auto" uses pdfium when it is installed
+RASTER_BACKEND = os.getenv('OCR_RASTER_BACKEND', 'auto')
+# Resolution used when rasterizing PDF pages (pdf2image default)
+PDF_DPI = int(os.getenv('OCR_PDF_DPI', 200))
+# Pages whose text layer has at least this many characters are not OCR'd
+TEXT_LAYER_MIN_CHARS = int(os.getenv('OCR_TEXT_LAYER_MIN_CHARS', 20))
+
+POINTS_PER_INCH = 72
+
+# PDFium is not thread-safe and page threads share it, so calls into it
+# are serialized; OCR of the rendered pages still runs in parallel
+_pdfium_lock = threading.Lock()
+
+
+def _use_pdfium() -> bool:
+    if RASTER_BACKEND == "pdfium" and not PDFIUM_AVAILABLE:
+        raise RuntimeError("OCR_RASTER_BACKEND is pdfium but pypdfium2 is not installed")
+    return PDFIUM_AVAILABLE and RASTER_BACKEND != "poppler"
+
+
+def get_page_count(file_path: str) -> int:
+    """Read the page count from the PDF without rasterizing it"""
+    if _use_pdfium():
+        with _pdfium_lock:
+            pdf = pdfium.PdfDocument(file_path)
+            try:
+                return len(pdf)
+            finally:
+                pdf.close()
+    return int(pdfinfo_from_path(file_path)["Pages"])
+
+
+def rasterize_page(file_path: str, page_number: int, dpi: int = None) -> np.ndarray:
+    """
+    Rasterize a single PDF page (1-based) into a single-channel grayscale
+    array at dpi, by default PDF_DPI. With pdfium the array is a view of
+    the rendered bitmap, so the page is never copied or color-converted.
+    """
+    dpi = dpi or PDF_DPI
+    if _use_pdfium():
+        with _pdfium_lock:
+            pdf = pdfium.PdfDocument(file_path)
+            try:
+                page = pdf[page_number - 1]
+                bitmap = page.render(scale=dpi / POINTS_PER_INCH, grayscale=True)
+                page.close()
+                # The array keeps the bitmap's buffer alive after the document is closed
+                return bitmap.to_numpy()
+            finally:
+                pdf.close()
+
+    images = convert_from_path(
+        file_path,
+        dpi=dpi,
+        first_page=page_number,
+        last_page=page_number,
+        grayscale=True
+    )
+    return np.asarray(images[0])
+
+
+def _text_layer_words(text_page, text: str, page_height: float) -> List[Dict[str, Any]]:
+    """
+    Group the characters of a text layer into words with pixel boxes at
+    PDF_DPI (top-left origin), in the format layout_ocr reads from OCR
+    """
+    scale = PDF_DPI / POINTS_PER_INCH
+    words = []
+    current, box = [], None
+    for index, char in enumerate(text + " "):
+        if char.isspace():
+            if current:
+                left, bottom, right, top = box
+                words.append({
+                    "text": "".join(current),
+                    "confidence": 1.0,
+                    "box": (
+                        int(left * scale), int((page_height - top) * scale),
+                        int(right * scale), int((page_height - bottom) * scale)
+                    )
+                })
+                current, box = [], None
+            continue
+        left, bottom, right, top = text_page.get_charbox(index)
+        current.append(char)
+        if box is None:
+            box = (left, bottom, right, top)
+        else:
+            box = (min(box[0], left), min(box[1], bottom), max(box[2], right), max(box[3], top))
+    return words
+
+
+def read_text_layers(file_path: str, with_words: bool = False) -> List[Optional[Dict[str, Any]]]:
+    """
+    Read the embedded text of every page of a PDF in one pass.
+    Returns one entry per page: None when the page has no usable text layer
+    (fewer than OCR_TEXT_LAYER_MIN_CHARS characters) and needs OCR, else its
+    text and, with with_words, its words with their positions.
+    Without pdfium every page is reported as needing OCR.
+    """
+    if not _use_pdfium():
+        return [None] * get_page_count(file_path)
+
+    layers: List[Optional[Dict[str, Any]]] = []
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            for page in pdf:
+                text_page = page.get_textpage()
+                text = text_page.get_text_range()
+                if sum(not char.isspace() for char in text) < TEXT_LAYER_MIN_CHARS:
+                    layers.append(None)
+                else:
+                    layer = {"text": text.replace("\r\n", "\n")}
+                    if with_words:
+                        layer["words"] = _text_layer_words(text_page, text, page.get_height())
+                    layers.append(layer)
+                text_page.close()
+                page.close()
+        finally:
+            pdf.close()
+    return layers
+
+
+def estimate_scanned_pages(file_path: str, sample_pages: int = 0) -> Tuple[int, int]:
+    """
+    Estimate how many pages of a PDF lack a text layer without extracting
+    any text: pages are checked by character count alone, and with
+    sample_pages only that many evenly spaced pages are checked and the
+    rest extrapolated. Returns the page count and the estimated number of
+    pages to OCR. Without pdfium every page counts as needing OCR.
+    """
+    if not _use_pdfium():
+        pages = get_page_count(file_path)
+        return pages, pages
+
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            pages = len(pdf)
+            if sample_pages and pages > sample_pages:
+                indices = [index * pages // sample_pages for index in range(sample_pages)]
+            else:
+                indices = range(pages)
+            scanned = 0
+            for index in indices:
+                page = pdf[index]
+                text_page = page.get_textpage()
+                scanned += text_page.count_chars() < TEXT_LAYER_MIN_CHARS
+                text_page.close()
+                page.close()
+        finally:
+            pdf.close()
+    if not pages:
+        return 0, 0
+    return pages, round(scanned * pages / len(indices))
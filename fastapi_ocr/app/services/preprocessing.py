@@ -0,0 +1,185 @@
+import cv2
+import numpy as np
+import os
+import time
+import logging
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def parse_steps(value: str) -> List[str]:
+    """Split a comma-separated list of preprocessing steps"""
+    return [step.strip() for step in value.split(',') if step.strip()]
+
+
+# Ordered preprocessing stages to run before OCR; grayscale conversion always runs first
+PREPROCESS_STEPS = parse_steps(os.getenv('OCR_PREPROCESS_STEPS', 'resize,deskew,crop,binarize'))
+# Resolution images are scaled down to before OCR; matches the PDF rasterization default
+TARGET_DPI = int(os.getenv('OCR_TARGET_DPI', 200))
+# Skew beyond this many degrees is assumed to be a misdetection and left alone
+MAX_SKEW_ANGLE = float(os.getenv('OCR_MAX_SKEW_ANGLE', 10))
+MIN_SKEW_ANGLE = 0.3
+# Otsu is rejected in favour of adaptive thresholding above this share of black pixels
+OTSU_MAX_INK_RATIO = float(os.getenv('OCR_OTSU_MAX_INK_RATIO', 0.3))
+# Used to estimate the resolution of images without DPI metadata (A4 long side)
+PAGE_LONG_SIDE_INCHES = 11.69
+CROP_MARGIN = 0.02
+# Filter strength of the denoise step; higher removes more noise and more detail
+DENOISE_STRENGTH = 15
+
+
+@contextmanager
+def _timed(timings: Dict[str, float], stage: str):
+    start = time.perf_counter()
+    yield
+    timings[stage] = time.perf_counter() - start
+
+
+def to_grayscale(image: np.ndarray) -> np.ndarray:
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def _ink_mask(gray: np.ndarray) -> np.ndarray:
+    """Foreground (dark) pixels as 255 on a black background"""
+    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+
+
+def estimate_dpi(image: np.ndarray) -> float:
+    """Guess the resolution of a page image from its size, assuming an A4 page"""
+    return max(image.shape[:2]) / PAGE_LONG_SIDE_INCHES
+
+
+def normalize_resolution(gray: np.ndarray, source_dpi: float, target_dpi: float = None) -> Tuple[np.ndarray, float]:
+    """
+    Scale an image down to target_dpi (default TARGET_DPI). Images already
+    at or below the target are returned unchanged, as upscaling adds no
+    detail. Returns the image and its resulting resolution.
+    """
+    target_dpi = target_dpi or TARGET_DPI
+    scale = target_dpi / source_dpi
+    if scale >= 1:
+        return gray, source_dpi
+    resized = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return resized, target_dpi
+
+
+def detect_skew(gray: np.ndarray) -> float:
+    """
+    Estimate the skew of the text in degrees (positive is counter-clockwise).
+    Characters are smeared horizontally into line blobs and the median
+    angle of the wide blobs is taken, so stray marks and graphics do not
+    skew the estimate.
+    """
+    height, width = gray.shape
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(width // 40, 9), 3))
+    lines = cv2.dilate(_ink_mask(gray), kernel)
+    contours = cv2.findContours(lines, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]
+
+    angles = []
+    for contour in contours:
+        (_, _), (rect_width, rect_height), angle = cv2.minAreaRect(contour)
+        if rect_width < rect_height:
+            rect_width, rect_height = rect_height, rect_width
+            angle -= 90
+        if rect_width < width / 8:
+            continue
+        # Fold into (-45, 45]; OpenCV's angle convention differs across versions
+        while angle > 45:
+            angle -= 90
+        while angle <= -45:
+            angle += 90
+        angles.append(angle)
+
+    if not angles:
+        return 0.0
+    # minAreaRect measures in image coordinates (y down), so invert for counter-clockwise
+    return -float(np.median(angles))
+
+
+def deskew(gray: np.ndarray) -> np.ndarray:
+    """Rotate the page so text lines are horizontal"""
+    angle = detect_skew(gray)
+    if abs(angle) < MIN_SKEW_ANGLE or abs(angle) > MAX_SKEW_ANGLE:
+        return gray
+    height, width = gray.shape
+    # Rotating by -angle undoes a counter-clockwise skew of angle
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), -angle, 1.0)
+    logger.debug(f"Deskewing page by {angle:.2f} degrees")
+    return cv2.warpAffine(
+        gray, matrix, (width, height),
+        flags=cv2.INTER_LINEAR,
+        borderMode=cv2.BORDER_CONSTANT,
+        borderValue=255
+    )
+
+
+def crop_to_content(gray: np.ndarray) -> np.ndarray:
+    """Crop away empty margins around the printed content"""
+    mask = cv2.morphologyEx(_ink_mask(gray), cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+    coords = cv2.findNonZero(mask)
+    if coords is None:
+        return gray
+    x, y, width, height = cv2.boundingRect(coords)
+    margin = int(max(gray.shape) * CROP_MARGIN)
+    top, left = max(y - margin, 0), max(x - margin, 0)
+    return gray[top:y + height + margin, left:x + width + margin]
+
+
+def denoise(gray: np.ndarray) -> np.ndarray:
+    """
+    Remove scanner and compression noise with non-local means. Far slower
+    than the other steps, so it is meant for retries of hard pages.
+    """
+    return cv2.fastNlMeansDenoising(gray, None, DENOISE_STRENGTH, 7, 21)
+
+
+def binarize(gray: np.ndarray) -> np.ndarray:
+    """
+    Global Otsu threshold, falling back to adaptive thresholding when Otsu
+    fails, which shows as large black regions (shadows, uneven lighting)
+    """
+    otsu = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    ink_ratio = 1 - cv2.countNonZero(otsu) / otsu.size
+    if ink_ratio <= OTSU_MAX_INK_RATIO:
+        return otsu
+
+    logger.debug(f"Otsu left {ink_ratio:.0%} of the page black, using adaptive threshold")
+    block_size = max(gray.shape) // 50 | 1
+    return cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, max(block_size, 11), 15
+    )
+
+
+def preprocess(image: np.ndarray, source_dpi: Optional[float] = None, steps: List[str] = None,
+               target_dpi: float = None) -> Tuple[np.ndarray, float, Dict[str, float]]:
+    """
+    Prepare a page image for OCR by running the given stages, by default
+    OCR_PREPROCESS_STEPS with resizing to OCR_TARGET_DPI.
+    source_dpi is estimated from the image size when unknown.
+    Returns the processed image, its resolution and the seconds spent per stage.
+    """
+    timings: Dict[str, float] = {}
+    dpi = source_dpi or estimate_dpi(image)
+
+    with _timed(timings, "grayscale"):
+        page = to_grayscale(image)
+    for step in PREPROCESS_STEPS if steps is None else steps:
+        with _timed(timings, step):
+            if step == "resize":
+                page, dpi = normalize_resolution(page, dpi, target_dpi)
+            elif step == "deskew":
+                page = deskew(page)
+            elif step == "crop":
+                page = crop_to_content(page)
+            elif step == "denoise":
+                page = denoise(page)
+            elif step == "binarize":
+                page = binarize(page)
+            else:
+                raise ValueError(f"Unknown preprocessing step: {step}")
+
+    return page, dpi, timings
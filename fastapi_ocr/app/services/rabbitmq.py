@@ -1,26 +1,113 @@
 import aio_pika
+from aio_pika.pool import Pool
+import asyncio
+import json
+import logging
+from typing import Dict, Any, List, Optional
 from ..core.config import settings
 
-async def get_rabbitmq_connection():
-    return await aio_pika.connect_robust(settings.RABBITMQ_URL)
-
-async def init_rabbitmq():
-    connection = await get_rabbitmq_connection()
-    channel = await connection.channel()
-    
-    # Declare exchanges
-    ocr_exchange = await channel.declare_exchange(
-        "ocr_exchange",
-        aio_pika.ExchangeType.DIRECT
-    )
-    
-    # Declare queues
-    ocr_queue = await channel.declare_queue(
-        "ocr_tasks",
-        durable=True
-    )
-    
-    # Bind queues to exchanges
-    await ocr_queue.bind(ocr_exchange, "ocr_task")
-    
-    return connection, channel
\ No newline at end of file
+logger = logging.getLogger(__name__)
+
+OCR_EXCHANGE = "ocr_exchange"
+OCR_TASKS_QUEUE = "ocr_tasks"
+OCR_TASK_ROUTING_KEY = "ocr_task"
+
+
+class RabbitMQ:
+    """
+    Application-lifetime RabbitMQ connection with a pool of channels in
+    publisher confirm mode. Batches are published without waiting for each
+    confirm in turn, while the number of unconfirmed messages is bounded: when
+    the broker applies backpressure (flow control, memory or disk alarms),
+    confirms stop arriving and publishers wait instead of buffering in memory.
+    """
+
+    def __init__(self, url: str = None, channel_pool_size: int = None, max_in_flight: int = None):
+        self.url = url or settings.RABBITMQ_URL
+        self.connection: Optional[aio_pika.abc.AbstractRobustConnection] = None
+        self.channel_pool = Pool(self._open_channel, max_size=channel_pool_size or settings.RABBITMQ_CHANNEL_POOL_SIZE)
+        self.in_flight = asyncio.Semaphore(max_in_flight or settings.RABBITMQ_MAX_IN_FLIGHT)
+        self._connect_lock = asyncio.Lock()
+
+    async def connect(self) -> aio_pika.abc.AbstractRobustConnection:
+        """Open the shared connection once; it reconnects by itself afterwards"""
+        async with self._connect_lock:
+            if self.connection is None or self.connection.is_closed:
+                self.connection = await aio_pika.connect_robust(self.url)
+                logger.info("Connected to RabbitMQ")
+        return self.connection
+
+    async def _open_channel(self) -> aio_pika.abc.AbstractChannel:
+        connection = await self.connect()
+        return await connection.channel(publisher_confirms=True)
+
+    async def declare_topology(self):
+        """Declare the OCR exchange and task queue"""
+        async with self.channel_pool.acquire() as channel:
+            ocr_exchange = await channel.declare_exchange(OCR_EXCHANGE, aio_pika.ExchangeType.DIRECT)
+            ocr_queue = await channel.declare_queue(OCR_TASKS_QUEUE, durable=True)
+            await ocr_queue.bind(ocr_exchange, OCR_TASK_ROUTING_KEY)
+
+    async def publish(self, payloads: List[Dict[str, Any]], routing_key: str = OCR_TASK_ROUTING_KEY):
+        """
+        Publish JSON messages to the OCR exchange as persistent messages.
+        Returns once the broker has confirmed every one of them; raises if
+        any is nacked or returned.
+        """
+        if not payloads:
+            return
+
+        async with self.channel_pool.acquire() as channel:
+            # Skips the passive declare round trip; declare_topology ran at startup
+            exchange = await channel.get_exchange(OCR_EXCHANGE, ensure=False)
+
+            async def publish_one(payload: Dict[str, Any]):
+                async with self.in_flight:
+                    await exchange.publish(
+                        aio_pika.Message(
+                            body=json.dumps(payload).encode(),
+                            content_type="application/json",
+                            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                            message_id=payload.get("task_id")
+                        ),
+                        routing_key=routing_key
+                    )
+
+            await asyncio.gather(*(publish_one(payload) for payload in payloads))
+
+        logger.info(f"Published {len(payloads)} message(s) to {OCR_EXCHANGE}/{routing_key}")
+
+    async def close(self):
+        await self.channel_pool.close()
+        if self.connection is not None:
+            await self.connection.close()
+            self.connection = None
+
+
+_rabbitmq: Optional[RabbitMQ] = None
+
+
+def get_rabbitmq() -> RabbitMQ:
+    """Return the process-wide RabbitMQ connection and channel pool"""
+    global _rabbitmq
+    if _rabbitmq is None:
+        _rabbitmq = RabbitMQ()
+    return _rabbitmq
+
+
+async def get_rabbitmq_connection() -> aio_pika.abc.AbstractRobustConnection:
+    """Return the shared connection instead of opening a new one per call"""
+    return await get_rabbitmq().connect()
+
+
+async def init_rabbitmq() -> RabbitMQ:
+    rabbitmq = get_rabbitmq()
+    await rabbitmq.declare_topology()
+    return rabbitmq
+
+
+async def close_rabbitmq():
+    global _rabbitmq
+    if _rabbitmq is not None:
+        await _rabbitmq.close()
+        _rabbitmq = None
@@ -0,0 +1,199 @@
+import redis
+import hashlib
+import os
+import time
+import logging
+from typing import Dict, Any, List, Optional
+from ..core import metrics
+from ..core.serialization import RESULT_EXPIRES, dumps, loads
+from .pdf_render import PDF_DPI
+from .preprocessing import TARGET_DPI
+from .layout_ocr import OCR_MODE
+
+logger = logging.getLogger(__name__)
+
+# Bump when OCR or extraction output changes so stale results are never served
+PIPELINE_VERSION = 2
+OCR_CONFIG_VERSION = os.getenv(
+    'OCR_CONFIG_VERSION', f"v{PIPELINE_VERSION}-dpi{PDF_DPI}-{TARGET_DPI}-{OCR_MODE}"
+)
+
+CACHE_ENABLED = os.getenv('OCR_CACHE_ENABLED', 'true').lower() == 'true'
+CACHE_TTL = int(os.getenv('OCR_CACHE_TTL', 7 * 24 * 3600))  # 7 days
+CACHE_MAX_ENTRIES = int(os.getenv('OCR_CACHE_MAX_ENTRIES', 10000))
+
+KEY_PREFIX = "ocr:result"
+# Sorted set of cache keys scored by last use, for size-bounded LRU eviction
+INDEX_KEY = f"{KEY_PREFIX}:index"
+# Sorted set of cache keys that task results reference, scored by the time
+# until which they do; pinned keys are left out of INDEX_KEY, so they are
+# never evicted while a task result still points at them
+PINS_KEY = f"{KEY_PREFIX}:pinned"
+
+# Task results stored in the cache are passed around as {RESULT_REF: key}
+# instead of being copied into the result backend, webhooks and batches
+RESULTS_BY_REFERENCE = os.getenv('OCR_RESULTS_BY_REFERENCE', 'true').lower() == 'true'
+RESULT_REF = "resultRef"
+
+
+def content_hash(content: bytes) -> str:
+    """Hash uploaded bytes into a content address"""
+    return hashlib.sha256(content).hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed OCR result cache stored in Redis.
+    Entries expire after CACHE_TTL and the least recently used entries are
+    evicted once CACHE_MAX_ENTRIES is exceeded, except those pinned by a
+    task result, which are kept until the task result expires.
+    """
+
+    def __init__(self, redis_url: str = None, ttl: int = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES):
+        self.client = redis.Redis.from_url(
+            redis_url or os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+        )
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def _key(self, file_hash: str) -> str:
+        return f"{KEY_PREFIX}:{OCR_CONFIG_VERSION}:{file_hash}"
+
+    def get(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for a content hash, if any"""
+        if not CACHE_ENABLED:
+            return None
+        try:
+            key = self._key(file_hash)
+            cached = self.client.get(key)
+            if cached is None:
+                return None
+            # xx: pinned keys stay out of the LRU index
+            self.client.zadd(INDEX_KEY, {key: time.time()}, xx=True)
+            return loads(cached)
+        except Exception as e:
+            logger.warning(f"OCR result cache lookup failed: {e}")
+            return None
+
+    def set(self, file_hash: str, result: Dict[str, Any]) -> Optional[str]:
+        """
+        Store a result and evict expired or least recently used entries.
+        Returns the key it was stored under, or None if it was not stored.
+        """
+        if not CACHE_ENABLED:
+            return None
+        try:
+            key = self._key(file_hash)
+            now = time.time()
+            payload = dumps(result)
+            pinned_until = self.client.zscore(PINS_KEY, key) or 0
+            pipe = self.client.pipeline()
+            if pinned_until > now:
+                pipe.set(key, payload, ex=max(self.ttl, int(pinned_until - now) + 1))
+            else:
+                pipe.set(key, payload, ex=self.ttl)
+                pipe.zadd(INDEX_KEY, {key: now})
+            pipe.zremrangebyscore(INDEX_KEY, '-inf', now - self.ttl)
+            pipe.zremrangebyscore(PINS_KEY, '-inf', now)
+            pipe.zcard(INDEX_KEY)
+            size = pipe.execute()[-1]
+            metrics.describe(result_bytes=len(payload))
+
+            overflow = size - self.max_entries
+            if overflow > 0:
+                evicted = [member for member, _ in self.client.zpopmin(INDEX_KEY, overflow)]
+                self.client.delete(*evicted)
+                logger.info(f"Evicted {len(evicted)} OCR result(s) from cache")
+            return key
+        except Exception as e:
+            logger.warning(f"Could not cache OCR result: {e}")
+            return None
+
+    def pin(self, key: str, seconds: int = RESULT_EXPIRES) -> bool:
+        """
+        Keep the entry under key for at least seconds, out of LRU eviction.
+        Returns False if the entry is already gone.
+        """
+        try:
+            pipe = self.client.pipeline()
+            pipe.ttl(key)
+            pipe.zscore(PINS_KEY, key)
+            ttl, pinned_until = pipe.execute()
+            if ttl == -2:
+                return False
+            pipe = self.client.pipeline()
+            pipe.zrem(INDEX_KEY, key)
+            pipe.zadd(PINS_KEY, {key: max(time.time() + seconds, pinned_until or 0)})
+            if 0 <= ttl < seconds:
+                pipe.expire(key, seconds)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.warning(f"Could not pin cached OCR result: {e}")
+            return False
+
+    def load(self, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Fetch the results stored under the given keys in one round trip"""
+        if not keys:
+            return []
+        cached = self.client.mget(keys)
+        now = time.time()
+        found = {key: now for key, value in zip(keys, cached) if value is not None}
+        if found:
+            self.client.zadd(INDEX_KEY, found, xx=True)
+        return [loads(value) if value is not None else None for value in cached]
+
+
+_result_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> ResultCache:
+    """Return the process-wide result cache"""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    return _result_cache
+
+
+def reference_result(file_hash: Optional[str], result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Cache a task result under its content hash and return what the task
+    should hand on: a reference to the cached copy, pinned for as long as
+    the task result is kept, or the result itself when it was not cached
+    or references are disabled
+    """
+    if not file_hash:
+        return result
+    cache = get_result_cache()
+    key = cache.set(file_hash, result)
+    if key is None or not RESULTS_BY_REFERENCE or not cache.pin(key):
+        return result
+    return {RESULT_REF: key}
+
+
+def cached_reference(file_hash: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """What to hand on for a result that was just read from the cache"""
+    cache = get_result_cache()
+    key = cache._key(file_hash)
+    if not RESULTS_BY_REFERENCE or not cache.pin(key):
+        return result
+    return {RESULT_REF: key}
+
+
+def is_result_ref(result: Any) -> bool:
+    return isinstance(result, dict) and RESULT_REF in result and len(result) == 1
+
+
+def resolve_results(results: List[Any]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Replace result references with the cached results, fetched in a single
+    round trip. References whose entry has expired resolve to None.
+    """
+    keys = [result[RESULT_REF] for result in results if is_result_ref(result)]
+    loaded = iter(get_result_cache().load(keys))
+    return [next(loaded) if is_result_ref(result) else result for result in results]
+
+
+def resolve_result(result: Any) -> Optional[Dict[str, Any]]:
+    """Resolve a single task result; see resolve_results"""
+    return resolve_results([result])[0]
@@ -0,0 +1,78 @@
+import os
+import logging
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+from ..core.worker_profile import time_limits_for_pages
+from .pdf_render import estimate_scanned_pages
+from .page_ocr import is_pdf
+
+logger = logging.getLogger(__name__)
+
+# Single invoices that are cheap to process; latency-sensitive
+QUEUE_FAST = "ocr_fast"
+# Single invoices with many scanned pages or large files
+QUEUE_HEAVY = "ocr_heavy"
+# Invoices submitted through the batch endpoint
+QUEUE_BATCH = "ocr_batch"
+OCR_QUEUES = [QUEUE_FAST, QUEUE_HEAVY, QUEUE_BATCH]
+
+# Upper bounds for the fast queue
+FAST_MAX_SCANNED_PAGES = int(os.getenv('OCR_FAST_MAX_SCANNED_PAGES', 2))
+FAST_MAX_FILE_SIZE = int(os.getenv('OCR_FAST_MAX_FILE_SIZE', 5 * 1024 * 1024))  # 5MB
+# Pages of a PDF checked for a text layer when estimating its cost; longer
+# documents are sampled. Runs in the API, so it is kept cheap (0 checks all)
+COST_SAMPLE_PAGES = int(os.getenv('OCR_COST_SAMPLE_PAGES', 8))
+
+# Upper bound on the hard time limit per queue, in seconds; within it the
+# limit is sized to the page count (see core.worker_profile)
+QUEUE_TIME_LIMITS = {
+    QUEUE_FAST: int(os.getenv('OCR_FAST_TIME_LIMIT', 60)),
+    QUEUE_HEAVY: int(os.getenv('OCR_HEAVY_TIME_LIMIT', 900)),
+    QUEUE_BATCH: int(os.getenv('OCR_BATCH_TIME_LIMIT', 900)),
+}
+
+
+def estimate_cost(file_path: str) -> Dict[str, Any]:
+    """
+    Estimate the OCR work of a saved upload: its size, page count and how
+    many pages lack a text layer and will have to be OCR'd, estimated from
+    up to COST_SAMPLE_PAGES pages without extracting their text
+    """
+    cost = {"size": Path(file_path).stat().st_size, "pages": 1, "scanned_pages": 1}
+    if is_pdf(file_path):
+        cost["pages"], cost["scanned_pages"] = estimate_scanned_pages(file_path, COST_SAMPLE_PAGES)
+    return cost
+
+
+def choose_queue(cost: Dict[str, Any]) -> str:
+    """Route a single invoice to the fast queue unless it is expensive to OCR"""
+    if cost["scanned_pages"] <= FAST_MAX_SCANNED_PAGES and cost["size"] <= FAST_MAX_FILE_SIZE:
+        return QUEUE_FAST
+    return QUEUE_HEAVY
+
+
+def route_upload(file_path: str) -> Tuple[str, Optional[int]]:
+    """
+    Pick the queue for a single uploaded invoice and report how many pages
+    it needs OCR'd. Uploads that cannot be inspected go to the heavy queue
+    with an unknown page count.
+    """
+    try:
+        cost = estimate_cost(file_path)
+    except Exception as e:
+        logger.warning(f"Could not estimate OCR cost of {file_path}, routing as heavy: {e}")
+        return QUEUE_HEAVY, None
+    queue = choose_queue(cost)
+    logger.info(f"Routing {file_path} to {queue}: {cost}")
+    return queue, cost["scanned_pages"]
+
+
+def time_limits(queue: str, pages: Optional[int] = None) -> Dict[str, int]:
+    """
+    Celery time limit options for a job on the given queue, sized to its
+    page count when known and capped by the queue's limit
+    """
+    if pages is not None:
+        return time_limits_for_pages(pages, cap=QUEUE_TIME_LIMITS[queue])
+    limit = QUEUE_TIME_LIMITS[queue]
+    return {"time_limit": limit, "soft_time_limit": int(limit * 0.9)}
@@ -0,0 +1,106 @@
+import aiofiles
+import aiofiles.os
+import hashlib
+import logging
+import uuid
+import zipfile
+from pathlib import Path
+from typing import List, Dict
+from fastapi import UploadFile
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+# Allowance for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured maximum size"""
+
+
+async def save_upload(file: UploadFile, destination: Path, max_size: int) -> str:
+    """
+    Stream an upload to disk chunk by chunk without blocking the event loop.
+    Returns the SHA-256 of the content, computed while streaming. Raises
+    UploadTooLargeError as soon as max_size is exceeded and removes the
+    partial file.
+    """
+    declared_size = getattr(file, "size", None)
+    if declared_size is not None and declared_size > max_size:
+        raise UploadTooLargeError(f"File exceeds maximum size of {max_size} bytes")
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(destination, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLargeError(f"File exceeds maximum size of {max_size} bytes")
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        try:
+            await aiofiles.os.remove(destination)
+        except FileNotFoundError:
+            pass
+        raise
+
+    logger.info(f"Saved upload {destination} ({size} bytes)")
+    return digest.hexdigest()
+
+
+def extract_archive(archive_path: Path, destination_dir: Path, allowed_types: List[str],
+                    max_files: int, max_file_size: int) -> List[Dict[str, str]]:
+    """
+    Unpack the invoices in a ZIP archive into destination_dir.
+    Each member is copied in chunks, hashed and size-checked as it is written,
+    so a member that lies about its size cannot exhaust the disk. Returns one
+    entry per invoice with its original filename, stored path and content hash.
+    """
+    extracted = []
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            members = [
+                info for info in archive.infolist()
+                if not info.is_dir()
+                and not Path(info.filename).name.startswith(".")
+                and "__MACOSX" not in info.filename
+            ]
+            invoices = [
+                info for info in members
+                if Path(info.filename).suffix.lower().lstrip(".") in allowed_types
+            ]
+            if len(invoices) > max_files:
+                raise UploadTooLargeError(f"Archive contains more than {max_files} invoices")
+
+            for info in invoices:
+                if info.file_size > max_file_size:
+                    raise UploadTooLargeError(f"{info.filename} exceeds maximum size of {max_file_size} bytes")
+
+                file_path = destination_dir / f"{uuid.uuid4()}{Path(info.filename).suffix.lower()}"
+                digest = hashlib.sha256()
+                size = 0
+                with archive.open(info) as source, open(file_path, "wb") as out:
+                    extracted.append({"filename": info.filename, "file_path": str(file_path)})
+                    while True:
+                        chunk = source.read(UPLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        size += len(chunk)
+                        if size > max_file_size:
+                            raise UploadTooLargeError(f"{info.filename} exceeds maximum size of {max_file_size} bytes")
+                        digest.update(chunk)
+                        out.write(chunk)
+                extracted[-1]["content_hash"] = digest.hexdigest()
+    except BaseException:
+        for entry in extracted:
+            Path(entry["file_path"]).unlink(missing_ok=True)
+        raise
+
+    logger.info(f"Extracted {len(extracted)} invoice(s) from archive {archive_path}")
+    return extracted
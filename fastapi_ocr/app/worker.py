@@ -1,17 +1,34 @@
 from celery import Celery
+from celery.signals import task_success, task_failure, celeryd_init, worker_ready, worker_process_shutdown
+from kombu import Queue
+import asyncio
+import json
 import os
-import pytesseract
-import cv2
-import numpy as np
-from pdf2image import convert_from_path
 import re
+import redis
+import threading
 from datetime import datetime
 import logging
-from typing import Dict, Any, List
-from pathlib import Path
+from typing import Dict, Any, List, Optional
+from .core import metrics
+from .core.config import settings
+from .core.serialization import celery_serialization_settings
+from .core.worker_profile import worker_profile
+from .services.page_ocr import PAGE_WORKERS, extract_text, extract_layout, extract_layout_tiered
+from .services.extraction import extract_invoice_data
+from .services.layout_ocr import OCR_MODE, extract_invoice_data_from_layout
+from .services.result_cache import reference_result, resolve_result, resolve_results
+from .services.blobs import open_blob, release_blob
+from .services.notifications import REDIS_URL, publish_task_event
+from .services.node_client import get_node_client
+from .services.routing import OCR_QUEUES, QUEUE_FAST
 
 logger = logging.getLogger(__name__)
 
+# Pages already run in parallel threads; keep Tesseract from also
+# starting an OpenMP thread per core for each of them
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
 celery = Celery(
     'ocr_tasks',
     broker=os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0'),
@@ -19,70 +36,203 @@ celery = Celery(
 )
 
 celery.conf.update(
-    task_serializer='json',
-    accept_content=['json'],
-    result_serializer='json',
+    # json, or compressed msgpack with OCR_RESULT_SERIALIZER=msgpack
+    **celery_serialization_settings(),
     timezone='UTC',
     enable_utc=True,
+    # OCR jobs are routed per job by estimated cost (services.routing);
+    # everything else, such as webhook deliveries, uses the fast queue.
+    # A worker started without -Q consumes all of them.
+    task_queues=[Queue(name) for name in OCR_QUEUES],
+    task_default_queue=QUEUE_FAST,
+    # Each invoice fans its pages out over PAGE_WORKERS threads
+    **worker_profile(threads_per_task=PAGE_WORKERS),
 )
 
+# OCR results waiting to be pushed to the Node backend, as JSON
+# {"invoiceId", "data"} entries; deliver_ocr_results drains them in batches
+DELIVERY_QUEUE_KEY = "ocr:deliveries:pending"
+# Entries a deliver_ocr_results task has claimed, one list per task ID,
+# until the Node backend accepts them; the task's retries and redeliveries
+# resume from it
+DELIVERY_CLAIMED_KEY_PREFIX = "ocr:deliveries:claimed"
+# Entries still not accepted after DELIVERY_MAX_RETRIES, kept for inspection
+DELIVERY_DEAD_KEY = "ocr:deliveries:dead"
+DELIVERY_MAX_RETRIES = 5
+
+_redis: Optional[redis.Redis] = None
+# Event loop the Node client runs on in this process; it lives across
+# tasks so the client's pooled connections stay open between deliveries
+_delivery_loop: Optional[asyncio.AbstractEventLoop] = None
+_delivery_lock = threading.Lock()
+
+
+def _get_redis() -> redis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(REDIS_URL)
+    return _redis
+
+
+def _run_delivery(coroutine):
+    global _delivery_loop
+    with _delivery_lock:
+        if _delivery_loop is None:
+            _delivery_loop = asyncio.new_event_loop()
+        return _delivery_loop.run_until_complete(coroutine)
+
 @celery.task
-def process_invoice(file_path: str) -> Dict[str, Any]:
+def process_invoice(blob: Dict[str, Any], content_hash: str = None, invoice_id: str = None,
+                    batch_id: str = None) -> Dict[str, Any]:
     """
-    Process invoice file and extract relevant information using OCR
+    Process an uploaded invoice (a services.blobs descriptor) and extract
+    relevant information using OCR.
+    When the upload's content hash is given, the result is cached under it
+    and the task returns a reference to the cached copy (see
+    services.result_cache). invoice_id and batch_id are read by the
+    completion notifications: the result is pushed to the Node backend for
+    invoice_id and announced on the batch's event stream. The blob is
+    released once the task has finished for good, not here, so retries
+    and redeliveries still find it.
     """
     try:
-        file_path_obj = Path(file_path)
-        
-        # Read file content to determine type
-        with open(file_path_obj, 'rb') as f:
-            file_content = f.read(4)
-        
-        # Convert PDF to images if needed
-        if file_content.startswith(b'%PDF'):
-            images = convert_from_path(file_path)
-            image = np.array(images[0])
-        else:
-            # Handle image files
-            image = cv2.imread(str(file_path))
-            if image is None:
-                raise ValueError("Could not read image file")
-
-        # Preprocess image
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-
-        # Extract text using OCR
-        text = pytesseract.image_to_string(thresh)
-
-        # Extract invoice details using regex patterns
-        invoice_data = {
-            "invoiceNumber": extract_invoice_number(text),
-            "date": extract_date(text),
-            "dueDate": extract_due_date(text),
-            "totalAmount": extract_total_amount(text),
-            "taxAmount": extract_tax_amount(text),
-            "status": "PENDING",  # Default status
-            "clientId": extract_client_id(text),
-            "projectId": extract_project_id(text),
-            "description": extract_description(text),
-            "items": extract_items(text)
-        }
-
-        return invoice_data
+        # Stage timings are exported per invoice (see core.metrics)
+        with metrics.track_invoice(), open_blob(blob) as file_path:
+            # Rasterize and OCR every page, one page per pool thread
+            if OCR_MODE in ("layout", "tiered"):
+                # Fields read by region, with confidences and table rows;
+                # tiered stops after the cheapest pass that reads them confidently
+                layout = extract_layout_tiered(file_path) if OCR_MODE == "tiered" else extract_layout(file_path)
+                with metrics.stage("extraction"):
+                    invoice_data = extract_invoice_data_from_layout(layout)
+            else:
+                text = extract_text(file_path)
+
+                # Extract invoice details in a single pass over the text
+                with metrics.stage("extraction"):
+                    invoice_data = extract_invoice_data(text)
+
+            with metrics.stage("store"):
+                # The result cache notes the size of what it stores
+                result = reference_result(content_hash, invoice_data)
+
+        return result
 
     except Exception as e:
         logger.error(f"Error processing invoice: {str(e)}")
         raise
-    finally:
-        # Clean up temporary file
+
+def queue_ocr_result(invoice_id: str, data: Dict[str, Any]):
+    """
+    Queue an OCR result, or a reference to a cached one, for the Node.js
+    backend. Results queued within NODE_CALLBACK_BATCH_WINDOW_MS of each
+    other are delivered together by one deliver_ocr_results task.
+    """
+    _get_redis().rpush(DELIVERY_QUEUE_KEY, json.dumps({"invoiceId": invoice_id, "data": data}))
+    deliver_ocr_results.apply_async(countdown=settings.NODE_CALLBACK_BATCH_WINDOW_MS / 1000)
+
+# Acked late so a worker lost mid-delivery has the task redelivered, and
+# with it the entries it had claimed
+@celery.task(bind=True, max_retries=DELIVERY_MAX_RETRIES, acks_late=True, reject_on_worker_lost=True)
+def deliver_ocr_results(self):
+    """
+    Push up to NODE_CALLBACK_BATCH_SIZE queued results to the Node.js
+    backend in one bulk request, over this process's pooled client (see
+    services.node_client). The entries are moved atomically to a list
+    claimed by this task and leave it only once the backend has accepted
+    them. Results it does not accept, or all of them when the request
+    fails, are retried with backoff, then dead-lettered. A task that finds
+    the queue drained by an earlier one does nothing.
+    """
+    client = _get_redis()
+    claimed_key = f"{DELIVERY_CLAIMED_KEY_PREFIX}:{self.request.id}"
+    claimed = client.lrange(claimed_key, 0, -1)
+    if not claimed:
+        pipe = client.pipeline()
+        for _ in range(settings.NODE_CALLBACK_BATCH_SIZE):
+            pipe.lmove(DELIVERY_QUEUE_KEY, claimed_key, "LEFT", "RIGHT")
+        claimed = [entry for entry in pipe.execute() if entry is not None]
+    if not claimed:
+        return
+
+    entries = [json.loads(entry) for entry in claimed]
+    results = []
+    for entry, data in zip(entries, resolve_results([entry["data"] for entry in entries])):
+        if data is None:
+            logger.warning(f"OCR result for invoice {entry['invoiceId']} expired before delivery")
+        else:
+            results.append((entry["invoiceId"], data))
+
+    failed = set()
+    if results:
         try:
-            if file_path_obj.exists():
-                file_path_obj.unlink()
-                logger.info(f"Cleaned up temporary file: {file_path}")
-        except Exception as cleanup_error:
-            logger.warning(f"Could not clean up file {file_path}: {cleanup_error}")
+            failed = {invoice_id for invoice_id, _ in _run_delivery(get_node_client().send_ocr_results(results))}
+        except Exception as e:
+            logger.error(f"Error delivering OCR results to the Node backend: {str(e)}")
+            failed = {invoice_id for invoice_id, _ in results}
+        logger.info(f"Delivered {len(results) - len(failed)} of {len(results)} OCR result(s) to the Node backend")
+
+    # Acknowledge everything delivered or expired; keep the rest claimed
+    undelivered = [raw for raw, entry in zip(claimed, entries) if entry["invoiceId"] in failed]
+    exhausted = undelivered and self.request.retries >= self.max_retries
+    pipe = client.pipeline()
+    pipe.delete(claimed_key)
+    if exhausted:
+        pipe.rpush(DELIVERY_DEAD_KEY, *undelivered)
+    elif undelivered:
+        pipe.rpush(claimed_key, *undelivered)
+    pipe.execute()
+
+    if exhausted:
+        logger.error(f"Gave up delivering {len(undelivered)} OCR result(s) to the Node backend, moved to {DELIVERY_DEAD_KEY}")
+    elif undelivered:
+        raise self.retry(countdown=2 ** self.request.retries)
+
+@celeryd_init.connect
+def on_worker_init(**kwargs):
+    """Start from empty metrics, before any pool process is forked"""
+    metrics.reset_multiprocess_dir()
+
+@worker_ready.connect
+def on_worker_ready(**kwargs):
+    """Expose the metrics of every pool process from the main worker process"""
+    metrics.start_metrics_server()
+
+@worker_process_shutdown.connect
+def on_worker_process_shutdown(pid=None, **kwargs):
+    metrics.mark_process_dead(pid or os.getpid())
+
+@task_success.connect(sender=process_invoice)
+def on_invoice_processed(sender=None, result=None, **kwargs):
+    """Announce a completed invoice, fire its webhook and release its upload"""
+    request = sender.request
+    release_blob(request.args[0] if request.args else request.kwargs["blob"])
+    publish_task_event(
+        request.id,
+        {"status": "completed", "data": resolve_result(result)},
+        batch_id=request.kwargs.get('batch_id')
+    )
+    invoice_id = request.kwargs.get('invoice_id')
+    if invoice_id:
+        queue_ocr_result(invoice_id, result)
+
+@task_failure.connect(sender=process_invoice)
+def on_invoice_failed(sender=None, task_id=None, exception=None, args=None, kwargs=None, **extra):
+    """
+    Announce a failed invoice and release its upload. Time limits and lost
+    workers fire this in the parent process, where sender.request is empty,
+    so the task's arguments come from the signal.
+    """
+    if args:
+        release_blob(args[0])
+    publish_task_event(
+        task_id,
+        {"status": "failed", "error": str(exception)},
+        batch_id=(kwargs or {}).get('batch_id')
+    )
 
+# Per-field helpers. process_invoice uses the single-pass
+# services.extraction.extract_invoice_data, which yields the same values.
 def extract_invoice_number(text: str) -> str:
     """Extract invoice number from text"""
     patterns = [
@@ -0,0 +1,76 @@
+"""
+Benchmark: warm in-process Tesseract handles (tesserocr) vs a tesseract
+subprocess per call (pytesseract), on synthetic receipts and full pages.
+
+Run from the fastapi_ocr directory (needs the tesseract binary, and
+tesserocr for the in-process engine):
+    python -m benchmarks.bench_ocr_engine [--iterations N]
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from app.services.ocr_engine import PytesseractEngine, TesserocrEngine, TESSEROCR_AVAILABLE
+
+RECEIPT_LINES = [
+    "CORNER CAFE",
+    "Invoice # 20931",
+    "Date: 14/06/2025",
+    "Latte 2 x 3.50",
+    "Croissant 1 x 2.20",
+    "Tax: 0.92",
+    "Total: 10.12",
+]
+
+
+def render(lines, width, line_height=42):
+    """Draw text lines onto a white grayscale image"""
+    image = np.full((line_height * (len(lines) + 2), width), 255, np.uint8)
+    for index, line in enumerate(lines, start=1):
+        cv2.putText(image, line, (20, index * line_height + 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, 0, 2)
+    return image
+
+
+SAMPLES = {
+    "receipt": render(RECEIPT_LINES, 520),
+    "page": render(RECEIPT_LINES * 8, 1600),
+}
+
+
+def measure(engine, image, iterations):
+    """Return (first call, mean of the following calls) in milliseconds"""
+    start = time.perf_counter()
+    engine.image_to_string(image, config="--dpi 200")
+    first_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        engine.image_to_string(image, config="--dpi 200")
+    return first_ms, (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    engines = [PytesseractEngine()]
+    if TESSEROCR_AVAILABLE:
+        engines.append(TesserocrEngine())
+    else:
+        print("tesserocr is not installed; only the pytesseract engine is measured")
+
+    print(f"{'sample':<10}{'engine':<14}{'first (ms)':>12}{'warm (ms)':>12}{'speedup':>10}")
+    baseline = {}
+    for name, image in SAMPLES.items():
+        for engine in engines:
+            first_ms, warm_ms = measure(engine, image, args.iterations)
+            baseline.setdefault(name, warm_ms)
+            speedup = baseline[name] / warm_ms
+            print(f"{name:<10}{engine.name:<14}{first_ms:>12.1f}{warm_ms:>12.1f}{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
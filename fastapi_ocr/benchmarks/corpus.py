@@ -0,0 +1,176 @@
+"""
+Synthetic invoice corpus with known ground truth, for the throughput benchmark.
+
+Every invoice is generated from a seeded random source, so the same seed
+always yields the same files. Kinds:
+
+- png, jpeg: clean single-page renders
+- scanned: a render that is rotated, blurred, noised and JPEG-compressed
+- pdf: a single scanned-style page in a PDF
+- pdf_multi: a three-page scanned-style PDF, totals on the last page
+- pdf_digital: a PDF with an embedded text layer
+"""
+import json
+import random
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List
+
+import cv2
+import numpy as np
+from PIL import Image
+
+KINDS = ["png", "jpeg", "scanned", "pdf", "pdf_multi", "pdf_digital"]
+SUFFIXES = {"png": ".png", "jpeg": ".jpg", "scanned": ".jpg", "pdf": ".pdf", "pdf_multi": ".pdf", "pdf_digital": ".pdf"}
+MANIFEST = "manifest.json"
+
+# A4 at 200 dpi, the resolution PDFs are rasterized at
+PAGE_WIDTH, PAGE_HEIGHT, PAGE_DPI = 1654, 2339, 200
+LINE_HEIGHT = 64
+PRODUCTS = ["Widget", "Bracket", "Cable", "Adapter", "Consulting hours", "Toner", "Licence", "Support plan"]
+
+
+def make_invoice(rng: random.Random) -> Dict[str, Any]:
+    """Random invoice values; amounts are consistent with the line items"""
+    issued = date(2024, 1, 1) + timedelta(days=rng.randrange(700))
+    items = []
+    for _ in range(rng.randint(2, 8)):
+        quantity = rng.randint(1, 12)
+        unit_price = round(rng.uniform(2, 400), 2)
+        items.append({
+            "description": f"{rng.choice(PRODUCTS)} {rng.choice('ABCDEFGH')}",
+            "quantity": quantity,
+            "unitPrice": unit_price,
+            "totalPrice": round(quantity * unit_price, 2),
+        })
+    net = round(sum(item["totalPrice"] for item in items), 2)
+    tax = round(net * 0.2, 2)
+    return {
+        "invoiceNumber": str(rng.randint(10000, 99999)),
+        "date": issued.strftime("%d/%m/%Y"),
+        "dueDate": (issued + timedelta(days=30)).strftime("%d/%m/%Y"),
+        "clientId": f"CL{rng.randint(1, 999):03d}",
+        "taxAmount": tax,
+        "totalAmount": round(net + tax, 2),
+        "items": items,
+    }
+
+
+def invoice_pages(invoice: Dict[str, Any], pages: int) -> List[List[str]]:
+    """Lay the invoice out as text lines over the given number of pages"""
+    header = [
+        "ACME Supplies Ltd",
+        f"Invoice Number: {invoice['invoiceNumber']}",
+        f"Invoice Date: {invoice['date']}",
+        f"Due Date: {invoice['dueDate']}",
+        f"Client ID: {invoice['clientId']}",
+        "",
+    ]
+    items = [f"{item['description']} {item['quantity']} x ${item['unitPrice']:.2f}" for item in invoice["items"]]
+    totals = [
+        "",
+        f"Tax: {invoice['taxAmount']:.2f}",
+        f"Total: {invoice['totalAmount']:.2f}",
+    ]
+    per_page = -(-len(items) // pages)
+    layout = []
+    for index in range(pages):
+        lines = header if index == 0 else [f"Invoice Number: {invoice['invoiceNumber']} (page {index + 1})"]
+        lines = lines + items[index * per_page:(index + 1) * per_page]
+        if index == pages - 1:
+            lines = lines + totals
+        layout.append(lines)
+    return layout
+
+
+def render_page(lines: List[str]) -> np.ndarray:
+    """Draw text lines onto a white grayscale A4 page"""
+    page = np.full((PAGE_HEIGHT, PAGE_WIDTH), 255, np.uint8)
+    for index, line in enumerate(lines, start=2):
+        cv2.putText(page, line, (140, index * LINE_HEIGHT), cv2.FONT_HERSHEY_SIMPLEX, 1.3, 0, 3)
+    return page
+
+
+def scan(page: np.ndarray, rng: random.Random) -> np.ndarray:
+    """Make a clean render look scanned: slight rotation, blur, grey paper and sensor noise"""
+    center = (page.shape[1] / 2, page.shape[0] / 2)
+    rotation = cv2.getRotationMatrix2D(center, rng.uniform(-2, 2), 1.0)
+    page = cv2.warpAffine(page, rotation, (page.shape[1], page.shape[0]), borderValue=255)
+    page = cv2.GaussianBlur(page, (3, 3), 0)
+    noise = np.random.default_rng(rng.randrange(2 ** 32)).normal(0, 12, page.shape)
+    return np.clip(page * 0.92 + noise, 0, 255).astype(np.uint8)
+
+
+def text_pdf(pages: List[List[str]], path: Path):
+    """Write a PDF whose pages carry the lines as a Helvetica text layer"""
+    kids = " ".join(f"{3 + index * 2} 0 R" for index in range(len(pages)))
+    font = 3 + len(pages) * 2
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>"]
+    for index, lines in enumerate(pages):
+        escaped = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines]
+        content = "BT /F1 12 Tf 50 790 Td 16 TL " + " ".join(f"({line}) '" for line in escaped) + " ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {4 + index * 2} 0 R "
+            f"/Resources << /Font << /F1 {font} 0 R >> >> >>"
+        )
+        objects.append(f"<< /Length {len(content)} >>\nstream\n{content}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    pdf, offsets = "%PDF-1.4\n", []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    pdf += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    path.write_text(pdf)
+
+
+def write_document(kind: str, invoice: Dict[str, Any], path: Path, rng: random.Random) -> int:
+    """Write one invoice as the given kind; returns its page count"""
+    pages = invoice_pages(invoice, 3 if kind == "pdf_multi" else 1)
+    if kind == "pdf_digital":
+        text_pdf(pages, path)
+        return len(pages)
+
+    images = [render_page(lines) for lines in pages]
+    if kind in ("scanned", "pdf", "pdf_multi"):
+        images = [scan(image, rng) for image in images]
+
+    if kind == "png":
+        cv2.imwrite(str(path), images[0])
+    elif kind in ("jpeg", "scanned"):
+        cv2.imwrite(str(path), images[0], [cv2.IMWRITE_JPEG_QUALITY, 60 if kind == "scanned" else 90])
+    else:
+        pil_pages = [Image.fromarray(image) for image in images]
+        pil_pages[0].save(path, "PDF", resolution=PAGE_DPI, save_all=True, append_images=pil_pages[1:])
+    return len(pages)
+
+
+def build_corpus(directory: Path, per_kind: int, seed: int, kinds: List[str] = KINDS) -> List[Dict[str, Any]]:
+    """
+    Generate the corpus into directory, or reuse it when a manifest for the
+    same seed and size is already there. Returns the manifest entries: file
+    name, kind, page count and ground truth of every invoice.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest_path = directory / MANIFEST
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text())
+        if manifest["seed"] == seed and manifest["per_kind"] == per_kind and manifest["kinds"] == kinds:
+            return manifest["documents"]
+
+    rng = random.Random(seed)
+    documents = []
+    for kind in kinds:
+        for index in range(per_kind):
+            invoice = make_invoice(rng)
+            path = directory / f"{kind}-{index:03d}{SUFFIXES[kind]}"
+            pages = write_document(kind, invoice, path, rng)
+            documents.append({"file": path.name, "kind": kind, "pages": pages, "truth": invoice})
+
+    manifest_path.write_text(json.dumps(
+        {"seed": seed, "per_kind": per_kind, "kinds": kinds, "documents": documents}, indent=2
+    ))
+    return documents
@@ -0,0 +1,81 @@
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.services import batches, result_cache
+from app.services.result_cache import RESULT_REF, ResultCache
+from app.services.routing import QUEUE_BATCH
+
+
+@pytest.fixture(autouse=True)
+def stores(result_backend, monkeypatch):
+    redis = fakeredis.FakeRedis()
+    monkeypatch.setattr(batches, "_get_redis", lambda: redis)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ResultCache(ttl=60, max_entries=10)
+    cache.client = fakeredis.FakeRedis()
+    for module in (batches, result_cache):
+        monkeypatch.setattr(module, "get_result_cache", lambda: cache)
+    return cache
+
+
+def staged(tmp_path, name):
+    path = tmp_path / f"{name}.png"
+    path.write_bytes(f"invoice {name}".encode())
+    return {"filename": f"{name}.png", "file_path": str(path), "content_hash": name}
+
+
+def test_cached_invoices_complete_and_the_rest_become_jobs(cache, tmp_path):
+    cache.set("a", {"invoiceNumber": "a"})
+
+    batch_id, jobs = batches.create_batch([staged(tmp_path, "a"), staged(tmp_path, "b")])
+
+    assert [(job["content_hash"], job["batch_id"], job["queue"]) for job in jobs] == [("b", batch_id, QUEUE_BATCH)]
+    assert list(tmp_path.iterdir()) == []
+    status = batches.get_batch_status(batch_id)
+    assert [item["filename"] for item in status["items"]] == ["a.png", "b.png"]
+    assert status["items"][0]["data"] == {"invoiceNumber": "a"}
+    assert status["items"][1]["task_id"] == jobs[0]["task_id"]
+
+
+def test_status_aggregates_partial_completion_and_failures(cache, result_backend, tmp_path):
+    batch_id, jobs = batches.create_batch([staged(tmp_path, name) for name in ("a", "b", "c")])
+    result_backend.store_result(jobs[0]["task_id"], {"invoiceNumber": "a"}, "SUCCESS")
+    result_backend.mark_as_failure(jobs[1]["task_id"], ValueError("unreadable"))
+
+    status = batches.get_batch_status(batch_id)
+
+    assert (status["status"], status["total"], status["done"], status["failed"], status["pending"]) == (
+        "processing", 3, 1, 1, 1
+    )
+    assert [item["status"] for item in status["items"]] == ["completed", "failed", "processing"]
+    assert status["items"][1]["error"] == "unreadable"
+
+    # A finished task whose cached result is gone counts as failed
+    result_backend.store_result(jobs[2]["task_id"], {RESULT_REF: "ocr:result:expired"}, "SUCCESS")
+    status = batches.get_batch_status(batch_id)
+    assert (status["status"], status["done"], status["failed"], status["pending"]) == ("completed", 1, 2, 0)
+    assert status["items"][2]["error"] == "OCR result has expired"
+
+
+def test_unknown_batch_has_no_status(cache):
+    assert batches.get_batch_status("no-such-batch") is None
+
+
+def test_failed_registration_releases_committed_blobs(cache, tmp_path, monkeypatch):
+    released = []
+    monkeypatch.setattr(batches, "release_blob", released.append)
+    cache.set("b", {"invoiceNumber": "b"})
+
+    def unavailable(result):
+        raise ConnectionError("result backend unavailable")
+
+    monkeypatch.setattr(batches, "record_completed_task", unavailable)
+
+    with pytest.raises(ConnectionError):
+        batches.create_batch([staged(tmp_path, "a"), staged(tmp_path, "b")])
+
+    assert [blob["store"] for blob in released] == ["inline"]
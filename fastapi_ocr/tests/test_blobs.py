@@ -0,0 +1,74 @@
+import contextlib
+import pytest
+from pathlib import Path
+from app.services import blobs
+
+
+class InMemoryRedis:
+    """Stands in for the Redis commands the blob stores use"""
+
+    def __init__(self):
+        self.values = {}
+
+    def incr(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+    def decr(self, key):
+        self.values[key] = self.values.get(key, 0) - 1
+        return self.values[key]
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+    def expire(self, key, ttl):
+        pass
+
+    def pipeline(self):
+        return self
+
+    def execute(self):
+        pass
+
+    def lock(self, name, timeout=None):
+        return contextlib.nullcontext()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    redis = InMemoryRedis()
+    monkeypatch.setattr(blobs, "_get_redis", lambda: redis)
+    monkeypatch.setattr(blobs, "INLINE_MAX_BYTES", 16)
+    monkeypatch.setattr(blobs, "_stores", {"local": blobs.BlobStore("local", str(tmp_path / "blobs"))})
+    return blobs.get_blob_store("local")
+
+
+def stage(store, content: bytes, suffix=".pdf") -> Path:
+    staged = store.staging_path(suffix)
+    staged.write_bytes(content)
+    return staged
+
+
+def test_small_uploads_travel_inline(store):
+    blob = blobs.commit_upload(stage(store, b"%PDF tiny"), "hash")
+
+    assert blob["store"] == "inline"
+    assert list(store.root.iterdir()) == []
+    with blobs.open_blob(blob) as path:
+        assert Path(path).read_bytes() == b"%PDF tiny" and path.endswith(".pdf")
+    assert not Path(path).exists()
+
+
+def test_identical_uploads_share_a_blob_until_the_last_release(store):
+    content = b"%PDF-1.4 " + b"x" * 100
+    first = blobs.commit_upload(stage(store, content), "abc")
+    second = blobs.commit_upload(stage(store, content), "abc")
+
+    assert first == second == {"store": "local", "id": "abc.pdf"}
+    assert [path.name for path in store.root.iterdir()] == ["abc.pdf"]
+
+    blobs.release_blob(first)
+    with blobs.open_blob(second) as path:
+        assert Path(path).read_bytes() == content
+    blobs.release_blob(second)
+    assert list(store.root.iterdir()) == []
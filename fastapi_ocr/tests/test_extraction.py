@@ -0,0 +1,55 @@
+import pytest
+from app.services.extraction import extract_invoice_data
+from app.worker import (
+    extract_invoice_number,
+    extract_date,
+    extract_due_date,
+    extract_total_amount,
+    extract_tax_amount,
+    extract_client_id,
+    extract_project_id,
+    extract_description,
+    extract_items,
+)
+
+SAMPLE_TEXTS = [
+    "Invoice Number: 12345\nDate: 21/09/2025\nTotal: 100.50",
+    "INVOICE #778\nInvoice Date: 01/02/2024\nDue Date: 15/02/2024\n"
+    "Client ID: C42\nProject Number: P9\nDescription:  Monthly support \n"
+    "Widget 2 x $15.50\nGadget 3x 4,25\nSubtotal: 43.75\nVAT: 8.75\nAmount Due: 52.50",
+    "Payment Due: 31/12/2025\nDate: 12-31-2025\nCustomer ID: ACME\nDetails: Hardware\nTax: €3.10",
+    "Invoice ID: 9\n10 X 1.00 is not an item\n5 x 2.00\nTotal 7.00",
+]
+
+
+def helper_results(text):
+    return {
+        "invoiceNumber": extract_invoice_number(text),
+        "dueDate": extract_due_date(text),
+        "totalAmount": extract_total_amount(text),
+        "taxAmount": extract_tax_amount(text),
+        "clientId": extract_client_id(text),
+        "projectId": extract_project_id(text),
+        "description": extract_description(text),
+        "items": extract_items(text),
+    }
+
+
+@pytest.mark.parametrize("text", SAMPLE_TEXTS)
+def test_engine_matches_field_helpers(text):
+    invoice_data = extract_invoice_data(text)
+
+    for field, expected in helper_results(text).items():
+        assert invoice_data[field] == expected
+    # Unparseable dates fall back to "now", so compare the day only
+    assert invoice_data["date"][:10] == extract_date(text)[:10]
+    assert invoice_data["status"] == "PENDING"
+
+
+def test_engine_defaults_for_empty_text():
+    invoice_data = extract_invoice_data("")
+
+    assert invoice_data["invoiceNumber"] == "Unknown"
+    assert invoice_data["totalAmount"] == 0.0
+    assert invoice_data["dueDate"] is None
+    assert invoice_data["items"] == []
@@ -0,0 +1,96 @@
+import numpy as np
+from app.services import layout_ocr
+
+
+def words(row, top, confidence=0.95):
+    """Build word boxes for one row from (text, left) pairs"""
+    return [
+        {"text": text, "confidence": confidence, "box": (left, top, left + 10 * len(text), top + 20)}
+        for text, left in row
+    ]
+
+
+def invoice_lines(total_confidence=0.95):
+    page_words = (
+        words([("Invoice", 50), ("#", 140), ("1042", 160)], 40)
+        + words([("Date:", 50), ("15/03/2024", 120)], 80)
+        + words([("Description", 50), ("Qty", 400), ("Price", 500), ("Amount", 600)], 160)
+        + words([("Consulting", 50), ("services", 160), ("2", 400), ("150.00", 500), ("300.00", 600)], 200)
+        + words([("(March)", 50)], 230)
+        + words([("Hosting", 50), ("49.99", 600)], 270)
+        + words([("Tax:", 50), ("69.99", 600)], 340)
+        + words([("Total:", 50)], 380)
+        + words([("419.98", 600)], 383, confidence=total_confidence)
+    )
+    # Word order from Tesseract is not guaranteed to follow rows
+    return layout_ocr.group_lines(list(reversed(page_words)))
+
+
+def test_group_lines_joins_label_and_distant_value():
+    lines = invoice_lines()
+
+    assert lines[0]["text"] == "Invoice # 1042"
+    assert lines[-1]["text"] == "Total: 419.98"
+
+
+def test_find_regions_splits_header_items_and_totals():
+    regions = layout_ocr.find_regions(invoice_lines())
+
+    assert [line["text"] for line in regions["header"]] == ["Invoice # 1042", "Date: 15/03/2024"]
+    assert len(regions["items"]) == 3
+    assert [line["text"] for line in regions["totals"]] == ["Tax: 69.99", "Total: 419.98"]
+
+
+def test_parse_table_rows_reads_columns():
+    items = layout_ocr.parse_table_rows(layout_ocr.find_regions(invoice_lines())["items"])
+
+    assert items == [
+        {"description": "Consulting services (March)", "quantity": 2, "unitPrice": 150.0, "totalPrice": 300.0},
+        {"description": "Hosting", "quantity": 1, "unitPrice": 49.99, "totalPrice": 49.99},
+    ]
+
+
+def test_analyze_page_rereads_only_uncertain_fields(monkeypatch):
+    rereads = []
+    monkeypatch.setattr(layout_ocr, "read_lines", lambda page, dpi: invoice_lines(total_confidence=0.4))
+    monkeypatch.setattr(
+        layout_ocr, "reread_field",
+        lambda page, field, located, dpi: rereads.append(field) or ("419.98", 0.9)
+    )
+
+    page = layout_ocr.analyze_page(np.zeros((1, 1), np.uint8), 200)
+
+    assert rereads == ["totalAmount"]
+    assert page["fields"]["totalAmount"] == {"value": "419.98", "confidence": 0.9}
+    assert page["fields"]["invoiceNumber"]["value"] == "1042"
+
+
+def test_extract_invoice_data_from_layout_reports_confidence(monkeypatch):
+    monkeypatch.setattr(layout_ocr, "read_lines", lambda page, dpi: invoice_lines(total_confidence=0.4))
+    monkeypatch.setattr(layout_ocr, "reread_field", lambda page, field, located, dpi: None)
+
+    invoice = layout_ocr.extract_invoice_data_from_layout([layout_ocr.analyze_page(None, 200)])
+
+    assert invoice["invoiceNumber"] == "1042"
+    assert invoice["date"] == "2024-03-15T00:00:00"
+    assert invoice["totalAmount"] == 419.98
+    assert invoice["taxAmount"] == 69.99
+    assert len(invoice["items"]) == 2
+    assert invoice["confidence"]["totalAmount"] == 0.4
+    assert invoice["lowConfidenceFields"] == ["totalAmount"]
+
+
+def test_uncertain_fields_lists_required_fields_below_threshold(monkeypatch):
+    monkeypatch.setattr(layout_ocr, "REQUIRED_FIELDS", ["invoiceNumber", "totalAmount", "date", "clientId"])
+
+    confident = layout_ocr.analyze_lines(invoice_lines())
+    uncertain = layout_ocr.analyze_lines(invoice_lines(total_confidence=0.4))
+
+    assert layout_ocr.uncertain_fields([confident]) == ["clientId"]
+    assert layout_ocr.uncertain_fields([uncertain]) == ["totalAmount", "clientId"]
+
+
+def test_confidence_threshold_comes_from_settings(monkeypatch):
+    monkeypatch.setattr(layout_ocr.settings, "OCR_CONFIDENCE_THRESHOLD", 0.3)
+
+    assert layout_ocr.uncertain_fields([layout_ocr.analyze_lines(invoice_lines(total_confidence=0.4))]) == []
@@ -0,0 +1,35 @@
+import pytest
+from app.core import metrics
+
+
+@pytest.mark.parametrize("pages, bucket", [(0, "1"), (1, "1"), (2, "2"), (4, "3-5"), (30, "11-50"), (400, "51+")])
+def test_page_bucket(pages, bucket):
+    assert metrics.page_bucket(pages) == bucket
+
+
+def sample(name, **labels):
+    return metrics.REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_track_invoice_observes_stages_with_invoice_labels():
+    labels = {"file_type": "image", "pages": "1"}
+    before = sample("ocr_stage_duration_seconds_count", stage="ocr", **labels)
+
+    with metrics.track_invoice() as trace:
+        metrics.describe(file_type="image", pages=1, ocr_pages=1)
+        metrics.record_stage("ocr", 0.2)
+        metrics.record_stage("ocr", 0.3)
+        trace.result_bytes = 512
+
+    assert sample("ocr_stage_duration_seconds_count", stage="ocr", **labels) == before + 1
+    assert sample("ocr_invoices_total", status="completed", **labels) >= 1
+
+
+def test_failed_invoice_is_counted_without_timings():
+    before = sample("ocr_invoices_total", status="failed", file_type="unknown", pages="1")
+
+    with pytest.raises(RuntimeError):
+        with metrics.track_invoice():
+            raise RuntimeError("unreadable")
+
+    assert sample("ocr_invoices_total", status="failed", file_type="unknown", pages="1") == before + 1
@@ -0,0 +1,35 @@
+import asyncio
+import httpx
+from app.services.node_client import NodeBackendClient
+
+
+def client_with(handler) -> NodeBackendClient:
+    client = NodeBackendClient()
+    client.client = httpx.AsyncClient(base_url="http://node", transport=httpx.MockTransport(handler))
+    return client
+
+
+def test_results_share_one_bulk_request():
+    requests = []
+
+    def handler(request):
+        requests.append(request.url.path)
+        return httpx.Response(200)
+
+    failed = asyncio.run(client_with(handler).send_ocr_results([("1", {}), ("2", {})]))
+
+    assert failed == []
+    assert requests == ["/api/invoices/ocr-results"]
+
+
+def test_falls_back_to_one_request_per_result_and_reports_rejections():
+    def handler(request):
+        if request.url.path == "/api/invoices/ocr-results":
+            return httpx.Response(404)
+        return httpx.Response(400 if request.url.path == "/api/invoices/2/ocr-result" else 200)
+
+    client = client_with(handler)
+    failed = asyncio.run(client.send_ocr_results([("1", {"a": 1}), ("2", {"b": 2})]))
+
+    assert failed == [("2", {"b": 2})]
+    assert not client.bulk_supported
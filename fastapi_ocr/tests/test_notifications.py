@@ -0,0 +1,38 @@
+import json
+from app.services import notifications
+
+
+class RecordingPublisher:
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, channel, message):
+        self.messages.append((channel, json.loads(message)))
+
+
+def test_task_events_are_published_on_the_task_and_batch_channels(monkeypatch):
+    publisher = RecordingPublisher()
+    monkeypatch.setattr(notifications, "_publisher", publisher)
+
+    notifications.publish_task_event("t1", {"status": "completed"}, batch_id="b1")
+    notifications.publish_task_event("t2", {"status": "failed", "error": "unreadable"})
+
+    assert publisher.messages == [
+        ("ocr:events:task:t1", {"task_id": "t1", "status": "completed"}),
+        ("ocr:events:batch:b1", {"task_id": "t1", "status": "completed"}),
+        ("ocr:events:task:t2", {"task_id": "t2", "status": "failed", "error": "unreadable"}),
+    ]
+
+
+def test_publishing_never_fails_the_task(monkeypatch):
+    class BrokenPublisher:
+        def publish(self, channel, message):
+            raise ConnectionError("redis is down")
+
+    monkeypatch.setattr(notifications, "_publisher", BrokenPublisher())
+
+    notifications.publish_task_event("t1", {"status": "completed"})
+
+
+def test_sse_messages_carry_the_event_name_and_json_data():
+    assert notifications.format_sse("completed", {"task_id": "t1"}) == 'event: completed\ndata: {"task_id": "t1"}\n\n'
@@ -0,0 +1,13 @@
+from app.services.ocr_engine import parse_config, DEFAULT_PSM
+
+
+def test_parse_config_reads_psm_dpi_and_variables():
+    psm, dpi, variables = parse_config("--psm 7 -c tessedit_char_whitelist=0123456789., --dpi 200")
+
+    assert psm == 7
+    assert dpi == 200
+    assert variables == (("tessedit_char_whitelist", "0123456789.,"),)
+
+
+def test_parse_config_defaults():
+    assert parse_config("") == (DEFAULT_PSM, None, ())
@@ -0,0 +1,158 @@
+import asyncio
+import json
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import ocr
+from app.services import batches, blobs, result_cache
+from app.services.result_cache import ResultCache
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ResultCache(ttl=60, max_entries=10)
+    cache.client = fakeredis.FakeRedis()
+    for module in (ocr, batches, result_cache):
+        monkeypatch.setattr(module, "get_result_cache", lambda: cache)
+    batch_redis = fakeredis.FakeRedis()
+    monkeypatch.setattr(batches, "_get_redis", lambda: batch_redis)
+    return cache
+
+
+@pytest.fixture
+def staging_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(blobs, "BLOB_DIR", str(tmp_path))
+    monkeypatch.setattr(blobs, "_stores", {})
+    return tmp_path
+
+
+@pytest.fixture
+def dispatched(monkeypatch):
+    jobs = []
+
+    async def fake_dispatch(new_jobs):
+        jobs.extend(new_jobs)
+
+    monkeypatch.setattr(ocr, "dispatch_ocr_jobs", fake_dispatch)
+    return jobs
+
+
+@pytest.fixture
+def client(cache, staging_dir, dispatched, result_backend):
+    app = FastAPI()
+    app.include_router(ocr.router)
+    return TestClient(app)
+
+
+def upload(client, content=b"\x89PNG invoice", **form):
+    return client.post("/process-invoice", files={"file": ("invoice.png", content, "image/png")}, data=form)
+
+
+def test_repeated_upload_is_served_from_the_result_cache(client, cache, dispatched, staging_dir, monkeypatch):
+    queued = []
+    monkeypatch.setattr(ocr, "queue_ocr_result", lambda invoice_id, data: queued.append((invoice_id, data)))
+
+    first = upload(client)
+    assert first.json()["status"] == "processing"
+    assert len(dispatched) == 1
+    cache.set(dispatched[0]["content_hash"], {"invoiceNumber": "1042"})
+
+    second = upload(client, invoice_id="inv-1").json()
+
+    assert second["status"] == "completed"
+    assert second["data"] == {"invoiceNumber": "1042"}
+    # No second job, and the staged copy of the duplicate is gone
+    assert len(dispatched) == 1
+    assert list(staging_dir.iterdir()) == []
+    assert client.get(f"/task/{second['task_id']}").json()["data"] == {"invoiceNumber": "1042"}
+    assert [invoice_id for invoice_id, _ in queued] == ["inv-1"]
+
+
+@pytest.fixture
+def broker_down(monkeypatch):
+    released = []
+
+    async def unavailable(jobs):
+        raise ConnectionError("broker unavailable")
+
+    monkeypatch.setattr(ocr, "dispatch_ocr_jobs", unavailable)
+    monkeypatch.setattr(ocr, "release_blob", released.append)
+    return released
+
+
+def test_upload_that_cannot_be_queued_is_discarded(client, staging_dir, broker_down):
+    response = upload(client)
+
+    assert response.status_code == 500
+    assert list(staging_dir.iterdir()) == []
+    assert [blob["store"] for blob in broker_down] == ["inline"]
+
+
+def test_batch_that_cannot_be_queued_releases_its_blobs(client, staging_dir, broker_down):
+    files = [("files", (f"{name}.png", f"invoice {name}".encode(), "image/png")) for name in ("a", "b")]
+
+    response = client.post("/batch", files=files)
+
+    assert response.status_code == 500
+    assert list(staging_dir.iterdir()) == []
+    assert len(broker_down) == 2
+
+
+class FakeEventHub:
+    """Hands each subscriber a queue holding the given events"""
+
+    def __init__(self, events=(), available=True):
+        self.events = events
+        self.available = available
+        self.subscribed = {}
+
+    async def subscribe(self, channel):
+        if not self.available:
+            raise ConnectionError("OCR event stream is unavailable")
+        queue = asyncio.Queue()
+        for event in self.events:
+            queue.put_nowait(event)
+        self.subscribed[channel] = queue
+        return queue
+
+    def unsubscribe(self, channel, queue):
+        if self.subscribed.get(channel) is queue:
+            del self.subscribed[channel]
+
+
+def sse_events(response):
+    return [
+        (message.split("\n")[0].removeprefix("event: "), json.loads(message.split("\n")[1].removeprefix("data: ")))
+        for message in response.text.strip().split("\n\n")
+    ]
+
+
+def test_task_events_stream_the_state_then_the_completion(client, monkeypatch):
+    completed = {"task_id": "t1", "status": "completed", "data": {"invoiceNumber": "1042"}}
+    hub = FakeEventHub([completed])
+    monkeypatch.setattr(ocr, "get_event_hub", lambda: hub)
+    monkeypatch.setattr(ocr, "_task_status", lambda task_id: {"status": "processing", "task_id": task_id})
+
+    response = client.get("/task/t1/events")
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert sse_events(response) == [("processing", {"status": "processing", "task_id": "t1"}), ("completed", completed)]
+    assert hub.subscribed == {}
+
+
+def test_task_events_of_a_finished_task_close_at_once(client, monkeypatch):
+    monkeypatch.setattr(ocr, "get_event_hub", lambda: FakeEventHub())
+    monkeypatch.setattr(ocr, "_task_status", lambda task_id: {"status": "failed", "task_id": task_id, "error": "unreadable"})
+
+    assert [event for event, _ in sse_events(client.get("/task/t1/events"))] == ["failed"]
+
+
+def test_task_events_need_the_event_hub(client, monkeypatch):
+    monkeypatch.setattr(ocr, "get_event_hub", lambda: FakeEventHub(available=False))
+
+    assert client.get("/task/t1/events").status_code == 503
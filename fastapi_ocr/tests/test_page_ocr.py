@@ -0,0 +1,163 @@
+import multiprocessing
+import pytest
+import cv2
+import numpy as np
+from app.core import metrics
+from app.services import page_ocr
+
+
+@pytest.fixture
+def fake_pdf(tmp_path, monkeypatch):
+    file_path = tmp_path / "invoice.pdf"
+    file_path.write_bytes(b"%PDF-1.4\n...")
+
+    rasterized = []
+
+    def fake_rasterize(path, page_number):
+        rasterized.append(page_number)
+        return np.full((1, 1), page_number, dtype=np.uint8)
+
+    monkeypatch.setattr(page_ocr, "read_text_layers", lambda path, with_words=False: [None] * 3)
+    monkeypatch.setattr(page_ocr, "rasterize_page", fake_rasterize)
+    monkeypatch.setattr(page_ocr, "ocr_image", lambda image, source_dpi=None: f"page {int(image[0, 0])}")
+    # Never reuse page threads across tests
+    monkeypatch.setattr(page_ocr, "_page_pool", None)
+    yield str(file_path), rasterized
+    if page_ocr._page_pool is not None:
+        page_ocr._page_pool.shutdown()
+
+
+def test_ocr_pdf_merges_pages_in_order(fake_pdf, monkeypatch):
+    file_path, rasterized = fake_pdf
+    monkeypatch.setattr(page_ocr, "PAGE_WORKERS", 1)
+
+    assert page_ocr.ocr_pdf(file_path) == "page 1\npage 2\npage 3"
+    assert rasterized == [1, 2, 3]
+
+
+def test_ocr_pdf_with_page_pool(fake_pdf, monkeypatch):
+    file_path, _ = fake_pdf
+    monkeypatch.setattr(page_ocr, "PAGE_WORKERS", 2)
+
+    assert page_ocr.ocr_pdf(file_path) == "page 1\npage 2\npage 3"
+
+
+def _ocr_pdf_in_child(file_path, results):
+    try:
+        results.put(page_ocr.ocr_pdf(file_path))
+    except Exception as e:
+        results.put(f"{type(e).__name__}: {e}")
+
+
+def test_ocr_pdf_with_page_pool_in_daemonic_process(fake_pdf, monkeypatch):
+    # Celery's prefork children are daemonic and may not start processes
+    file_path, _ = fake_pdf
+    monkeypatch.setattr(page_ocr, "PAGE_WORKERS", 2)
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    child = context.Process(target=_ocr_pdf_in_child, args=(file_path, results), daemon=True)
+    child.start()
+    child.join(30)
+
+    assert results.get(timeout=5) == "page 1\npage 2\npage 3"
+
+
+def test_extract_text_rejects_unreadable_image(tmp_path):
+    file_path = tmp_path / "invoice.png"
+    file_path.write_bytes(b"not an image")
+
+    with pytest.raises(ValueError):
+        page_ocr.extract_text(str(file_path))
+
+
+def test_page_pool_is_reused_across_invoices(fake_pdf, monkeypatch):
+    file_path, _ = fake_pdf
+    monkeypatch.setattr(page_ocr, "PAGE_WORKERS", 2)
+
+    page_ocr.ocr_pdf(file_path)
+    pool = page_ocr._page_pool
+    page_ocr.ocr_pdf(file_path)
+
+    assert pool is not None and page_ocr._page_pool is pool
+
+
+def test_ocr_pdf_only_ocrs_pages_without_text_layer(fake_pdf, monkeypatch):
+    file_path, rasterized = fake_pdf
+    monkeypatch.setattr(page_ocr, "PAGE_WORKERS", 1)
+    monkeypatch.setattr(
+        page_ocr, "read_text_layers",
+        lambda path, with_words=False: [{"text": "digital 1"}, None, {"text": "digital 3"}]
+    )
+
+    assert page_ocr.ocr_pdf(file_path) == "digital 1\npage 2\ndigital 3"
+    assert rasterized == [2]
+
+
+def test_stages_from_page_threads_count_towards_the_invoice(fake_pdf, monkeypatch):
+    file_path, _ = fake_pdf
+    monkeypatch.setattr(page_ocr, "PAGE_WORKERS", 2)
+
+    with metrics.collect() as trace:
+        page_ocr.extract_text(file_path)
+
+    assert (trace.file_type, trace.pages, trace.ocr_pages) == ("pdf", 3, 3)
+    assert {"sniff", "text_layer", "rasterize"} <= set(trace.stages)
+
+
+def fake_layout(confidence):
+    fields = {"invoiceNumber": "1042", "date": "15/03/2024", "totalAmount": "419.98"}
+    return {
+        "text": "",
+        "fields": {field: {"value": value, "confidence": confidence} for field, value in fields.items()},
+        "items": [],
+    }
+
+
+@pytest.mark.parametrize("confidences, passes", [
+    ([0.95], ["fast"]),
+    ([0.5, 0.95], ["fast", "full"]),
+    ([0.5, 0.5, 0.5], ["fast", "full", "retry"]),
+])
+def test_tiered_layout_stops_at_first_confident_pass(tmp_path, monkeypatch, confidences, passes):
+    file_path = tmp_path / "invoice.png"
+    cv2.imwrite(str(file_path), np.full((20, 20), 255, np.uint8))
+    run = []
+
+    def fake_analyze_image(image, source_dpi=None, ocr_pass=None):
+        run.append(ocr_pass.name)
+        return fake_layout(confidences[len(run) - 1])
+
+    monkeypatch.setattr(page_ocr, "analyze_image", fake_analyze_image)
+    monkeypatch.setattr(page_ocr, "OCR_PASSES", [
+        page_ocr.OcrPass("fast", 150, ["binarize"], reread=False),
+        page_ocr.OcrPass("full", 200, ["binarize"], reread=True),
+        page_ocr.OcrPass("retry", 300, ["binarize"], reread=True),
+    ])
+
+    with metrics.collect() as trace:
+        pages = page_ocr.extract_layout_tiered(str(file_path))
+
+    assert run == passes
+    assert pages[0]["fields"]["totalAmount"]["confidence"] == confidences[-1]
+    assert trace.ocr_pass == passes[-1]
+
+
+def test_tiered_layout_keeps_text_layer_pages_across_passes(fake_pdf, monkeypatch):
+    file_path, _ = fake_pdf
+    monkeypatch.setattr(page_ocr, "PAGE_WORKERS", 1)
+    monkeypatch.setattr(
+        page_ocr, "read_text_layers",
+        lambda path, with_words=False: [{"text": "digital", "words": []}, None]
+    )
+    monkeypatch.setattr(page_ocr, "analyze_text_layer", lambda words: fake_layout(1.0))
+    run = []
+    monkeypatch.setattr(
+        page_ocr, "analyze_pdf_page",
+        lambda path, page_number, ocr_pass=None: run.append((page_number, ocr_pass.name)) or fake_layout(0.5)
+    )
+
+    pages = page_ocr.extract_layout_tiered(file_path)
+
+    assert len(pages) == 2
+    # Totals come from the last page, which stays uncertain until the last pass
+    assert run == [(2, ocr_pass.name) for ocr_pass in page_ocr.OCR_PASSES]
@@ -0,0 +1,74 @@
+import pytest
+from app.services import pdf_render
+
+pytest.importorskip("pypdfium2")
+
+
+def test_rasterize_page_renders_grayscale_at_configured_dpi(text_pdf, monkeypatch):
+    monkeypatch.setattr(pdf_render, "PDF_DPI", 144)
+
+    page = pdf_render.rasterize_page(text_pdf, 1)
+
+    assert page.ndim == 2 and page.dtype.name == "uint8"
+    assert page.shape == (842 * 2, 595 * 2)
+    assert page.min() == 0 and page.max() == 255
+
+
+def test_read_text_layers_returns_text_and_word_positions(text_pdf):
+    layers = pdf_render.read_text_layers(text_pdf, with_words=True)
+
+    assert pdf_render.get_page_count(text_pdf) == 1
+    assert layers[0]["text"].splitlines()[0] == "Invoice # 1042"
+    first, second = layers[0]["words"][:2]
+    assert (first["text"], second["text"]) == ("Invoice", "#")
+    # Top-left origin at PDF_DPI: the first line sits in the top tenth, words left to right
+    page_height = 842 * pdf_render.PDF_DPI / 72
+    assert first["box"][1] < page_height / 10 and first["box"][2] <= second["box"][0]
+
+
+def test_read_text_layers_flags_scanned_pages(scanned_pdf):
+    assert pdf_render.read_text_layers(scanned_pdf) == [None]
+
+
+def test_estimate_scanned_pages_counts_pages_without_text(text_pdf, scanned_pdf):
+    assert pdf_render.estimate_scanned_pages(text_pdf) == (1, 0)
+    assert pdf_render.estimate_scanned_pages(scanned_pdf) == (1, 1)
+
+
+def test_estimate_scanned_pages_samples_long_documents(tmp_path, monkeypatch):
+    from PIL import Image
+    path = tmp_path / "long.pdf"
+    pages = [Image.new("L", (100, 140), 255) for _ in range(10)]
+    pages[0].save(path, save_all=True, append_images=pages[1:])
+    checked = []
+    get_textpage = pdf_render.pdfium.PdfPage.get_textpage
+
+    def counting_get_textpage(page):
+        checked.append(page)
+        return get_textpage(page)
+
+    monkeypatch.setattr(pdf_render.pdfium.PdfPage, "get_textpage", counting_get_textpage)
+
+    assert pdf_render.estimate_scanned_pages(str(path), sample_pages=4) == (10, 10)
+    assert len(checked) == 4
+
+
+def test_digital_pdf_is_read_without_ocr(text_pdf, monkeypatch):
+    from app.services import page_ocr
+    monkeypatch.setattr(page_ocr, "PAGE_WORKERS", 1)
+    monkeypatch.setattr(page_ocr, "ocr_image", lambda image, source_dpi=None: pytest.fail("OCR should not run"))
+
+    assert "Total: 419.98" in page_ocr.extract_text(text_pdf)
+
+
+def test_digital_pdf_layout_comes_from_the_text_layer(text_pdf, monkeypatch):
+    from app.services import page_ocr
+    from app.services.layout_ocr import extract_invoice_data_from_layout
+    monkeypatch.setattr(page_ocr, "analyze_image", lambda image, source_dpi=None: pytest.fail("OCR should not run"))
+
+    invoice = extract_invoice_data_from_layout(page_ocr.extract_layout(text_pdf))
+
+    assert invoice["invoiceNumber"] == "1042"
+    assert invoice["totalAmount"] == 419.98
+    assert invoice["taxAmount"] == 69.99
+    assert invoice["lowConfidenceFields"] == []
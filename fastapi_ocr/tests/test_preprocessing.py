@@ -0,0 +1,70 @@
+import cv2
+import numpy as np
+import pytest
+from app.services import preprocessing
+
+
+@pytest.fixture
+def page():
+    page = np.full((1600, 1200), 255, np.uint8)
+    for line in range(15):
+        cv2.putText(page, "INVOICE 12345 TOTAL 99.00 TAX", (150, 300 + line * 60),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.1, 0, 2)
+    return page
+
+
+def rotate(image, angle):
+    height, width = image.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(image, matrix, (width, height), borderValue=255)
+
+
+@pytest.mark.parametrize("angle", [-6, 4])
+def test_deskew_straightens_text(page, angle):
+    skewed = rotate(page, angle)
+
+    assert preprocessing.detect_skew(skewed) == pytest.approx(angle, abs=0.5)
+    assert abs(preprocessing.detect_skew(preprocessing.deskew(skewed))) < 0.5
+
+
+def test_crop_to_content_removes_margins(page):
+    cropped = preprocessing.crop_to_content(page)
+
+    assert cropped.shape[0] < page.shape[0] and cropped.shape[1] < page.shape[1]
+
+
+def test_binarize_falls_back_to_adaptive_threshold_on_shadows(page):
+    shadow = np.tile(np.linspace(30, 255, page.shape[1]).astype(np.uint8), (page.shape[0], 1))
+    shaded = np.minimum(page, shadow)
+
+    binary = preprocessing.binarize(shaded)
+
+    ink_ratio = 1 - cv2.countNonZero(binary) / binary.size
+    assert ink_ratio < preprocessing.OTSU_MAX_INK_RATIO
+
+
+def test_preprocess_downscales_to_target_dpi(page, monkeypatch):
+    monkeypatch.setattr(preprocessing, "TARGET_DPI", 200)
+    photo = cv2.cvtColor(cv2.resize(page, (3000, 4000)), cv2.COLOR_GRAY2BGR)
+
+    processed, dpi, timings = preprocessing.preprocess(photo)
+
+    assert dpi == 200
+    assert max(processed.shape) <= 200 * preprocessing.PAGE_LONG_SIDE_INCHES
+    assert list(timings) == ["grayscale"] + preprocessing.PREPROCESS_STEPS
+
+
+def test_preprocess_keeps_low_resolution_images(page):
+    processed, dpi, _ = preprocessing.preprocess(page, source_dpi=150)
+
+    assert dpi == 150
+
+
+def test_preprocess_runs_given_steps_at_given_resolution(page):
+    noisy = np.clip(page + np.random.default_rng(0).normal(0, 20, page.shape), 0, 255).astype(np.uint8)
+
+    processed, dpi, timings = preprocessing.preprocess(noisy, source_dpi=300, steps=["resize", "denoise"], target_dpi=150)
+
+    assert dpi == 150
+    assert list(timings) == ["grayscale", "resize", "denoise"]
+    assert processed.std() < cv2.resize(noisy, processed.shape[::-1], interpolation=cv2.INTER_AREA).std()
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import pytest
+from app.services.rabbitmq import RabbitMQ, OCR_EXCHANGE, OCR_TASK_ROUTING_KEY
+
+
+class InMemoryExchange:
+    """Stands in for a confirm-mode exchange; publish returns once 'confirmed'"""
+
+    def __init__(self, fail_on=None):
+        self.published = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fail_on = fail_on
+
+    async def publish(self, message, routing_key):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.001)
+            payload = json.loads(message.body)
+            if payload["task_id"] == self.fail_on:
+                raise RuntimeError("nacked by broker")
+            self.published.append((routing_key, message.message_id, payload))
+        finally:
+            self.in_flight -= 1
+
+
+class InMemoryChannel:
+    def __init__(self, exchange):
+        self.exchange = exchange
+        self.is_closed = False
+
+    async def get_exchange(self, name, ensure=True):
+        assert name == OCR_EXCHANGE
+        return self.exchange
+
+    async def close(self):
+        self.is_closed = True
+
+
+class InMemoryRabbitMQ(RabbitMQ):
+    def __init__(self, exchange, **kwargs):
+        self.exchange = exchange
+        self.channels_opened = 0
+        super().__init__(url="amqp://in-memory/", **kwargs)
+
+    async def _open_channel(self):
+        self.channels_opened += 1
+        return InMemoryChannel(self.exchange)
+
+
+def test_publish_batch_bounds_unconfirmed_messages():
+    jobs = [{"task_id": f"task-{index}", "file_path": f"/tmp/{index}.pdf"} for index in range(20)]
+
+    async def run():
+        exchange = InMemoryExchange()
+        rabbitmq = InMemoryRabbitMQ(exchange, channel_pool_size=2, max_in_flight=4)
+        await rabbitmq.publish(jobs)
+        await rabbitmq.publish(jobs[:1])
+        await rabbitmq.close()
+        return rabbitmq, exchange
+
+    rabbitmq, exchange = asyncio.run(run())
+
+    assert len(exchange.published) == 21
+    assert {routing_key for routing_key, _, _ in exchange.published} == {OCR_TASK_ROUTING_KEY}
+    assert sorted(message_id for _, message_id, _ in exchange.published[:20]) == sorted(job["task_id"] for job in jobs)
+    assert 1 < exchange.max_in_flight <= 4
+    # The channel is returned to the pool and reused
+    assert rabbitmq.channels_opened == 1
+
+
+def test_publish_raises_when_a_message_is_not_confirmed():
+    jobs = [{"task_id": f"task-{index}"} for index in range(5)]
+
+    async def run():
+        rabbitmq = InMemoryRabbitMQ(InMemoryExchange(fail_on="task-3"), channel_pool_size=1, max_in_flight=10)
+        try:
+            await rabbitmq.publish(jobs)
+        finally:
+            await rabbitmq.close()
+
+    with pytest.raises(RuntimeError, match="nacked"):
+        asyncio.run(run())
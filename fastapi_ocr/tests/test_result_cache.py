@@ -0,0 +1,87 @@
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.core import metrics
+from app.services import result_cache
+from app.services.result_cache import RESULT_REF, ResultCache
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ResultCache(ttl=60, max_entries=2)
+    cache.client = fakeredis.FakeRedis()
+    monkeypatch.setattr(result_cache, "get_result_cache", lambda: cache)
+    return cache
+
+
+def test_results_are_served_by_content_hash(cache):
+    cache.set("a", {"invoiceNumber": "a"})
+
+    assert cache.get("a") == {"invoiceNumber": "a"}
+    assert cache.get("b") is None
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    cache.set("a", {"invoiceNumber": "a"})
+    cache.set("b", {"invoiceNumber": "b"})
+    cache.get("a")
+    cache.set("c", {"invoiceNumber": "c"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"invoiceNumber": "a"}
+    assert cache.get("c") == {"invoiceNumber": "c"}
+
+
+def test_results_of_another_pipeline_configuration_are_not_served(cache, monkeypatch):
+    cache.set("a", {"invoiceNumber": "a"})
+    monkeypatch.setattr(result_cache, "OCR_CONFIG_VERSION", "v0-other")
+
+    assert cache.get("a") is None
+
+
+def test_disabled_cache_stores_nothing(cache, monkeypatch):
+    monkeypatch.setattr(result_cache, "CACHE_ENABLED", False)
+    cache.set("a", {"invoiceNumber": "a"})
+
+    assert cache.client.keys() == []
+
+
+def test_referenced_results_survive_eviction(cache):
+    references = [result_cache.reference_result(name, {"invoiceNumber": name}) for name in ("a", "b", "c", "d")]
+    cache.set("e", {"invoiceNumber": "e"})
+
+    assert all(RESULT_REF in reference for reference in references)
+    assert result_cache.resolve_results(references) == [{"invoiceNumber": name} for name in "abcd"]
+
+
+def test_pin_outlasts_the_cache_ttl(cache):
+    key = cache.set("a", {"invoiceNumber": "a"})
+    assert cache.pin(key, seconds=3600)
+
+    assert cache.client.ttl(key) > 60
+    # Storing the same content again keeps the pinned lifetime
+    cache.set("a", {"invoiceNumber": "a"})
+    assert cache.client.ttl(key) > 60
+    assert cache.client.zscore(result_cache.INDEX_KEY, key) is None
+
+
+def test_cache_hits_are_pinned_for_the_task_they_complete(cache):
+    cache.set("a", {"invoiceNumber": "a"})
+    reference = result_cache.cached_reference("a", {"invoiceNumber": "a"})
+    for name in ("b", "c", "d"):
+        cache.set(name, {"invoiceNumber": name})
+
+    assert result_cache.resolve_result(reference) == {"invoiceNumber": "a"}
+
+
+def test_results_are_copied_when_the_entry_is_gone(cache):
+    assert not cache.pin(cache._key("missing"))
+    assert result_cache.cached_reference("missing", {"invoiceNumber": "x"}) == {"invoiceNumber": "x"}
+
+
+def test_stored_result_size_is_noted_on_the_invoice_trace(cache):
+    with metrics.collect() as trace:
+        key = cache.set("a", {"invoiceNumber": "a"})
+
+    assert trace.result_bytes == len(cache.client.get(key))
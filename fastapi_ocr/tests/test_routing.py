@@ -0,0 +1,45 @@
+import pytest
+from app.services import routing
+
+
+def test_digital_pdf_goes_to_fast_queue(text_pdf):
+    pytest.importorskip("pypdfium2")
+    cost = routing.estimate_cost(text_pdf)
+
+    assert cost["pages"] == 1 and cost["scanned_pages"] == 0
+    assert routing.choose_queue(cost) == routing.QUEUE_FAST
+
+
+def test_image_counts_as_one_scanned_page(tmp_path):
+    image = tmp_path / "receipt.png"
+    image.write_bytes(b"\x89PNG" + b"0" * 100)
+
+    assert routing.estimate_cost(str(image)) == {"size": 104, "pages": 1, "scanned_pages": 1}
+
+
+@pytest.mark.parametrize("cost, queue", [
+    ({"size": 1024, "pages": 40, "scanned_pages": 40}, routing.QUEUE_HEAVY),
+    ({"size": 1024, "pages": 40, "scanned_pages": 0}, routing.QUEUE_FAST),
+    ({"size": routing.FAST_MAX_FILE_SIZE + 1, "pages": 1, "scanned_pages": 1}, routing.QUEUE_HEAVY),
+])
+def test_choose_queue_by_cost(cost, queue):
+    assert routing.choose_queue(cost) == queue
+
+
+def test_unreadable_upload_routes_as_heavy(tmp_path):
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"%PDF-1.4 truncated")
+
+    assert routing.route_upload(str(broken)) == (routing.QUEUE_HEAVY, None)
+
+
+def test_time_limits_scale_with_pages_up_to_queue_cap():
+    small = routing.time_limits(routing.QUEUE_HEAVY, pages=1)
+    large = routing.time_limits(routing.QUEUE_HEAVY, pages=500)
+
+    assert small["soft_time_limit"] < small["time_limit"] < large["time_limit"]
+    assert large["time_limit"] == routing.QUEUE_TIME_LIMITS[routing.QUEUE_HEAVY]
+    assert routing.time_limits(routing.QUEUE_FAST) == {
+        "time_limit": routing.QUEUE_TIME_LIMITS[routing.QUEUE_FAST],
+        "soft_time_limit": int(routing.QUEUE_TIME_LIMITS[routing.QUEUE_FAST] * 0.9)
+    }
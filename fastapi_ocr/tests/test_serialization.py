@@ -0,0 +1,52 @@
+import pytest
+from kombu.serialization import dumps as kombu_dumps, loads as kombu_loads
+
+pytest.importorskip("msgpack")
+
+from app.core import serialization
+from app.services import result_cache
+
+RESULT = {"invoiceNumber": "48213", "totalAmount": 988.2, "items": [
+    {"description": f"Widget {index}", "quantity": 2, "unitPrice": 15.5, "totalPrice": 31.0}
+    for index in range(50)
+]}
+
+
+def test_pack_compresses_only_large_payloads():
+    small = serialization.pack({"invoiceNumber": "1"})
+    large = serialization.pack(RESULT)
+
+    assert small[:1] == b"\x00" and large[:1] == b"\x01"
+    assert serialization.unpack(small) == {"invoiceNumber": "1"}
+    assert serialization.unpack(large) == RESULT
+
+
+def test_loads_reads_both_encodings(monkeypatch):
+    monkeypatch.setattr(serialization, "RESULT_SERIALIZER", "msgpack")
+    assert serialization.loads(serialization.dumps(RESULT)) == RESULT
+    assert serialization.loads(b'{"invoiceNumber": "1"}') == {"invoiceNumber": "1"}
+
+
+def test_celery_settings_register_compact_serializer(monkeypatch):
+    monkeypatch.setattr(serialization, "RESULT_SERIALIZER", "msgpack")
+    settings = serialization.celery_serialization_settings()
+
+    assert settings["result_serializer"] == serialization.COMPACT_SERIALIZER
+    assert "json" in settings["accept_content"]
+    content_type, encoding, payload = kombu_dumps(RESULT, serializer=serialization.COMPACT_SERIALIZER)
+    assert kombu_loads(payload, content_type, encoding) == RESULT
+
+
+class StoredResults:
+    def __init__(self, entries):
+        self.entries = entries
+
+    def load(self, keys):
+        return [self.entries.get(key) for key in keys]
+
+
+def test_resolve_results_replaces_references(monkeypatch):
+    monkeypatch.setattr(result_cache, "get_result_cache", lambda: StoredResults({"ocr:result:a": RESULT}))
+    results = [{result_cache.RESULT_REF: "ocr:result:a"}, {"invoiceNumber": "2"}, {result_cache.RESULT_REF: "gone"}]
+
+    assert result_cache.resolve_results(results) == [RESULT, {"invoiceNumber": "2"}, None]
@@ -0,0 +1,57 @@
+import asyncio
+import hashlib
+import io
+import pytest
+import zipfile
+from fastapi import UploadFile
+from app.services.uploads import save_upload, extract_archive, UploadTooLargeError, UPLOAD_CHUNK_SIZE
+
+
+def test_save_upload_streams_and_hashes(tmp_path):
+    content = b"%PDF-1.4\n" + b"x" * (UPLOAD_CHUNK_SIZE * 2 + 10)
+    destination = tmp_path / "invoice.pdf"
+
+    file_hash = asyncio.run(save_upload(UploadFile(file=io.BytesIO(content), filename="invoice.pdf"), destination, len(content)))
+
+    assert file_hash == hashlib.sha256(content).hexdigest()
+    assert destination.read_bytes() == content
+
+
+def test_save_upload_rejects_oversized_file(tmp_path):
+    content = b"x" * (UPLOAD_CHUNK_SIZE + 1)
+    destination = tmp_path / "invoice.pdf"
+
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(save_upload(UploadFile(file=io.BytesIO(content), filename="invoice.pdf"), destination, UPLOAD_CHUNK_SIZE))
+
+    assert not destination.exists()
+
+
+def test_extract_archive_keeps_supported_invoices(tmp_path):
+    archive_path = tmp_path / "batch.zip"
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        archive.writestr("march/invoice-1.pdf", b"%PDF-1.4\none")
+        archive.writestr("invoice-2.PNG", b"png")
+        archive.writestr("notes.txt", b"ignored")
+        archive.writestr("__MACOSX/._invoice-1.pdf", b"ignored")
+    output_dir = tmp_path / "uploads"
+    output_dir.mkdir()
+
+    extracted = extract_archive(archive_path, output_dir, ["pdf", "png"], max_files=10, max_file_size=1024)
+
+    assert [entry["filename"] for entry in extracted] == ["march/invoice-1.pdf", "invoice-2.PNG"]
+    assert extracted[0]["content_hash"] == hashlib.sha256(b"%PDF-1.4\none").hexdigest()
+    assert len(list(output_dir.iterdir())) == 2
+
+
+def test_extract_archive_enforces_file_count(tmp_path):
+    archive_path = tmp_path / "batch.zip"
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        for index in range(3):
+            archive.writestr(f"invoice-{index}.pdf", b"%PDF-1.4")
+    output_dir = tmp_path / "uploads"
+    output_dir.mkdir()
+
+    with pytest.raises(UploadTooLargeError):
+        extract_archive(archive_path, output_dir, ["pdf"], max_files=2, max_file_size=1024)
+    assert list(output_dir.iterdir()) == []
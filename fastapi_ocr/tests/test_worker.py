@@ -0,0 +1,159 @@
+import json
+
+import pytest
+from celery.exceptions import Retry
+from app import worker
+
+
+def test_failure_fired_outside_the_task_is_still_announced(monkeypatch):
+    # A hard time limit fires task_failure in the parent, where request.kwargs is None
+    released, events = [], []
+    monkeypatch.setattr(worker, "release_blob", released.append)
+    monkeypatch.setattr(worker, "publish_task_event", lambda task_id, event, batch_id=None: events.append((task_id, event, batch_id)))
+
+    worker.on_invoice_failed(
+        sender=worker.process_invoice, task_id="t1", exception=TimeoutError("Time limit exceeded"),
+        args=[{"path": "/tmp/blob"}], kwargs={"batch_id": "b1"}
+    )
+    worker.on_invoice_failed(sender=worker.process_invoice, task_id="t2", exception=TimeoutError(), args=None, kwargs=None)
+
+    assert released == [{"path": "/tmp/blob"}]
+    assert events == [
+        ("t1", {"status": "failed", "error": "Time limit exceeded"}, "b1"),
+        ("t2", {"status": "failed", "error": ""}, None),
+    ]
+
+
+class RecordingNodeClient:
+    def __init__(self, rejected=(), error=None):
+        self.batches = []
+        self.rejected = set(rejected)
+        self.error = error
+
+    async def send_ocr_results(self, results):
+        self.batches.append(results)
+        if self.error:
+            raise self.error
+        return [result for result in results if result[0] in self.rejected]
+
+
+@pytest.fixture
+def deliveries(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    redis = fakeredis.FakeRedis()
+    monkeypatch.setattr(worker, "_get_redis", lambda: redis)
+    monkeypatch.setattr(worker.deliver_ocr_results, "apply_async", lambda **options: None)
+    monkeypatch.setattr(worker, "resolve_results", lambda results: results)
+    return redis
+
+
+@pytest.fixture
+def retried(monkeypatch):
+    countdowns = []
+
+    def fake_retry(countdown=None):
+        countdowns.append(countdown)
+        return Retry()
+
+    monkeypatch.setattr(worker.deliver_ocr_results, "retry", fake_retry)
+    return countdowns
+
+
+def deliver(task_id="delivery-1", retries=0):
+    worker.deliver_ocr_results.push_request(id=task_id, retries=retries)
+    try:
+        worker.deliver_ocr_results()
+    finally:
+        worker.deliver_ocr_results.pop_request()
+
+
+def stored(redis, key):
+    return [json.loads(entry)["invoiceId"] for entry in redis.lrange(key, 0, -1)]
+
+
+def test_queued_results_are_delivered_in_one_batch(deliveries, monkeypatch):
+    client = RecordingNodeClient()
+    monkeypatch.setattr(worker, "get_node_client", lambda: client)
+    for invoice_id in ("1", "2", "3"):
+        worker.queue_ocr_result(invoice_id, {"invoiceNumber": invoice_id})
+
+    deliver("delivery-1")
+    # Later tasks scheduled for the same results find nothing left to send
+    deliver("delivery-2")
+
+    assert client.batches == [[(invoice_id, {"invoiceNumber": invoice_id}) for invoice_id in ("1", "2", "3")]]
+    assert deliveries.keys() == []
+
+
+def test_only_rejected_results_are_retried(deliveries, retried, monkeypatch):
+    client = RecordingNodeClient(rejected={"2"})
+    monkeypatch.setattr(worker, "get_node_client", lambda: client)
+    worker.queue_ocr_result("1", {"invoiceNumber": "1"})
+    worker.queue_ocr_result("2", {"invoiceNumber": "2"})
+
+    with pytest.raises(Retry):
+        deliver()
+    assert stored(deliveries, f"{worker.DELIVERY_CLAIMED_KEY_PREFIX}:delivery-1") == ["2"]
+
+    client.rejected.clear()
+    deliver(retries=1)
+    assert client.batches[-1] == [("2", {"invoiceNumber": "2"})]
+    assert retried == [1]
+    assert deliveries.keys() == []
+
+
+def test_results_stay_claimed_when_the_request_fails(deliveries, retried, monkeypatch):
+    monkeypatch.setattr(worker, "get_node_client", lambda: RecordingNodeClient(error=ConnectionError("refused")))
+    worker.queue_ocr_result("1", {"invoiceNumber": "1"})
+
+    with pytest.raises(Retry):
+        deliver()
+
+    assert stored(deliveries, f"{worker.DELIVERY_CLAIMED_KEY_PREFIX}:delivery-1") == ["1"]
+    assert stored(deliveries, worker.DELIVERY_QUEUE_KEY) == []
+
+
+def test_redelivered_task_resumes_its_claimed_results(deliveries, monkeypatch):
+    # A worker lost mid-delivery left its claim behind
+    claimed_key = f"{worker.DELIVERY_CLAIMED_KEY_PREFIX}:delivery-1"
+    deliveries.rpush(claimed_key, json.dumps({"invoiceId": "1", "data": {"invoiceNumber": "1"}}))
+    worker.queue_ocr_result("2", {"invoiceNumber": "2"})
+    client = RecordingNodeClient()
+    monkeypatch.setattr(worker, "get_node_client", lambda: client)
+
+    deliver("delivery-1")
+
+    assert client.batches == [[("1", {"invoiceNumber": "1"})]]
+    assert stored(deliveries, worker.DELIVERY_QUEUE_KEY) == ["2"]
+
+
+def test_results_are_dead_lettered_after_the_last_retry(deliveries, retried, monkeypatch):
+    monkeypatch.setattr(worker, "get_node_client", lambda: RecordingNodeClient(rejected={"1"}))
+    worker.queue_ocr_result("1", {"invoiceNumber": "1"})
+
+    deliver(retries=worker.DELIVERY_MAX_RETRIES)
+
+    assert retried == []
+    assert stored(deliveries, worker.DELIVERY_DEAD_KEY) == ["1"]
+    assert deliveries.keys(f"{worker.DELIVERY_CLAIMED_KEY_PREFIX}:*") == []
+
+
+def test_completed_invoice_is_announced_and_its_blob_released(monkeypatch):
+    released, events, queued = [], [], []
+    monkeypatch.setattr(worker, "release_blob", released.append)
+    monkeypatch.setattr(worker, "publish_task_event", lambda task_id, event, batch_id=None: events.append((task_id, event, batch_id)))
+    monkeypatch.setattr(worker, "queue_ocr_result", lambda invoice_id, data: queued.append(invoice_id))
+    monkeypatch.setattr(worker, "resolve_result", lambda result: result)
+
+    # Sent with the blob as a keyword argument, as apply_async(kwargs=...) does
+    worker.process_invoice.push_request(
+        id="t1", args=[], kwargs={"blob": {"store": "local", "id": "a.pdf"}, "invoice_id": "inv-1", "batch_id": "b1"}
+    )
+    try:
+        worker.on_invoice_processed(sender=worker.process_invoice, result={"invoiceNumber": "1042"})
+    finally:
+        worker.process_invoice.pop_request()
+
+    assert released == [{"store": "local", "id": "a.pdf"}]
+    assert events == [("t1", {"status": "completed", "data": {"invoiceNumber": "1042"}}, "b1")]
+    assert queued == ["inv-1"]
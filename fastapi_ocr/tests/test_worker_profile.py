@@ -0,0 +1,25 @@
+from app.core import worker_profile
+
+
+def test_profile_sizes_concurrency_to_task_parallelism(monkeypatch):
+    monkeypatch.setattr(worker_profile, "CPU_COUNT", 8)
+    monkeypatch.setattr(worker_profile, "WORKER_CONCURRENCY", 0)
+
+    assert worker_profile.worker_profile(threads_per_task=4)["worker_concurrency"] == 2
+    assert worker_profile.worker_profile(threads_per_task=16)["worker_concurrency"] == 1
+
+
+def test_profile_acks_late_and_outlasts_tasks_in_visibility_timeout():
+    profile = worker_profile.worker_profile(task_time_limit=4000)
+
+    assert profile["task_acks_late"] and profile["task_reject_on_worker_lost"]
+    assert profile["worker_prefetch_multiplier"] == 1
+    assert profile["broker_transport_options"]["visibility_timeout"] == 8000
+
+
+def test_time_limits_for_pages():
+    limits = worker_profile.time_limits_for_pages(3)
+
+    expected = worker_profile.TIME_LIMIT_BASE + 3 * worker_profile.TIME_LIMIT_PER_PAGE
+    assert limits == {"time_limit": expected, "soft_time_limit": int(expected * 0.9)}
+    assert worker_profile.time_limits_for_pages(10_000)["time_limit"] == worker_profile.TASK_TIME_LIMIT
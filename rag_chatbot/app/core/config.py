@@ -29,6 +29,45 @@ class Settings(BaseSettings):
     OLLAMA_MODEL: str = "llama2"
     LLM_TEMPERATURE: float = 0.7
     LLM_MAX_TOKENS: int = 1000
+
+    # Chat pipeline: answers are generated asynchronously; the remaining
+    # synchronous work (embedding the question, querying Chroma) runs in a
+    # bounded thread pool
+    CHAT_TIMEOUT_SECONDS: float = 120.0
+    CHAT_EXECUTOR_WORKERS: int = 4
+    # Answers generated at once; match Ollama's OLLAMA_NUM_PARALLEL
+    CHAT_MAX_CONCURRENT: int = 4
+
+    # Embeddings (services.embeddings): one model per process, shared by
+    # chat, retrieval and indexing
+    EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    # "huggingface" (sentence-transformers on torch) or "onnx": EMBEDDING_MODEL
+    # exported with services.onnx_embeddings.export_onnx, optionally int8
+    EMBEDDING_BACKEND: str = "huggingface"
+    EMBEDDING_ONNX_PATH: str = "./data/onnx/all-MiniLM-L6-v2/model.int8.onnx"
+    # tokenizer.json, or its directory; defaults to the model's directory
+    EMBEDDING_TOKENIZER_PATH: str = ""
+    # ONNX Runtime threads per inference call (0: one per core)
+    EMBEDDING_ONNX_THREADS: int = 0
+    # Query embeddings kept in memory
+    EMBEDDING_CACHE_SIZE: int = 10000
+    # Concurrent queries arriving within this window share one forward pass
+    EMBEDDING_BATCH_WINDOW_MS: float = 5.0
+    EMBEDDING_MAX_BATCH_SIZE: int = 32
+    # Inference threads, and torch threads per forward pass (0: torch default)
+    EMBEDDING_WORKERS: int = 1
+    EMBEDDING_TORCH_THREADS: int = 0
+
+    # Redis
+    REDIS_URL: str = "redis://localhost:6379/0"
+
+    # Semantic answer cache (services.response_cache)
+    ENABLE_CACHE: bool = True
+    CACHE_TTL: int = 3600
+    # Cosine similarity of question embeddings above which an answer is reused
+    CHAT_CACHE_SIMILARITY: float = 0.95
+    # Cached answers kept per enterprise
+    CHAT_CACHE_MAX_ENTRIES: int = 1000
     
     # Monitoring
     ENABLE_METRICS: bool = True
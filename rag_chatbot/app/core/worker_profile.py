@@ -0,0 +1,58 @@
+import os
+from typing import Dict, Any, Optional
+
+# Performance profile shared by the THEA Celery workers (OCR and RAG).
+# Every value can be overridden from the environment, and per app through
+# worker_profile(**overrides).
+
+CPU_COUNT = os.cpu_count() or 1
+
+WORKER_CONCURRENCY = int(os.getenv('CELERY_WORKER_CONCURRENCY', 0))  # 0: CPU-aware default
+PREFETCH_MULTIPLIER = int(os.getenv('CELERY_PREFETCH_MULTIPLIER', 1))
+ACKS_LATE = os.getenv('CELERY_ACKS_LATE', 'true').lower() == 'true'
+MAX_TASKS_PER_CHILD = int(os.getenv('CELERY_MAX_TASKS_PER_CHILD', 200))
+# Children are replaced after a task leaves them above this resident size
+MAX_MEMORY_PER_CHILD_KB = int(os.getenv('CELERY_MAX_MEMORY_PER_CHILD_KB', 512 * 1024))
+TASK_TIME_LIMIT = int(os.getenv('CELERY_TASK_TIME_LIMIT', 30 * 60))
+TASK_SOFT_TIME_LIMIT = int(os.getenv('CELERY_TASK_SOFT_TIME_LIMIT', 25 * 60))
+# Per-task limits scaled to document size: base plus an allowance per page
+TIME_LIMIT_BASE = int(os.getenv('CELERY_TIME_LIMIT_BASE', 30))
+TIME_LIMIT_PER_PAGE = int(os.getenv('CELERY_TIME_LIMIT_PER_PAGE', 20))
+
+
+def default_concurrency(threads_per_task: int = 1) -> int:
+    """Worker processes that keep every core busy without oversubscribing"""
+    return max(1, CPU_COUNT // max(threads_per_task, 1))
+
+
+def worker_profile(threads_per_task: int = 1, **overrides) -> Dict[str, Any]:
+    """
+    Celery settings for CPU-bound workers: one task prefetched per process,
+    acks after completion with redelivery when a child dies mid-task,
+    children recycled by task count and memory (OpenCV/poppler and model
+    leaks), and global soft/hard time limits.
+    threads_per_task is the parallelism of a single task, used to size the
+    default concurrency. overrides are passed through as Celery settings.
+    """
+    profile = {
+        "worker_concurrency": WORKER_CONCURRENCY or default_concurrency(threads_per_task),
+        "worker_prefetch_multiplier": PREFETCH_MULTIPLIER,
+        "task_acks_late": ACKS_LATE,
+        "task_reject_on_worker_lost": ACKS_LATE,
+        "worker_max_tasks_per_child": MAX_TASKS_PER_CHILD,
+        "worker_max_memory_per_child": MAX_MEMORY_PER_CHILD_KB,
+        "task_time_limit": TASK_TIME_LIMIT,
+        "task_soft_time_limit": TASK_SOFT_TIME_LIMIT,
+    }
+    profile.update(overrides)
+    # With late acks on Redis, a task not acked within the visibility timeout
+    # is delivered again, so the timeout must outlast the longest task
+    profile.setdefault("broker_transport_options", {"visibility_timeout": max(3600, profile["task_time_limit"] * 2)})
+    return profile
+
+
+def time_limits_for_pages(pages: int, cap: Optional[int] = None) -> Dict[str, int]:
+    """Hard and soft time limits for a task over the given number of pages"""
+    limit = TIME_LIMIT_BASE + TIME_LIMIT_PER_PAGE * max(pages, 1)
+    limit = min(limit, cap or TASK_TIME_LIMIT)
+    return {"time_limit": limit, "soft_time_limit": int(limit * 0.9)}
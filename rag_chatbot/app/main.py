@@ -3,6 +3,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from prometheus_fastapi_instrumentator import Instrumentator
 from .routers import chat, health, admin
 from .services.ollama_client import wait_for_ollama, ensure_model_available
+from .services.chat_service import get_chat_service
+import asyncio
 import logging
 
 # Configure logging
@@ -45,4 +47,17 @@ async def startup_event():
     
     # Ensure the required model is available
     logger.info("Ensuring model availability...")
-    await ensure_model_available()
\ No newline at end of file
+    await ensure_model_available()
+    
+    # Load the embedding model and vector store off the event loop, before
+    # the first chat request would have to
+    logger.info("Loading chat service...")
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, get_chat_service)
+    except Exception as e:
+        logger.error(f"Could not load chat service, retrying on first request: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if get_chat_service.cache_info().currsize:
+        get_chat_service().close()
@@ -1,25 +1,65 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.responses import StreamingResponse
 from ..models.chat import ChatRequest, ChatResponse
 from ..services.chat_service import get_chat_service
-from typing import List
+from typing import Any, Awaitable, Dict, List, TypeVar
+import asyncio
+import json
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# How often a pending chat checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 0.5
+# Non-standard "client closed request" status, logged for abandoned chats
+CLIENT_CLOSED_REQUEST = 499
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+class ClientDisconnected(Exception):
+    pass
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format a Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T]) -> T:
+    """
+    Await a chat pipeline, cancelling it when the client disconnects first,
+    so abandoned questions stop generating in Ollama
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise ClientDisconnected()
+    finally:
+        # Also covers this handler being cancelled itself (e.g. on shutdown)
+        task.cancel()
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
+    http_request: Request,
     chat_service = Depends(get_chat_service)
 ):
     """
     Process a chat request and return a response
     """
     try:
-        response = await chat_service.process_query(
-            query=request.query,
-            conversation_id=request.conversation_id,
-            context=request.context
+        response = await cancel_on_disconnect(
+            http_request,
+            chat_service.process_query(
+                query=request.query,
+                conversation_id=request.conversation_id,
+                context=request.context
+            )
         )
         
         return ChatResponse(
@@ -27,6 +67,14 @@ async def chat(
             sources=response["sources"],
             conversation_id=response["conversation_id"]
         )
+    except ClientDisconnected:
+        logger.info("Client disconnected, cancelled chat request")
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail="Timed out generating a response"
+        )
     except Exception as e:
         logger.error(f"Error processing chat request: {str(e)}")
         raise HTTPException(
@@ -34,6 +82,35 @@ async def chat(
             detail=f"Error processing chat request: {str(e)}"
         )
 
+@router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    chat_service = Depends(get_chat_service)
+):
+    """
+    Stream a chat response as Server-Sent Events: a "sources" event with
+    the retrieved sources, "token" events as the answer is generated and a
+    final "done" event with the full response ("error" if it fails).
+    Generation stops when the client disconnects.
+    """
+    async def events():
+        try:
+            async for event, data in chat_service.stream_query(
+                query=request.query,
+                conversation_id=request.conversation_id,
+                context=request.context
+            ):
+                if event == "done":
+                    data = ChatResponse(**data).model_dump()
+                yield format_sse(event, data)
+        except asyncio.TimeoutError:
+            yield format_sse("error", {"detail": "Timed out generating a response"})
+        except Exception as e:
+            logger.error(f"Error streaming chat response: {str(e)}")
+            yield format_sse("error", {"detail": f"Error processing chat request: {str(e)}"})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @router.get("/conversations/{conversation_id}", response_model=List[ChatResponse])
 async def get_conversation_history(
     conversation_id: str,
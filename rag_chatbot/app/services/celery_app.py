@@ -1,5 +1,6 @@
 from celery import Celery
 from ..core.config import settings
+from ..core.worker_profile import worker_profile
 
 # Create Celery app
 celery = Celery(
@@ -17,8 +18,5 @@ celery.conf.update(
     timezone="UTC",
     enable_utc=True,
     task_track_started=True,
-    task_time_limit=30 * 60,  # 30 minutes
-    task_soft_time_limit=25 * 60,  # 25 minutes
-    worker_prefetch_multiplier=1,
-    worker_max_tasks_per_child=1000,
+    **worker_profile(),
 )
\ No newline at end of file
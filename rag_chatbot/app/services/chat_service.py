@@ -1,41 +1,118 @@
-from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from langchain.chains import RetrievalQAWithSourcesChain
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.prompts import PromptTemplate
+from langchain_core.retrievers import BaseRetriever
+from prometheus_client import Histogram
 from langchain_community.vectorstores import Chroma
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import JSONLoader
 from langchain_community.llms import Ollama
 from ..worker import celery
 from ..core.config import settings
+from .embeddings import get_embedding_service
+from .response_cache import cache_scope, documents_fingerprint, get_semantic_cache
 import chromadb
+import asyncio
 import os
 import json
+import time
 import logging
-from typing import Dict, Any, List
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
 from uuid import uuid4
 
 logger = logging.getLogger(__name__)
 
+EMPTY_QUERY_RESPONSE = "I'm sorry, but your query appears to be empty. Please provide a question or request."
+FALLBACK_RESPONSE = "I apologize, but I encountered an issue processing your request. Please try again."
+
+# Streamed answers are generated in a single call over all retrieved
+# documents, so the first token does not wait for a map step per document
+STREAM_PROMPT = PromptTemplate.from_template(
+    "Use the following extracted parts of THEA's records to answer the question. "
+    "If they do not contain the answer, say that you don't know.\n\n"
+    "{summaries}\n\n"
+    "Question: {question}\n"
+    "Answer:"
+)
+
+TIME_TO_FIRST_TOKEN = Histogram(
+    "rag_chat_time_to_first_token_seconds",
+    "Time from receiving a streamed chat query to its first answer token",
+    buckets=(0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 20, 30, 60)
+)
+
+class ExecutorRetriever(BaseRetriever):
+    """
+    Wraps a synchronous retriever so that, on the async path, embedding the
+    question and querying the vector store run in the given bounded thread
+    pool instead of on the event loop or in an unbounded default executor.
+    The question's embedding is usually cached by then (services.embeddings).
+    """
+    retriever: BaseRetriever
+    executor: ThreadPoolExecutor
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.retriever.invoke(query)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(self.retriever.invoke, query))
+
+class RetrievedDocuments(BaseRetriever):
+    """Hands the chain documents already retrieved for its question"""
+    documents: List[Document]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.documents
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.documents
+
 class ChatService:
     def __init__(self):
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
+        # Shared with indexing; caches and batches query embeddings
+        self.embeddings = get_embedding_service()
         persist_directory = settings.VECTOR_STORE_PATH or "./data/chroma"
 
         self.vector_store = Chroma(
             persist_directory=persist_directory,
             embedding_function=self.embeddings
         )
+        # Ollama is called over aiohttp on the async path, so generating an
+        # answer never holds the event loop or a thread
         self.llm = Ollama(
             base_url=settings.OLLAMA_BASE_URL,
             model=settings.OLLAMA_MODEL,
-            temperature=settings.LLM_TEMPERATURE
+            temperature=settings.LLM_TEMPERATURE,
+            timeout=int(settings.CHAT_TIMEOUT_SECONDS)
         )
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.CHAT_EXECUTOR_WORKERS,
+            thread_name_prefix="chat-retrieval"
+        )
+        self.retriever = self.vector_store.as_retriever()
         self.qa_chain = RetrievalQAWithSourcesChain.from_llm(
             llm=self.llm,
-            retriever=self.vector_store.as_retriever()
+            retriever=ExecutorRetriever(
+                retriever=self.retriever,
+                executor=self.executor
+            )
         )
+        # Answers to similar questions over the same documents are reused
+        self.cache = get_semantic_cache()
+        # Queries beyond what Ollama generates in parallel wait here
+        self.generation_slots = asyncio.Semaphore(settings.CHAT_MAX_CONCURRENT)
 
     async def process_query(
         self,
@@ -44,13 +121,16 @@ class ChatService:
         context: Dict[str, Any] = None
     ) -> Dict[str, Any]:
         """
-        Process a chat query and return a response with sources
+        Process a chat query and return a response with sources.
+        Raises asyncio.TimeoutError after CHAT_TIMEOUT_SECONDS, retrieval
+        and waiting for a generation slot included; cancelling the caller
+        cancels the Ollama request.
         """
         try:
             # Validate query input
             if not query or not query.strip():
                 return {
-                    "response": "I'm sorry, but your query appears to be empty. Please provide a question or request.",
+                    "response": EMPTY_QUERY_RESPONSE,
                     "sources": [],
                     "conversation_id": conversation_id or str(uuid4())
                 }
@@ -59,61 +139,177 @@ class ChatService:
             if not conversation_id:
                 conversation_id = str(uuid4())
 
-            # Prepare query with context
-            enhanced_query = self._enhance_query_with_context(query, context)
+            return await asyncio.wait_for(
+                self._answer(query, conversation_id, context),
+                timeout=settings.CHAT_TIMEOUT_SECONDS
+            )
+        except Exception as e:
+            logger.error(f"Error processing query: {str(e)}")
+            raise
+
+    async def _answer(self, query: str, conversation_id: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Answer a validated query, from the semantic cache or the QA chain"""
+        # Prepare query with context
+        enhanced_query = self._enhance_query_with_context(query, context)
+
+        # Similar questions over the same documents reuse a cached answer;
+        # on a miss the chain answers from the documents retrieved here
+        cache_key, documents = None, None
+        retrieved = await self._retrieve(enhanced_query) if settings.ENABLE_CACHE else None
+        if retrieved is not None:
+            embedding, documents = retrieved
+            cache_key = (cache_scope(context), embedding, documents_fingerprint(documents))
+            cached = await self.cache.get(*cache_key)
+            if cached is not None:
+                result = {**cached, "conversation_id": conversation_id}
+                await self._store_conversation(conversation_id, query, result)
+                return result
 
-            # Get response from QA chain
-            response = self.qa_chain({"question": enhanced_query})
+        # Get response from QA chain
+        response = await self._run_chain(enhanced_query, documents)
+        
+        logger.info(f"QA Chain response: {response}")
+        logger.info(f"Response type: {type(response)}")
+        logger.info(f"Response keys: {response.keys() if isinstance(response, dict) else 'Not a dict'}")
+        
+        # Handle different possible response formats from LangChain
+        if isinstance(response, dict):
+            # Try different possible key names
+            answer = (response.get("answer") or 
+                     response.get("result") or 
+                     response.get("text") or 
+                     response.get("output") or
+                     response.get("response") or  # Add this as potential key
+                     str(response))
             
-            logger.info(f"QA Chain response: {response}")
-            logger.info(f"Response type: {type(response)}")
-            logger.info(f"Response keys: {response.keys() if isinstance(response, dict) else 'Not a dict'}")
+            sources = (response.get("sources") or 
+                      response.get("source_documents") or 
+                      response.get("documents") or 
+                      [])
             
-            # Handle different possible response formats from LangChain
-            if isinstance(response, dict):
-                # Try different possible key names
-                answer = (response.get("answer") or 
-                         response.get("result") or 
-                         response.get("text") or 
-                         response.get("output") or
-                         response.get("response") or  # Add this as potential key
-                         str(response))
-                
-                sources = (response.get("sources") or 
-                          response.get("source_documents") or 
-                          response.get("documents") or 
-                          [])
-                
-                # If we still don't have a proper answer, log the response structure
-                if not answer or answer == str(response):
-                    logger.warning(f"Unexpected response format. Available keys: {list(response.keys()) if isinstance(response, dict) else 'N/A'}")
-                    # Try to extract the first string value from the response
-                    for key, value in response.items():
-                        if isinstance(value, str) and len(value) > 10:  # Assume meaningful responses are longer than 10 chars
-                            answer = value
-                            break
-                    else:
-                        answer = "I apologize, but I encountered an issue processing your request. Please try again."
-                        
-            else:
-                # Fallback for non-dict responses
-                answer = str(response)
-                sources = []
+            # If we still don't have a proper answer, log the response structure
+            if not answer or answer == str(response):
+                logger.warning(f"Unexpected response format. Available keys: {list(response.keys()) if isinstance(response, dict) else 'N/A'}")
+                # Try to extract the first string value from the response
+                for key, value in response.items():
+                    if isinstance(value, str) and len(value) > 10:  # Assume meaningful responses are longer than 10 chars
+                        answer = value
+                        break
+                else:
+                    answer = FALLBACK_RESPONSE
+                    
+        else:
+            # Fallback for non-dict responses
+            answer = str(response)
+            sources = []
+
+        # Structure the response
+        result = {
+            "response": answer,
+            "sources": self._process_sources(sources),
+            "conversation_id": conversation_id
+        }
+
+        if cache_key is not None and answer != FALLBACK_RESPONSE:
+            scope, embedding, fingerprint = cache_key
+            await self.cache.set(
+                scope, enhanced_query, embedding, fingerprint,
+                {"response": result["response"], "sources": result["sources"]}
+            )
 
-            # Structure the response
-            result = {
-                "response": answer,
-                "sources": self._process_sources(sources),
-                "conversation_id": conversation_id
-            }
+        # Store conversation in Redis for history
+        await self._store_conversation(conversation_id, query, result)
 
-            # Store conversation in Redis for history
-            await self._store_conversation(conversation_id, query, result)
+        return result
 
-            return result
+    async def _retrieve(self, question: str) -> Optional[Tuple[List[float], List[Document]]]:
+        """
+        Embed a question and retrieve its documents on the retrieval pool,
+        as the semantic cache needs both. None when that fails, in which
+        case the chain retrieves the documents itself.
+        """
+        try:
+            embedding = await self.embeddings.aembed_query(question)
+            documents = await asyncio.get_running_loop().run_in_executor(
+                self.executor,
+                partial(self.vector_store.similarity_search_by_vector, embedding, **self.retriever.search_kwargs)
+            )
         except Exception as e:
-            logger.error(f"Error processing query: {str(e)}")
-            raise
+            logger.warning(f"Could not retrieve documents for the chat cache: {e}")
+            return None
+        return embedding, documents
+
+    async def _run_chain(self, question: str, documents: List[Document] = None) -> Dict[str, Any]:
+        """
+        Run the QA chain asynchronously, waiting for a generation slot, over
+        the given documents or, without them, over those it retrieves
+        """
+        chain = self.qa_chain
+        if documents is not None:
+            chain = RetrievalQAWithSourcesChain(
+                combine_documents_chain=self.qa_chain.combine_documents_chain,
+                retriever=RetrievedDocuments(documents=documents)
+            )
+
+        async with self.generation_slots:
+            return await chain.ainvoke({"question": question})
+
+    async def stream_query(
+        self,
+        query: str,
+        conversation_id: str = None,
+        context: Dict[str, Any] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Stream a chat response as (event, data) pairs: the retrieved sources
+        first, then answer tokens as Ollama generates them, and finally the
+        assembled response, which is stored in the conversation history
+        """
+        start = time.perf_counter()
+        conversation_id = conversation_id or str(uuid4())
+        if not query or not query.strip():
+            yield "done", {"response": EMPTY_QUERY_RESPONSE, "sources": [], "conversation_id": conversation_id}
+            return
+
+        question = self._enhance_query_with_context(query, context)
+        documents = await asyncio.wait_for(
+            self.qa_chain.retriever.ainvoke(question),
+            timeout=settings.CHAT_TIMEOUT_SECONDS
+        )
+        sources = self._process_sources(documents)
+        yield "sources", {"sources": sources, "conversation_id": conversation_id}
+
+        # A generation slot is held only while Ollama generates; the Ollama
+        # client's own timeout bounds the generation
+        await asyncio.wait_for(self.generation_slots.acquire(), timeout=settings.CHAT_TIMEOUT_SECONDS)
+        try:
+            tokens = []
+            async for token in self.llm.astream(self._stream_prompt(question, documents)):
+                if not tokens:
+                    TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - start)
+                tokens.append(token)
+                yield "token", {"text": token}
+        finally:
+            self.generation_slots.release()
+
+        result = {
+            "response": "".join(tokens).strip(),
+            "sources": sources,
+            "conversation_id": conversation_id
+        }
+        await self._store_conversation(conversation_id, query, result)
+        yield "done", result
+
+    def _stream_prompt(self, question: str, documents: List[Document]) -> str:
+        summaries = "\n\n".join(
+            f"Content: {document.page_content}\nSource: {document.metadata.get('source', 'unknown')}"
+            for document in documents
+        )
+        return STREAM_PROMPT.format(summaries=summaries, question=question)
+
+    def close(self):
+        """Stop the retrieval thread pool"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
 
     def _enhance_query_with_context(
         self,
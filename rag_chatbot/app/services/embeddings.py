@@ -0,0 +1,156 @@
+import asyncio
+import queue
+import threading
+import time
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+from prometheus_client import Histogram
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZES = Histogram(
+    "rag_embedding_batch_size", "Queries embedded per forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+
+def load_backend(model_name: str, backend: str = None) -> Embeddings:
+    """
+    The model that computes embeddings, by EMBEDDING_BACKEND: "huggingface"
+    runs model_name through sentence-transformers and torch; "onnx" runs
+    the exported model at EMBEDDING_ONNX_PATH with ONNX Runtime and never
+    imports torch
+    """
+    backend = backend or settings.EMBEDDING_BACKEND
+    if backend == "onnx":
+        from .onnx_embeddings import OnnxEmbeddings
+        return OnnxEmbeddings(
+            settings.EMBEDDING_ONNX_PATH,
+            tokenizer_path=settings.EMBEDDING_TOKENIZER_PATH or None,
+            threads=settings.EMBEDDING_ONNX_THREADS
+        )
+    if backend != "huggingface":
+        raise ValueError(f"Unknown embedding backend {backend}")
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    if settings.EMBEDDING_TORCH_THREADS:
+        import torch
+        torch.set_num_threads(settings.EMBEDDING_TORCH_THREADS)
+    return HuggingFaceEmbeddings(model_name=model_name)
+
+
+class EmbeddingService(Embeddings):
+    """
+    The process's one embedding model, shared by chat, retrieval and
+    indexing. Query embeddings are kept in an LRU cache; queries that miss
+    it are queued and embedded by inference threads, which gather what
+    arrives within EMBEDDING_BATCH_WINDOW_MS into a single forward pass.
+    Document batches from indexing go straight to the model.
+    """
+
+    def __init__(self, backend: Embeddings, cache_size: int = None, batch_window_ms: float = None,
+                 max_batch_size: int = None, workers: int = None):
+        self.backend = backend
+        self.cache_size = settings.EMBEDDING_CACHE_SIZE if cache_size is None else cache_size
+        self.batch_window = (settings.EMBEDDING_BATCH_WINDOW_MS if batch_window_ms is None else batch_window_ms) / 1000
+        self.max_batch_size = max_batch_size or settings.EMBEDDING_MAX_BATCH_SIZE
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        # Queries being embedded, so concurrent identical queries share one result
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        # Forward passes run for queries, and the queries they embedded
+        self.batches = 0
+        self.batched_queries = 0
+        for index in range(workers or settings.EMBEDDING_WORKERS):
+            threading.Thread(target=self._run, name=f"embedding-{index}", daemon=True).start()
+
+    def _cached(self, text: str) -> Optional[List[float]]:
+        embedding = self._cache.get(text)
+        if embedding is not None:
+            self._cache.move_to_end(text)
+        return embedding
+
+    def submit(self, text: str) -> Future:
+        """Embed a query, returning a future of its embedding"""
+        with self._lock:
+            embedding = self._cached(text)
+            if embedding is not None:
+                future = Future()
+                future.set_result(embedding)
+                return future
+            future = self._pending.get(text)
+            if future is None:
+                future = self._pending[text] = Future()
+                self._queue.put((text, future))
+            return future
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # Waits without holding a thread of the event loop's executor
+        return await asyncio.wrap_future(self.submit(text))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.backend.embed_documents(texts)
+
+    def _next_batch(self) -> List[Tuple[str, Future]]:
+        """
+        Block for a query, then gather more until the window closes or the
+        batch is full. A query arriving alone is embedded right away: the
+        window is only waited for while others are queued behind it.
+        """
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if len(batch) > 1 and remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            texts = [text for text, _ in batch]
+            BATCH_SIZES.observe(len(texts))
+            self.batches += 1
+            self.batched_queries += len(texts)
+            try:
+                embeddings = self.backend.embed_documents(texts)
+            except Exception as e:
+                logger.error(f"Embedding batch of {len(texts)} failed: {e}")
+                with self._lock:
+                    for text, future in batch:
+                        self._pending.pop(text, None)
+                        future.set_exception(e)
+                continue
+
+            with self._lock:
+                for (text, future), embedding in zip(batch, embeddings):
+                    self._pending.pop(text, None)
+                    if self.cache_size:
+                        self._cache[text] = embedding
+                        self._cache.move_to_end(text)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+
+@lru_cache(maxsize=1)
+def get_embedding_service() -> EmbeddingService:
+    """The process-wide embedding service, loading the model on first use"""
+    logger.info(f"Loading {settings.EMBEDDING_BACKEND} embedding model {settings.EMBEDDING_MODEL}")
+    return EmbeddingService(load_backend(settings.EMBEDDING_MODEL))
@@ -1,8 +1,9 @@
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import JSONLoader
 from ..worker import celery
+from .embeddings import get_embedding_service
+from .response_cache import bump_index_version
 import json
 import logging
 from typing import Dict, Any, List
@@ -14,9 +15,7 @@ logger = logging.getLogger(__name__)
 
 class IndexingService:
     def __init__(self):
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
+        self.embeddings = get_embedding_service()
         self.vector_store = Chroma(
             persist_directory="./data/chroma",
             embedding_function=self.embeddings
@@ -40,6 +39,8 @@ class IndexingService:
             
             # Add to vector store
             self.vector_store.add_documents(documents)
+            # Cached chat answers may no longer match the index
+            bump_index_version()
 
             return {
                 "status": "completed",
@@ -208,6 +209,7 @@ async def rebuild_index(self, enterprise_id: str):
             except Exception as e:
                 logger.error(f"Failed to reindex {data_type}: {e}")
                 
+        bump_index_version(enterprise_id)
         logger.info("Index rebuild completed")
         
     except Exception as e:
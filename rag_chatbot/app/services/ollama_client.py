@@ -1,4 +1,4 @@
-import time
+import asyncio
 import httpx
 import logging
 from ..core.config import settings
@@ -20,7 +20,8 @@ async def wait_for_ollama():
         except Exception as e:
             logger.warning(f"Waiting for Ollama service... (attempt {attempt + 1}/{max_attempts})")
             attempt += 1
-            time.sleep(5)
+            # Sleep without holding the event loop
+            await asyncio.sleep(5)
     
     logger.error("Failed to connect to Ollama service")
     return False
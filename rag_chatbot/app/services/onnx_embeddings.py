@@ -0,0 +1,147 @@
+import argparse
+import numpy as np
+import os
+import logging
+from pathlib import Path
+from typing import List
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import onnxruntime
+    from tokenizers import Tokenizer
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+# Longest input the sentence-transformers model was trained on (all-MiniLM-L6-v2)
+MAX_SEQUENCE_LENGTH = 256
+# Texts per inference call when embedding documents
+BATCH_SIZE = 32
+TOKENIZER_FILE = "tokenizer.json"
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings from a transformer exported to ONNX (see
+    export_onnx), run by ONNX Runtime with a standalone tokenizer, so
+    neither torch nor sentence-transformers is loaded. Mean-pooled over
+    tokens and L2-normalized, like the sentence-transformers model.
+    """
+
+    def __init__(self, model_path: str, tokenizer_path: str = None, threads: int = 0):
+        if not ONNX_AVAILABLE:
+            raise RuntimeError("EMBEDDING_BACKEND is onnx but onnxruntime or tokenizers is not installed")
+        tokenizer_path = Path(tokenizer_path or Path(model_path).parent)
+        if tokenizer_path.is_dir():
+            tokenizer_path = tokenizer_path / TOKENIZER_FILE
+        self.tokenizer = Tokenizer.from_file(str(tokenizer_path))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQUENCE_LENGTH)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        logger.info(f"Loaded ONNX embedding model {model_path}")
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return np.concatenate([
+            self._embed(texts[start:start + BATCH_SIZE]) for start in range(0, len(texts), BATCH_SIZE)
+        ]).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
+
+
+def export_onnx(model_name: str, directory: str, quantize: bool = True) -> List[Path]:
+    """
+    Export a Hugging Face sentence-transformers model to directory as
+    model.onnx, and with quantize also as model.int8.onnx (dynamic int8
+    weights), next to its tokenizer.json. Needs torch, transformers and
+    onnx, unlike serving. Returns the model paths written.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    tokenizer.save_pretrained(directory)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    class Encoder(torch.nn.Module):
+        """Fixes the input order and returns only the token embeddings"""
+
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(
+                input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+            ).last_hidden_state
+
+    sample = tokenizer(["An example invoice question", "Another one"], padding=True, return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    inputs = tuple(sample.get(name, torch.zeros_like(sample["input_ids"])) for name in names)
+    path = directory / "model.onnx"
+    with torch.no_grad():
+        torch.onnx.export(
+            Encoder(), inputs, str(path),
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in names + ["last_hidden_state"]},
+            opset_version=14,
+            # The TorchScript exporter; the dynamo one needs onnxscript
+            dynamo=False,
+        )
+    paths = [path]
+    logger.info(f"Exported {model_name} to {path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized = directory / "model.int8.onnx"
+        quantize_dynamic(str(path), str(quantized), weight_type=QuantType.QInt8)
+        paths.append(quantized)
+        logger.info(f"Quantized {path} to {quantized} ({os.path.getsize(quantized) / 2 ** 20:.1f} MB)")
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the embedding model for EMBEDDING_BACKEND=onnx")
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"))
+    parser.add_argument(
+        "--output",
+        default=os.path.dirname(os.getenv("EMBEDDING_ONNX_PATH", "./data/onnx/all-MiniLM-L6-v2/model.int8.onnx")),
+        help="directory for model.onnx, model.int8.onnx and tokenizer.json (default: that of EMBEDDING_ONNX_PATH)"
+    )
+    parser.add_argument("--no-quantize", action="store_true", help="skip the int8 model")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    for path in export_onnx(args.model, args.output, quantize=not args.no_quantize):
+        print(path)
@@ -0,0 +1,176 @@
+import redis
+import redis.asyncio as aioredis
+import numpy as np
+import hashlib
+import json
+import time
+import logging
+from typing import Dict, Any, List, Optional
+from prometheus_client import Counter
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "rag:answer"
+VERSION_KEY = "rag:index:version"
+# Scope of chats and index writes that name no enterprise
+GLOBAL_SCOPE = "global"
+# Candidates above the similarity threshold checked for a matching fingerprint
+MAX_CANDIDATES = 3
+
+CACHE_REQUESTS = Counter("rag_chat_cache_requests_total", "Chat queries by semantic cache outcome", ["result"])
+
+
+def cache_scope(context: Dict[str, Any] = None) -> str:
+    """Enterprise a chat belongs to, read from its context"""
+    context = context or {}
+    return str(context.get("enterprise_id") or context.get("enterpriseId") or GLOBAL_SCOPE)
+
+
+def documents_fingerprint(documents: List[Any]) -> str:
+    """Hash of the IDs of the documents retrieved for a query, in any order"""
+    ids = []
+    for document in documents:
+        document_id = getattr(document, "id", None) or document.metadata.get("source")
+        if not document_id:
+            document_id = hashlib.sha256(document.page_content.encode()).hexdigest()
+        ids.append(str(document_id))
+    return hashlib.sha256("\n".join(sorted(ids)).encode()).hexdigest()
+
+
+def _normalized(embedding: List[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _version_keys(scope: str) -> List[str]:
+    return [VERSION_KEY, f"{VERSION_KEY}:{scope}"]
+
+
+def bump_index_version(enterprise_id: str = None):
+    """
+    Invalidate cached answers after the index changed: those of one
+    enterprise, or of every enterprise when none is given. Chats of the
+    global scope retrieve across every enterprise, so any write invalidates
+    them too. Called by the indexing side, which runs in Celery workers,
+    hence the sync client.
+    """
+    if not settings.ENABLE_CACHE:
+        return
+    try:
+        client = redis.Redis.from_url(settings.REDIS_URL)
+        if enterprise_id is None:
+            client.incr(VERSION_KEY)
+        else:
+            pipe = client.pipeline()
+            pipe.incr(f"{VERSION_KEY}:{enterprise_id}")
+            pipe.incr(f"{VERSION_KEY}:{GLOBAL_SCOPE}")
+            pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not invalidate cached chat answers: {e}")
+
+
+class SemanticCache:
+    """
+    Chat answers cached in Redis by question embedding, per enterprise.
+    A query hits when a cached question is at least CHAT_CACHE_SIMILARITY
+    similar (cosine) and retrieved the same documents. Keys carry the
+    index version, so answers given before the index changed are never
+    served and expire after CACHE_TTL; the least recently used entries of
+    a scope are evicted beyond CHAT_CACHE_MAX_ENTRIES.
+    """
+
+    def __init__(self, redis_url: str = None, ttl: int = None, max_entries: int = None,
+                 similarity: float = None):
+        self.client = aioredis.Redis.from_url(redis_url or settings.REDIS_URL)
+        self.ttl = ttl or settings.CACHE_TTL
+        self.max_entries = max_entries or settings.CHAT_CACHE_MAX_ENTRIES
+        self.similarity = similarity or settings.CHAT_CACHE_SIMILARITY
+
+    async def _prefix(self, scope: str) -> str:
+        versions = await self.client.mget(_version_keys(scope))
+        version = ".".join((value or b"0").decode() for value in versions)
+        return f"{KEY_PREFIX}:{scope}:{version}"
+
+    async def get(self, scope: str, embedding: List[float], fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Return the cached answer for a similar question over the same documents, if any"""
+        if not settings.ENABLE_CACHE:
+            return None
+        try:
+            prefix = await self._prefix(scope)
+            stored = await self.client.hgetall(f"{prefix}:embeddings")
+            query = _normalized(embedding)
+            entry_ids = [entry_id for entry_id, vector in stored.items() if len(vector) == query.nbytes]
+            if not entry_ids:
+                CACHE_REQUESTS.labels(result="miss").inc()
+                return None
+
+            matrix = np.frombuffer(b"".join(stored[entry_id] for entry_id in entry_ids), dtype=np.float32)
+            scores = matrix.reshape(len(entry_ids), -1) @ query
+            for index in np.argsort(scores)[::-1][:MAX_CANDIDATES]:
+                if scores[index] < self.similarity:
+                    break
+                entry_id = entry_ids[index].decode()
+                cached = await self.client.get(f"{prefix}:{entry_id}")
+                if cached is None:
+                    # Expired; drop its embedding too
+                    await self.client.hdel(f"{prefix}:embeddings", entry_id)
+                    continue
+                entry = json.loads(cached)
+                if entry["fingerprint"] != fingerprint:
+                    continue
+                await self.client.zadd(f"{prefix}:index", {entry_id: time.time()})
+                CACHE_REQUESTS.labels(result="hit").inc()
+                logger.info(f"Answered chat from cache (similarity {scores[index]:.3f})")
+                return entry["answer"]
+
+            CACHE_REQUESTS.labels(result="miss").inc()
+            return None
+        except Exception as e:
+            logger.warning(f"Chat answer cache lookup failed: {e}")
+            return None
+
+    async def set(self, scope: str, question: str, embedding: List[float], fingerprint: str,
+                  answer: Dict[str, Any]):
+        """Store an answer and evict expired or least recently used entries of its scope"""
+        if not settings.ENABLE_CACHE:
+            return
+        try:
+            prefix = await self._prefix(scope)
+            entry_id = hashlib.sha256(f"{question}\n{fingerprint}".encode()).hexdigest()
+            now = time.time()
+            pipe = self.client.pipeline()
+            pipe.set(f"{prefix}:{entry_id}", json.dumps({"fingerprint": fingerprint, "answer": answer}), ex=self.ttl)
+            pipe.hset(f"{prefix}:embeddings", entry_id, _normalized(embedding).tobytes())
+            pipe.expire(f"{prefix}:embeddings", self.ttl)
+            pipe.zadd(f"{prefix}:index", {entry_id: now})
+            pipe.expire(f"{prefix}:index", self.ttl)
+            pipe.zrangebyscore(f"{prefix}:index", '-inf', now - self.ttl)
+            pipe.zremrangebyscore(f"{prefix}:index", '-inf', now - self.ttl)
+            pipe.zcard(f"{prefix}:index")
+            results = await pipe.execute()
+            expired, size = results[-3], results[-1]
+
+            evicted = list(expired)
+            overflow = size - self.max_entries
+            if overflow > 0:
+                evicted += [member for member, _ in await self.client.zpopmin(f"{prefix}:index", overflow)]
+            if evicted:
+                pipe = self.client.pipeline()
+                pipe.hdel(f"{prefix}:embeddings", *evicted)
+                pipe.delete(*[f"{prefix}:{entry_id.decode()}" for entry_id in evicted])
+                await pipe.execute()
+                logger.info(f"Evicted {len(evicted)} chat answer(s) from cache")
+        except Exception as e:
+            logger.warning(f"Could not cache chat answer: {e}")
+
+
+_semantic_cache: Optional[SemanticCache] = None
+
+
+def get_semantic_cache() -> SemanticCache:
+    global _semantic_cache
+    if _semantic_cache is None:
+        _semantic_cache = SemanticCache()
+    return _semantic_cache
@@ -1,6 +1,6 @@
 import logging
 from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+from .embeddings import get_embedding_service
 
 logger = logging.getLogger(__name__)
 
@@ -11,13 +11,9 @@ async def init_vector_store():
     logger.info("Initializing vector store")
     
     try:
-        embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
-        
         vector_store = Chroma(
             persist_directory="./data/chroma",
-            embedding_function=embeddings
+            embedding_function=get_embedding_service()
         )
         
         logger.info("Vector store initialized successfully")
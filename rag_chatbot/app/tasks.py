@@ -1,5 +1,6 @@
 from .services.celery_app import celery
 from .services.indexing_service import IndexingService
+from .services.response_cache import bump_index_version
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,6 +13,7 @@ def index_document(document_data: dict, enterprise_id: str):
     try:
         indexing_service = IndexingService()
         indexing_service.update_index(document_data, enterprise_id)
+        bump_index_version(enterprise_id)
         logger.info(f"Successfully indexed document for enterprise {enterprise_id}")
         return {"status": "success", "message": "Document indexed successfully"}
     except Exception as e:
@@ -27,6 +29,7 @@ def batch_index_documents(documents: list, enterprise_id: str):
         indexing_service = IndexingService()
         for doc in documents:
             indexing_service.update_index(doc, enterprise_id)
+        bump_index_version(enterprise_id)
         logger.info(f"Successfully indexed {len(documents)} documents for enterprise {enterprise_id}")
         return {"status": "success", "message": f"Indexed {len(documents)} documents"}
     except Exception as e:
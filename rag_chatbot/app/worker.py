@@ -1,5 +1,6 @@
 from celery import Celery
 import os
+from .core.worker_profile import worker_profile
 
 celery = Celery(
     'rag_tasks',
@@ -13,4 +14,5 @@ celery.conf.update(
     result_serializer='json',
     timezone='UTC',
     enable_utc=True,
+    **worker_profile(),
 )
\ No newline at end of file
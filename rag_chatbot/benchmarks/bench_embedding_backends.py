@@ -0,0 +1,163 @@
+"""
+Benchmark: embedding backends (EMBEDDING_BACKEND) compared on cost and
+accuracy. Each backend is loaded in a fresh process, as a deployment would,
+which reports its load time, peak RSS, single-query latency and document
+throughput. Its embeddings are compared with the first backend's (the
+reference, huggingface by default): cosine similarity per text, and how
+many of each query's top --top-k documents it retrieves alike.
+
+Backends are "huggingface" or "onnx:<model path>". By default the
+reference is compared with model.onnx and model.int8.onnx in --onnx-dir;
+pass --export to write them there first from EMBEDDING_MODEL (needs the
+packages in requirements-onnx-export.txt).
+
+Run from the rag_chatbot directory (needs the service's environment, e.g.
+from .env.example):
+    python -m benchmarks.bench_embedding_backends [--export] [--onnx-dir DIR]
+        [--backends huggingface onnx:path/model.onnx ...] [--queries N] [--documents N]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.core.config import settings
+from benchmarks.bench_embeddings import CLIENTS, MONTHS, make_queries
+
+STATUSES = ["paid", "unpaid", "overdue", "draft"]
+
+
+def make_documents(count: int, seed: int) -> List[str]:
+    """Invoice and client texts shaped like those the indexing service stores"""
+    rng = random.Random(seed)
+    documents = []
+    for _ in range(count):
+        client = rng.choice(CLIENTS)
+        documents.append(
+            f"Invoice #{rng.randint(10000, 99999)} for client {client}, issued in {rng.choice(MONTHS)}. "
+            f"Status: {rng.choice(STATUSES)}. Total amount {rng.uniform(100, 20000):.2f} EUR, "
+            f"tax {rng.uniform(10, 4000):.2f} EUR. Project: {rng.choice(['website', 'audit', 'support', 'hosting'])}."
+        )
+    return documents
+
+
+def measure(texts_file: Path, output: Path):
+    """Load the configured backend and time it; runs in its own process"""
+    from app.services.embeddings import load_backend
+
+    texts = json.loads(texts_file.read_text())
+    start = time.perf_counter()
+    backend = load_backend(settings.EMBEDDING_MODEL)
+    load_seconds = time.perf_counter() - start
+    backend.embed_query("warm up")
+
+    latencies = []
+    queries = []
+    for text in texts["queries"]:
+        start = time.perf_counter()
+        queries.append(backend.embed_query(text))
+        latencies.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    documents = backend.embed_documents(texts["documents"])
+    batch_seconds = time.perf_counter() - start
+
+    np.savez(output, queries=np.asarray(queries, dtype=np.float32), documents=np.asarray(documents, dtype=np.float32))
+    latencies.sort()
+    print(json.dumps({
+        "load_seconds": load_seconds,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "query_p50_ms": statistics.median(latencies) * 1000,
+        "query_p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "documents_per_second": len(documents) / batch_seconds,
+    }))
+
+
+def run_backend(spec: str, texts_file: Path, output: Path) -> Dict[str, Any]:
+    backend, _, path = spec.partition(":")
+    env = {**os.environ, "EMBEDDING_BACKEND": backend}
+    if path:
+        env["EMBEDDING_ONNX_PATH"] = path
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_embedding_backends", "--measure", str(texts_file), str(output)],
+        env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{spec} failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def normalized(matrix: np.ndarray) -> np.ndarray:
+    return matrix / np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+
+
+def compare(reference: Dict[str, np.ndarray], candidate: Dict[str, np.ndarray], top_k: int) -> Dict[str, float]:
+    """Agreement of a backend's embeddings with the reference backend's"""
+    cosines = np.concatenate([
+        (normalized(reference[name]) * normalized(candidate[name])).sum(axis=1) for name in ("queries", "documents")
+    ])
+
+    def top(embeddings):
+        scores = normalized(embeddings["queries"]) @ normalized(embeddings["documents"]).T
+        return np.argsort(-scores, axis=1)[:, :top_k]
+
+    overlap = [len(set(expected) & set(found)) / top_k for expected, found in zip(top(reference), top(candidate))]
+    return {"cosine_mean": float(cosines.mean()), "cosine_min": float(cosines.min()), "top_k_overlap": statistics.mean(overlap)}
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "--measure":
+        measure(Path(sys.argv[2]), Path(sys.argv[3]))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--onnx-dir", type=Path, default=Path(settings.EMBEDDING_ONNX_PATH).parent)
+    parser.add_argument("--export", action="store_true", help="export EMBEDDING_MODEL to --onnx-dir first")
+    parser.add_argument("--backends", nargs="+", help="first one is the reference")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.export:
+        from app.services.onnx_embeddings import export_onnx
+        export_onnx(settings.EMBEDDING_MODEL, args.onnx_dir)
+    backends = args.backends or [
+        "huggingface", f"onnx:{args.onnx_dir / 'model.onnx'}", f"onnx:{args.onnx_dir / 'model.int8.onnx'}"
+    ]
+
+    queries = list(dict.fromkeys(make_queries(args.queries * 10, args.seed)))[:args.queries]
+    documents = make_documents(args.documents, args.seed)
+    print(f"{len(queries)} queries, {len(documents)} documents, model {settings.EMBEDDING_MODEL}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        texts_file = Path(directory) / "texts.json"
+        texts_file.write_text(json.dumps({"queries": queries, "documents": documents}))
+        print(f"\n{'backend':<44}{'load (s)':>9}{'RSS (MB)':>10}{'p50 (ms)':>10}{'p95 (ms)':>10}"
+              f"{'docs/s':>9}{'cos mean':>10}{'cos min':>9}{f'top-{args.top_k}':>8}")
+        reference = None
+        for index, spec in enumerate(backends):
+            output = Path(directory) / f"{index}.npz"
+            result = run_backend(spec, texts_file, output)
+            embeddings = dict(np.load(output))
+            if reference is None:
+                reference = embeddings
+            agreement = compare(reference, embeddings, args.top_k)
+            print(f"{spec[-44:]:<44}{result['load_seconds']:>9.2f}{result['peak_rss_mb']:>10.0f}"
+                  f"{result['query_p50_ms']:>10.2f}{result['query_p95_ms']:>10.2f}{result['documents_per_second']:>9.0f}"
+                  f"{agreement['cosine_mean']:>10.4f}{agreement['cosine_min']:>9.4f}{agreement['top_k_overlap']:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark: chat query embedding throughput of the current path (each query
+embedded on its own by HuggingFaceEmbeddings) against the shared embedding
+service (services.embeddings), with and without its query cache.
+
+Queries are drawn from finance question templates with a skewed
+distribution, so some repeat as they do in practice, and are issued by
+--concurrency threads at once, like concurrent chat requests.
+
+Run from the rag_chatbot directory (needs sentence-transformers and the
+service's environment, e.g. from .env.example):
+    python -m benchmarks.bench_embeddings [--queries N] [--concurrency 1 8 32]
+"""
+import argparse
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from app.core.config import settings
+from app.services.embeddings import EmbeddingService, load_backend
+
+TEMPLATES = [
+    "What is the total of unpaid invoices for client {client}?",
+    "Which invoices are due this week?",
+    "Show overdue invoices for {client}",
+    "How much did we bill {client} in {month}?",
+    "What is the status of invoice #{number}?",
+    "List the projects for {client}",
+    "What was the tax amount on invoice #{number}?",
+]
+CLIENTS = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries"]
+MONTHS = ["January", "February", "March", "April", "May", "June"]
+
+
+def make_queries(count: int, seed: int) -> List[str]:
+    """Queries with a Zipf-like skew: a few questions are asked far more often"""
+    rng = random.Random(seed)
+    distinct = [
+        template.format(client=rng.choice(CLIENTS), month=rng.choice(MONTHS), number=rng.randint(10000, 99999))
+        for template in TEMPLATES
+        for _ in range(40)
+    ]
+    weights = [1 / (rank + 1) for rank in range(len(distinct))]
+    return rng.choices(distinct, weights=weights, k=count)
+
+
+def run(embed: Callable[[str], List[float]], queries: List[str], concurrency: int) -> Dict[str, float]:
+    latencies = []
+
+    def timed(query: str):
+        start = time.perf_counter()
+        embed(query)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, queries))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "qps": len(queries) / wall,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries, args.seed)
+    print(f"{len(queries)} queries, {len(set(queries))} distinct, model {settings.EMBEDDING_MODEL}")
+    backend = load_backend(settings.EMBEDDING_MODEL)
+    backend.embed_query("warm up")
+
+    print(f"\n{'path':<22}{'threads':>8}{'queries/s':>12}{'p50 (ms)':>10}{'p95 (ms)':>10}{'batch':>8}")
+    for concurrency in args.concurrency:
+        result = run(backend.embed_query, queries, concurrency)
+        print(f"{'current':<22}{concurrency:>8}{result['qps']:>12.1f}{result['p50']:>10.1f}{result['p95']:>10.1f}{'1.0':>8}")
+        for name, cache_size in (("service, no cache", 0), ("service", None)):
+            service = EmbeddingService(backend, cache_size=cache_size)
+            result = run(service.embed_query, queries, concurrency)
+            batch = f"{service.batched_queries / max(service.batches, 1):.1f}"
+            print(f"{name:<22}{concurrency:>8}{result['qps']:>12.1f}{result['p50']:>10.1f}{result['p95']:>10.1f}{batch:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+from app.core.config import settings
+from app.models.chat import ChatRequest, ChatResponse
+from app.routers import chat as chat_router
+from app.services.chat_service import ChatService, get_chat_service
+
+INVOICE = Document(page_content="Invoice #1042 for Acme, total 419.98 EUR", metadata={"source": "invoice:1042"})
+
+
+class FakeRetriever:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    async def ainvoke(self, question):
+        await asyncio.sleep(self.delay)
+        return [INVOICE]
+
+
+class FakeChain:
+    """Answers after delay, tracking how many answers are generated at once"""
+
+    def __init__(self, delay=0.0, retriever=None):
+        self.delay = delay
+        self.retriever = retriever or FakeRetriever()
+        self.running = 0
+        self.most_running = 0
+        self.calls = 0
+        self.cancelled = 0
+
+    async def ainvoke(self, inputs):
+        self.calls += 1
+        self.running += 1
+        self.most_running = max(self.most_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.running -= 1
+        return {"answer": "The total of invoice 1042 is 419.98 EUR.", "sources": "invoice: 1042"}
+
+
+class SlowEmbeddings:
+    async def aembed_query(self, text):
+        await asyncio.sleep(1)
+        return [0.0]
+
+
+def make_service(chain=None, llm=None, max_concurrent=4):
+    # Without __init__: no embedding model, vector store or Ollama client
+    service = ChatService.__new__(ChatService)
+    service.qa_chain = chain or FakeChain()
+    service.llm = llm
+    service.embeddings = SlowEmbeddings()
+    service.generation_slots = asyncio.Semaphore(max_concurrent)
+    return service
+
+
+@pytest.fixture(autouse=True)
+def chat_settings(monkeypatch):
+    monkeypatch.setattr(settings, "ENABLE_CACHE", False)
+    monkeypatch.setattr(settings, "CHAT_TIMEOUT_SECONDS", 0.2)
+
+
+def client_for(service):
+    app = FastAPI()
+    app.include_router(chat_router.router)
+    app.dependency_overrides[get_chat_service] = lambda: service
+    return TestClient(app)
+
+
+def test_retrieval_counts_towards_the_chat_timeout(monkeypatch):
+    monkeypatch.setattr(settings, "ENABLE_CACHE", True)
+    service = make_service()
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(service.process_query("What is the total of invoice 1042?"))
+    assert service.qa_chain.calls == 0
+
+
+def test_generation_slots_cap_concurrent_answers():
+    async def scenario():
+        service = make_service(FakeChain(delay=0.02), max_concurrent=2)
+        results = await asyncio.gather(*(service.process_query(f"Question {index}?") for index in range(5)))
+        return service.qa_chain, results
+
+    chain, results = asyncio.run(scenario())
+
+    assert chain.most_running == 2
+    assert [result["response"] for result in results] == ["The total of invoice 1042 is 419.98 EUR."] * 5
+
+
+def test_timed_out_chat_returns_504():
+    response = client_for(make_service(FakeChain(delay=1))).post("/chat", json={"query": "Total of invoice 1042?"})
+
+    assert response.status_code == 504
+
+
+class DisconnectedRequest:
+    async def is_disconnected(self):
+        return True
+
+
+def test_disconnected_client_cancels_the_chat(monkeypatch):
+    monkeypatch.setattr(chat_router, "DISCONNECT_POLL_SECONDS", 0.01)
+    service = make_service(FakeChain(delay=1))
+
+    response = asyncio.run(chat_router.chat(
+        ChatRequest(query="Total of invoice 1042?"), DisconnectedRequest(), chat_service=service
+    ))
+
+    assert response.status_code == chat_router.CLIENT_CLOSED_REQUEST
+    assert service.qa_chain.cancelled == 1
+
+
+class FakeLLM:
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    async def astream(self, prompt):
+        for token in self.tokens:
+            yield token
+
+
+def stream_events(service):
+    response = client_for(service).post("/chat/stream", json={"query": "Total of invoice 1042?"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = []
+    for message in response.text.strip().split("\n\n"):
+        event, data = message.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def test_stream_sends_sources_then_tokens_then_the_response():
+    events = stream_events(make_service(llm=FakeLLM(["The total", " is", " 419.98 EUR."])))
+
+    assert [event for event, _ in events] == ["sources", "token", "token", "token", "done"]
+    assert events[0][1]["sources"][0]["metadata"] == {"source": "invoice:1042"}
+    done = ChatResponse(**events[-1][1])
+    assert done.response == "The total is 419.98 EUR."
+    assert done.conversation_id == events[0][1]["conversation_id"]
+
+
+def test_stream_reports_a_timeout_as_an_error_event():
+    service = make_service(FakeChain(retriever=FakeRetriever(delay=1)), llm=FakeLLM(["unused"]))
+
+    assert [event for event, _ in stream_events(service)] == ["error"]
+
+
+def test_stream_retrieves_before_waiting_for_a_generation_slot():
+    # Every slot is taken: sources still go out, then the wait times out
+    events = stream_events(make_service(llm=FakeLLM(["unused"]), max_concurrent=0))
+
+    assert [event for event, _ in events] == ["sources", "error"]
@@ -0,0 +1,105 @@
+import threading
+import time
+import pytest
+from app.services.embeddings import EmbeddingService
+
+
+class FakeBackend:
+    """Embeds a text as [len(text)], recording each batch; blocks while gate is closed"""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.fail = fail
+
+    def embed_documents(self, texts):
+        self.gate.wait(5)
+        self.batches.append(list(texts))
+        if self.fail:
+            raise RuntimeError("model crashed")
+        return [[float(len(text))] for text in texts]
+
+
+def service_for(backend, **options):
+    options = {"cache_size": 100, "batch_window_ms": 50, "max_batch_size": 32, "workers": 1, **options}
+    return EmbeddingService(backend, **options)
+
+
+def busy(backend, service):
+    """Hold the inference thread on a first query, so later ones queue up"""
+    backend.gate.clear()
+    first = service.submit("first")
+    while not backend.batches and service._queue.qsize():
+        time.sleep(0.001)
+    time.sleep(0.01)
+    return first
+
+
+def test_identical_queries_share_one_embedding():
+    backend = FakeBackend()
+    service = service_for(backend)
+    first = busy(backend, service)
+
+    futures = [service.submit("unpaid invoices"), service.submit("unpaid invoices"), service.submit("due this week")]
+    backend.gate.set()
+
+    assert futures[0] is futures[1]
+    assert [future.result(5) for future in futures] == [[15.0], [15.0], [13.0]]
+    assert first.result(5) == [5.0]
+    assert backend.batches == [["first"], ["unpaid invoices", "due this week"]]
+
+
+def test_batches_are_capped_at_the_max_batch_size():
+    backend = FakeBackend()
+    service = service_for(backend, max_batch_size=2)
+    busy(backend, service)
+
+    futures = [service.submit(text) for text in ("a", "bb", "ccc")]
+    backend.gate.set()
+
+    assert [future.result(5) for future in futures] == [[1.0], [2.0], [3.0]]
+    assert backend.batches[1:] == [["a", "bb"], ["ccc"]]
+
+
+def test_a_lone_query_does_not_wait_for_the_window():
+    service = service_for(FakeBackend(), batch_window_ms=2000)
+
+    start = time.perf_counter()
+    service.embed_query("unpaid invoices")
+
+    assert time.perf_counter() - start < 1
+
+
+def test_errors_reach_every_waiting_query_and_are_not_cached():
+    backend = FakeBackend(fail=True)
+    service = service_for(backend)
+
+    with pytest.raises(RuntimeError, match="model crashed"):
+        service.embed_query("unpaid invoices")
+    backend.fail = False
+
+    assert service.embed_query("unpaid invoices") == [15.0]
+    assert len(backend.batches) == 2
+
+
+@pytest.mark.parametrize("cache_size, batches", [(0, 2), (100, 1)])
+def test_query_cache(cache_size, batches):
+    backend = FakeBackend()
+    service = service_for(backend, cache_size=cache_size)
+
+    service.embed_query("unpaid invoices")
+    service.embed_query("unpaid invoices")
+
+    assert len(backend.batches) == batches
+    assert len(service._cache) == min(cache_size, 1)
+
+
+def test_least_recently_used_queries_leave_the_cache():
+    backend = FakeBackend()
+    service = service_for(backend, cache_size=2)
+
+    for text in ("a", "b", "a", "c"):
+        service.embed_query(text)
+
+    assert list(service._cache) == ["a", "c"]
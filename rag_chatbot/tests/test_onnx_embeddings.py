@@ -0,0 +1,75 @@
+import sys
+import types
+import numpy as np
+import pytest
+from app.core.config import settings
+from app.services import embeddings, onnx_embeddings
+from app.services.onnx_embeddings import OnnxEmbeddings
+
+
+class RecordingModel:
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+
+def test_load_backend_follows_embedding_backend(monkeypatch):
+    monkeypatch.setattr(onnx_embeddings, "OnnxEmbeddings", RecordingModel)
+    monkeypatch.setitem(sys.modules, "langchain_huggingface", types.SimpleNamespace(HuggingFaceEmbeddings=RecordingModel))
+    monkeypatch.setattr(settings, "EMBEDDING_TORCH_THREADS", 0)
+    monkeypatch.setattr(settings, "EMBEDDING_ONNX_PATH", "/models/model.int8.onnx")
+
+    monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "onnx")
+    onnx = embeddings.load_backend("all-MiniLM-L6-v2")
+    monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "huggingface")
+    huggingface = embeddings.load_backend("all-MiniLM-L6-v2")
+
+    assert onnx.args == ("/models/model.int8.onnx",)
+    assert huggingface.kwargs == {"model_name": "all-MiniLM-L6-v2"}
+
+
+def test_load_backend_rejects_unknown_backends():
+    with pytest.raises(ValueError, match="Unknown embedding backend"):
+        embeddings.load_backend("all-MiniLM-L6-v2", backend="tensorflow")
+
+
+class FakeEncoding:
+    def __init__(self, length, padded_to):
+        self.ids = list(range(1, length + 1)) + [0] * (padded_to - length)
+        self.attention_mask = [1] * length + [0] * (padded_to - length)
+        self.type_ids = [0] * padded_to
+
+
+class FakeTokenizer:
+    def encode_batch(self, texts):
+        longest = max(len(text.split()) for text in texts)
+        return [FakeEncoding(len(text.split()), longest) for text in texts]
+
+
+class FakeSession:
+    """Returns each token's id as its hidden state: [id, 1]"""
+
+    def __init__(self):
+        self.inputs = None
+
+    def run(self, outputs, inputs):
+        self.inputs = inputs
+        ids = inputs["input_ids"].astype(np.float32)
+        return [np.stack([ids, np.ones_like(ids)], axis=-1)]
+
+
+def test_embed_mean_pools_over_the_attention_mask_and_normalizes():
+    model = OnnxEmbeddings.__new__(OnnxEmbeddings)
+    model.tokenizer = FakeTokenizer()
+    model.session = FakeSession()
+    model.input_names = {"input_ids", "attention_mask"}
+
+    vectors = model.embed_documents(["one two three", "one"])
+
+    # Padding is left out of the mean: tokens [1, 2, 3] pool to [2, 1], token [1] to [1, 1]
+    expected = np.array([[2.0, 1.0], [1.0, 1.0]])
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    assert np.allclose(vectors, expected)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    # Inputs the model does not declare are not passed
+    assert set(model.session.inputs) == {"input_ids", "attention_mask"}
@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.core.config import settings
+from app.services import response_cache
+from app.services.response_cache import SemanticCache, bump_index_version
+
+ANSWER = {"response": "Invoice 1042 is unpaid.", "sources": []}
+QUESTION = [1.0, 0.0, 0.0]
+SIMILAR = [0.99, 0.05, 0.0]
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(settings, "ENABLE_CACHE", True)
+    monkeypatch.setattr(response_cache.redis.Redis, "from_url", lambda url: fakeredis.FakeRedis(server=server))
+    cache = SemanticCache(redis_url="redis://localhost", ttl=60, max_entries=2, similarity=0.95)
+    cache.client = fakeredis.aioredis.FakeRedis(server=server)
+    return cache
+
+
+def test_similar_question_over_same_documents_hits(cache):
+    async def scenario():
+        await cache.set("e1", "unpaid invoices?", QUESTION, "docs", ANSWER)
+        return await cache.get("e1", SIMILAR, "docs"), await cache.get("e1", [0.0, 1.0, 0.0], "docs")
+
+    hit, dissimilar = asyncio.run(scenario())
+    assert hit == ANSWER
+    assert dissimilar is None
+
+
+def test_misses_when_other_documents_are_retrieved(cache):
+    async def scenario():
+        await cache.set("e1", "unpaid invoices?", QUESTION, "docs", ANSWER)
+        return await cache.get("e1", SIMILAR, "other docs")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_misses_in_another_scope(cache):
+    async def scenario():
+        await cache.set("e1", "unpaid invoices?", QUESTION, "docs", ANSWER)
+        return await cache.get("e2", SIMILAR, "docs")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_index_writes_invalidate_their_scope_and_the_global_one(cache):
+    async def scenario():
+        for scope in ("e1", "e2", response_cache.GLOBAL_SCOPE):
+            await cache.set(scope, "unpaid invoices?", QUESTION, "docs", ANSWER)
+        bump_index_version("e1")
+        return [await cache.get(scope, SIMILAR, "docs") for scope in ("e1", "e2", response_cache.GLOBAL_SCOPE)]
+
+    assert asyncio.run(scenario()) == [None, ANSWER, None]
+
+
+def test_full_refresh_invalidates_every_scope(cache):
+    async def scenario():
+        await cache.set("e2", "unpaid invoices?", QUESTION, "docs", ANSWER)
+        bump_index_version()
+        return await cache.get("e2", SIMILAR, "docs")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_least_recently_used_answers_are_evicted(cache):
+    questions = {"a": [1.0, 0.0, 0.0], "b": [0.0, 1.0, 0.0], "c": [0.0, 0.0, 1.0]}
+
+    async def scenario():
+        await cache.set("e1", "a", questions["a"], "docs", {"response": "a"})
+        await cache.set("e1", "b", questions["b"], "docs", {"response": "b"})
+        await cache.get("e1", questions["a"], "docs")
+        await cache.set("e1", "c", questions["c"], "docs", {"response": "c"})
+        return {name: await cache.get("e1", embedding, "docs") for name, embedding in questions.items()}
+
+    assert asyncio.run(scenario()) == {"a": {"response": "a"}, "b": None, "c": {"response": "c"}}